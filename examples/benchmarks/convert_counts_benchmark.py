@@ -0,0 +1,70 @@
+"""
+Time of convert_annualized and convert_to_counts on a synthetic 70-year monthly summary report, compared with the
+previous implementations that round-trip through reset_index/set_index and look up intervals row by row.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from malaria.analyzers.Helpers import convert_annualized, convert_to_counts
+
+years = 70
+age_bins = [1, 2, 5, 10, 15, 20, 30, 40, 50, 60, 70, 80, 1000]
+density_bins = [0, 50, 500, 5000, 50000, 500000]
+repeats = 5
+
+
+def legacy_convert_annualized(s, reporting_interval=None, start_day=None):
+    s_ix = s.index
+    time_levels = s_ix.levels[s_ix.names.index('Time')].values
+    start_time = (start_day - 1) if start_day else 0
+    time_intervals = np.diff(np.insert(time_levels, 0, values=start_time))
+    intervals_by_time = dict(zip(time_levels, time_intervals))
+    df = s.reset_index()
+    df[s.name] *= df.Time.apply(lambda x: intervals_by_time[x] / 365.0)
+    return df.set_index(s_ix.names)
+
+
+def legacy_convert_to_counts(rates, pops):
+    rate_idx = rates.index.names
+    pop_idx = pops.index.names
+    df = rates.reset_index().set_index(pop_idx)\
+              .join(pops, how='left')\
+              .reset_index().set_index(rate_idx)
+    return (df[rates.name] * df[pops.name]).rename(rates.name)
+
+
+def monthly_report(seed=0):
+    rng = np.random.RandomState(seed)
+    times = 30 * np.arange(1, 12 * years + 1)  # summary reports aggregate over a fixed interval
+
+    pop_ix = pd.MultiIndex.from_product([times, age_bins], names=['Time', 'Age Bin'])
+    population = pd.Series(rng.uniform(50, 150, len(pop_ix)), index=pop_ix, name='Average Population by Age Bin')
+
+    density_ix = pd.MultiIndex.from_product([times, age_bins, density_bins], names=['Time', 'Age Bin', 'PfPR Bin'])
+    prevalence = pd.Series(rng.uniform(0, 1, len(density_ix)), index=density_ix,
+                           name='PfPR by Parasitemia and Age Bin')
+    return population, prevalence
+
+
+def timed(fn, *args):
+    t0 = time.time()
+    for _ in range(repeats):
+        result = fn(*args)
+    return result, 1000 * (time.time() - t0) / repeats
+
+
+if __name__ == '__main__':
+    population, prevalence = monthly_report()
+    print('%d-year monthly report: %d population rows, %d density rows' % (years, len(population), len(prevalence)))
+
+    old, old_ms = timed(legacy_convert_annualized, population)
+    new, new_ms = timed(convert_annualized, population)
+    assert np.allclose(old.values, new.values)
+    print('convert_annualized: %8.1f ms -> %6.1f ms' % (old_ms, new_ms))
+
+    old, old_ms = timed(legacy_convert_to_counts, prevalence, population)
+    new, new_ms = timed(convert_to_counts, prevalence, population)
+    assert np.allclose(old.values, new.values)
+    print('convert_to_counts:  %8.1f ms -> %6.1f ms' % (old_ms, new_ms))
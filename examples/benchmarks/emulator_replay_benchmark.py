@@ -0,0 +1,59 @@
+"""
+Fraction of simulations avoided by emulator pre-screening, replayed on a past calibration.
+
+Usage:
+    python emulator_replay_benchmark.py LL_all.csv --params "Max Individual Infections" "Antigen Switch Rate" \
+        --likelihoods site1 site2 [--iteration iteration]
+
+Without a results file, a synthetic two-site calibration of three parameters is replayed instead: each iteration
+resamples around the best samples of the previous ones, as IMIS or OptimTool would.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from malaria.analyzers.LikelihoodEmulator import replay_screening
+
+
+def synthetic_calibration(iterations=6, samples_per_iteration=400, seed=0):
+    rng = np.random.RandomState(seed)
+    optimum = np.array([0.3, 0.6, 0.5])
+    widths = {'site1': np.array([0.05, 0.2, 0.1]), 'site2': np.array([0.1, 0.05, 0.3])}
+
+    frames = []
+    points = rng.uniform(0, 1, size=(samples_per_iteration, 3))
+    for iteration in range(iterations):
+        df = pd.DataFrame(points, columns=['p1', 'p2', 'p3'])
+        df['iteration'] = iteration
+        for site, width in widths.items():
+            df[site] = -0.5 * (((points - optimum) / width) ** 2).sum(axis=1) + rng.normal(0, 1, len(points))
+        frames.append(df)
+
+        history = pd.concat(frames, ignore_index=True)
+        best = history.loc[history[list(widths)].sum(axis=1).nlargest(samples_per_iteration // 10).index]
+        centers = best[['p1', 'p2', 'p3']].values[rng.randint(0, len(best), samples_per_iteration)]
+        points = np.clip(centers + rng.normal(0, 0.1, centers.shape), 0, 1)
+
+    return pd.concat(frames, ignore_index=True), ['p1', 'p2', 'p3'], list(widths)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('results', nargs='?', help='CSV of past samples with iteration, parameters and likelihoods')
+    parser.add_argument('--params', nargs='+')
+    parser.add_argument('--likelihoods', nargs='+')
+    parser.add_argument('--iteration', default='iteration')
+    args = parser.parse_args()
+
+    if args.results:
+        history, params, likelihoods = pd.read_csv(args.results), args.params, args.likelihoods
+    else:
+        history, params, likelihoods = synthetic_calibration()
+
+    replay = replay_screening(history, params, likelihoods, iteration_column=args.iteration)
+    print(replay)
+
+    total = replay.sum()
+    print('Simulations avoided: %d of %d (%.1f%%); top-decile samples wrongly skipped: %d of %d' % (
+        total.skipped, total.proposed, 100.0 * total.skipped / total.proposed, total.good_skipped, total.good))
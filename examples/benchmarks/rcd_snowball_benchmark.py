@@ -0,0 +1,67 @@
+"""
+Campaign size and build time of reactive case detection for snowballs 0-3 on a synthetic 3,000-node household site.
+
+Compares the nested add_rfMSAT with the flattened chain of add_reactive_case_detection, given the precomputed
+response topology, and reports the snowball levels emitted and the mean number of households reached by each.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from dtk.utils.core.DTKConfigBuilder import DTKConfigBuilder
+from malaria.interventions.malaria_drug_campaigns import add_rfMSAT
+from malaria.interventions.malaria_drugs import drug_configs_from_code
+from malaria.interventions.reactive_case_detection import add_reactive_case_detection, campaign_event_counts, \
+    rcd_neighbors, _EventRecorder
+
+num_nodes = 3000
+site_width_km = 6.0
+fmda_radius = 0.1
+max_distance_km = 1.0
+
+
+def household_distance_matrix(seed=0):
+    rng = np.random.RandomState(seed)
+    xy = rng.uniform(0, site_width_km, size=(num_nodes, 2))
+    pairs = cKDTree(xy).query_pairs(max_distance_km, output_type='ndarray')
+    dist = np.sqrt(((xy[pairs[:, 0]] - xy[pairs[:, 1]]) ** 2).sum(axis=1))
+    node_ids = np.arange(1, num_nodes + 1)
+    return pd.DataFrame({'node1': np.concatenate([node_ids[pairs[:, 0]], node_ids[pairs[:, 1]]]),
+                         'node2': np.concatenate([node_ids[pairs[:, 1]], node_ids[pairs[:, 0]]]),
+                         'dist': np.concatenate([dist, dist])})
+
+
+def timed(fn):
+    t0 = time.time()
+    result = fn()
+    return result, 1000 * (time.time() - t0)
+
+
+if __name__ == '__main__':
+    distmat = household_distance_matrix()
+    nodes = list(range(1, num_nodes + 1))
+
+    neighbors, topology_ms = timed(lambda: rcd_neighbors(distmat, fmda_radius, nodes=nodes))
+    print('Response topology for %d nodes precomputed in %.1f ms' % (num_nodes, topology_ms))
+
+    print('%9s | %24s | %24s | %s' % ('snowballs', 'nested events/KB/ms', 'flattened events/KB/ms',
+                                       'levels emitted: households reached by level'))
+    node_cfg = {'Node_List': nodes, 'class': 'NodeSetNodeList'}
+    for snowballs in range(4):
+        recorder = _EventRecorder(DTKConfigBuilder.from_defaults('MALARIA_SIM'))
+        _, old_ms = timed(lambda: add_rfMSAT(
+            recorder, 365, 1.0, drug_configs_from_code(recorder, 'AL'),
+            {'class': 'BroadcastEvent', 'Broadcast_Event': 'Received_RCD_Drugs'}, 60, 0, 1.0,
+            'TRUE_PARASITE_DENSITY', 40, fmda_radius, 'DISTANCE_ONLY', snowballs, node_cfg, {}, [], [], [], -1, 0))
+        old = campaign_event_counts(recorder.events)
+
+        cb = DTKConfigBuilder.from_defaults('MALARIA_SIM')
+        new, new_ms = timed(lambda: add_reactive_case_detection(cb, 'rfMSAT', 'AL', start_day=365, nodes=nodes,
+                                                                fmda_radius=fmda_radius, snowballs=snowballs,
+                                                                neighbors=neighbors))
+
+        print('%9d | %6d %9.1f %7.1f | %6d %9.1f %7.1f | %d: %s' % (
+            snowballs, old['events'], old['bytes'] / 1024.0, old_ms, new['events'], new['bytes'] / 1024.0, new_ms,
+            new['snowballs'], ', '.join('%.1f' % r for r in new['reach'])))
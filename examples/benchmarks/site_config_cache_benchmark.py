@@ -0,0 +1,52 @@
+"""
+Time of building the configuration of one calibration sample of the Dielmo site: rerunning the site setup chain on a
+copy of the base config builder, compared with restoring the recorded state of the chain from a SiteConfigCache.
+
+The cache is only worth it if restoring its full copy of the state (clone_state) costs less than the setup functions
+it replaces; both are timed, as is the copy alone.
+"""
+import time
+
+from dtk.utils.core.DTKConfigBuilder import DTKConfigBuilder
+from malaria.study_sites.DielmoCalibSite import DielmoCalibSite
+from malaria.study_sites.site_config_cache import SiteConfigCache, clone_builder, clone_state
+from malaria.study_sites.site_setup_functions import update_params_fn
+
+samples = 50
+
+
+def sample_fn(i):
+    return update_params_fn({'Antigen_Switch_Rate': 1e-9 * (1 + i)})
+
+
+def timed(fn):
+    t0 = time.time()
+    for i in range(samples):
+        fn(i)
+    return 1000 * (time.time() - t0) / samples
+
+
+if __name__ == '__main__':
+    base = DTKConfigBuilder.from_defaults('MALARIA_SIM')
+    site = DielmoCalibSite()
+
+    def rerun(i):
+        cb = clone_builder(base)
+        for fn in site.get_setup_functions() + [sample_fn(i)]:
+            fn(cb)
+
+    cache = SiteConfigCache()
+    cache.apply(clone_builder(base), site.get_setup_functions())  # record the state of the site chain
+
+    def cached(i):
+        cb = clone_builder(base)
+        cache.apply(cb, site.get_setup_functions())
+        sample_fn(i)(cb)
+
+    recorded = next(iter(cache.entries.values()))['state']
+    rerun_ms, cached_ms = timed(rerun), timed(cached)
+    clone_ms = timed(lambda i: clone_state(recorded))
+
+    print('Per sample: setup chain rerun %.1f ms, cached %.1f ms (%.1fx faster), of which copying the state %.1f ms'
+          % (rerun_ms, cached_ms, rerun_ms / cached_ms, clone_ms))
+    print('Cache hits %d, misses %d' % (cache.hits, cache.misses))
@@ -0,0 +1,246 @@
+"""
+Long-lived local analysis service keeping initialized calibration analyzers, and the site reference data they hold
+(distance matrices, reference CSVs, ...), in memory between calibration iterations.
+
+Start the service with a factory returning the analyzers, e.g.:
+
+    python -m malaria.analyzers.AnalysisService my_calibration:get_analyzers /tmp/malaria_analysis.sock
+
+and reduce each iteration's simulations through the client:
+
+    client = AnalysisClient('/tmp/malaria_analysis.sock')
+    results = client.reduce([{'sim_id': sim_id, 'sim_data': {'__site__': 'Namawala', '__sample_index__': 3},
+                              'outputs': {'output/MalariaSummaryReport_Annual_Report.json': '/path/to/file'}}])
+
+Requests and responses are newline-delimited JSON objects over a Unix socket.
+"""
+import asyncio
+import copy
+import importlib
+import json
+import logging
+import os
+import socket
+import sys
+
+import numpy as np
+import pandas as pd
+
+from malaria.analyzers.PackedSites import split_packed_parser
+from malaria.analyzers.SampleAggregates import RunningSampleMoments
+
+logger = logging.getLogger(__name__)
+
+
+def read_spatial_report(path):
+    """
+    Read a binary SpatialReport output file
+    :return: dictionary with n_nodes, n_tstep, nodeids and data (time x node array)
+    """
+    with open(path, 'rb') as fin:
+        raw = fin.read()
+    n_nodes, n_tstep = np.frombuffer(raw, dtype=np.int32, count=2)
+    offset = 8
+    spatial = {'n_nodes': int(n_nodes), 'n_tstep': int(n_tstep)}
+    if 'Filtered' in os.path.basename(path):  # filtered reports start with the start time and interval
+        spatial['start'], spatial['interval'] = np.frombuffer(raw, dtype=np.float32, count=2, offset=offset).tolist()
+        offset += 8
+    spatial['nodeids'] = np.frombuffer(raw, dtype=np.int32, count=n_nodes, offset=offset).tolist()
+    offset += 4 * n_nodes
+    spatial['data'] = np.frombuffer(raw, dtype=np.float32, count=n_nodes * n_tstep, offset=offset)\
+                        .reshape(n_tstep, n_nodes)
+    return spatial
+
+
+def read_output_file(path):
+    """
+    Decode an output file by its extension (json, csv or binary SpatialReport)
+    """
+    if path.endswith('.json'):
+        with open(path) as fin:
+            return json.load(fin)
+    if path.endswith('.csv'):
+        return pd.read_csv(path)
+    if path.endswith('.bin'):
+        return read_spatial_report(path)
+    raise ValueError('Unsupported output file type: %s' % path)
+
+
+class _OutputFiles(dict):
+    """
+    Output files of a simulation, decoded on first access.
+    """
+
+    def __init__(self, paths):
+        super(_OutputFiles, self).__init__()
+        self.paths = paths
+
+    def __missing__(self, filename):
+        value = self[filename] = read_output_file(self.paths[filename])
+        return value
+
+
+class LocalOutputParser(object):
+    """
+    Parser of simulation output files available locally, exposing what analyzers use (raw_data, sim_data, sim_id
+    and selected_data).
+    """
+
+    def __init__(self, sim_id, sim_data, paths):
+        self.sim_id = sim_id
+        self.sim_data = sim_data
+        self.raw_data = _OutputFiles(paths)
+        self.selected_data = {}
+
+    def release(self):
+        """
+        Drop the decoded output files once all analyzers have applied.
+        """
+        self.raw_data.clear()
+        self.__dict__.pop('_parsed_output_cache', None)
+
+
+class AnalysisService(object):
+    """
+    Hold initialized analyzers and reduce batches of simulation outputs with fresh copies of them; the copies share
+    the reference data of the initialized analyzers, so it is loaded only once for the life of the service.
+    """
+
+    def __init__(self, factory, socket_path):
+        """
+        :param factory: function returning the list of initialized analyzers
+        :param socket_path: path of the Unix socket to listen on
+        """
+        self.factory = factory
+        self.socket_path = socket_path
+        self.analyzers = factory()
+        self.lock = None  # created in serve, within the event loop
+        self.server = None
+
+    @staticmethod
+    def _fresh(analyzer):
+        fresh = copy.copy(analyzer)
+        if isinstance(getattr(analyzer, 'moments', None), RunningSampleMoments):
+            fresh.moments = RunningSampleMoments()
+        return fresh
+
+    def reduce(self, simulations):
+        """
+        Apply every analyzer to the simulations, then combine and finalize.
+        :param simulations: list of {'sim_id': ..., 'sim_data': {...}, 'outputs': {filename: local path}}; the
+            outputs of packed simulations (with __sites__ in sim_data) are named per site (see PackedSites)
+        :return: list of {'uid': ..., 'result': {sample: likelihood}}, one per analyzer
+        """
+        analyzers = [self._fresh(a) for a in self.analyzers]
+        parsers = {}
+        for sim in simulations:
+            parser = LocalOutputParser(sim['sim_id'], sim.get('sim_data', {}), sim['outputs'])
+            for site_parser in split_packed_parser(parser):  # the sites of packed simulations are analyzed apart
+                for analyzer in analyzers:
+                    if analyzer.filter(site_parser.sim_data):
+                        site_parser.selected_data[id(analyzer)] = analyzer.apply(site_parser)
+                site_parser.release()
+                parsers[site_parser.sim_id] = site_parser
+            parser.release()
+
+        results = []
+        for analyzer in analyzers:
+            analyzer.combine(parsers)
+            analyzer.finalize()
+            result = analyzer.result
+            results.append({'uid': analyzer.uid(),
+                            'result': {str(k): float(v) for k, v in result.items()}})
+        return results
+
+    def handle_request(self, request):
+        op = request.get('op')
+        if op == 'ping':
+            return {'ok': True, 'analyzers': [a.uid() for a in self.analyzers]}
+        if op == 'reduce':
+            return {'ok': True, 'results': self.reduce(request['simulations'])}
+        if op == 'reload':
+            self.analyzers = self.factory()
+            return {'ok': True, 'analyzers': [a.uid() for a in self.analyzers]}
+        raise ValueError('Unknown operation: %s' % op)
+
+    async def _handle_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line.decode())
+                if request.get('op') == 'shutdown':
+                    writer.write(b'{"ok": true}\n')
+                    await writer.drain()
+                    self.server.close()
+                    break
+                async with self.lock:  # one batch at a time; analysis runs off the event loop
+                    response = await loop.run_in_executor(None, self.handle_request, request)
+            except Exception as e:
+                logger.exception('Analysis request failed')
+                response = {'ok': False, 'error': '%s: %s' % (type(e).__name__, e)}
+            writer.write((json.dumps(response) + '\n').encode())
+            await writer.drain()
+        writer.close()
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.lock = asyncio.Lock()
+        self.server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        logger.info('Analysis service with %d analyzers listening on %s', len(self.analyzers), self.socket_path)
+        await self.server.wait_closed()
+
+    def run(self):
+        """
+        Serve until a shutdown request, in a new event loop (e.g. from any thread).
+        """
+        asyncio.run(self.serve())
+
+
+class AnalysisClient(object):
+    """
+    Blocking client of an AnalysisService.
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def request(self, request):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+            sock.sendall((json.dumps(request) + '\n').encode())
+            stream = sock.makefile('rb')
+            response = json.loads(stream.readline().decode())
+        finally:
+            sock.close()
+        if not response.get('ok'):
+            raise RuntimeError('Analysis service error: %s' % response.get('error'))
+        return response
+
+    def ping(self):
+        return self.request({'op': 'ping'})['analyzers']
+
+    def reduce(self, simulations):
+        """
+        :param simulations: list of {'sim_id': ..., 'sim_data': {...}, 'outputs': {filename: local path}}
+        :return: list of {'uid': ..., 'result': {sample: likelihood}}, one per analyzer
+        """
+        return self.request({'op': 'reduce', 'simulations': simulations})['results']
+
+    def reload(self):
+        return self.request({'op': 'reload'})['analyzers']
+
+    def shutdown(self):
+        return self.request({'op': 'shutdown'})
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    module_name, function_name = sys.argv[1].split(':')
+    AnalysisService(getattr(importlib.import_module(module_name), function_name), sys.argv[2]).run()
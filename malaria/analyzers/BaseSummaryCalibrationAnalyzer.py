@@ -2,34 +2,26 @@ import logging
 import threading
 import pandas as pd
 from calibtool.analyzers.BaseComparisonAnalyzer import BaseComparisonAnalyzer
+from malaria.analyzers.SampleAggregateAnalyzer import SampleAggregateAnalyzer
+from malaria.analyzers.SampleAggregates import concat_sample_means
 
 logger = logging.getLogger(__name__)
 thread_lock = threading.Lock()
 
 
-class BaseSummaryCalibrationAnalyzer(BaseComparisonAnalyzer):
-
-    def combine(self, parsers):
-        """
-        Combine the simulation data into a single table for all analyzed simulations.
-        """
-
-        selected = [p.selected_data[id(self)] for p in parsers.values() if id(self) in p.selected_data]
-
-        # Stack selected_data from each parser, adding unique (sim_id) and shared (sample) levels to MultiIndex
-        combine_levels = ['sample', 'sim_id', 'channel']
-        combined = pd.concat(selected, axis=1,
-                             keys=[(d.sample, d.sim_id) for d in selected],
-                             names=combine_levels)
-
-        self.data = combined.groupby(level=['sample', 'channel'], axis=1).mean()
-        logger.debug(self.data)
+class BaseSummaryCalibrationAnalyzer(SampleAggregateAnalyzer, BaseComparisonAnalyzer):
 
     @staticmethod
     def join_reference(sim, ref):
         sim.columns = sim.columns.droplevel(0)  # drop sim 'sample' to match ref levels
         return pd.concat({'sim': sim, 'ref': ref}, axis=1).dropna()
 
+    def sample_table(self, means):
+        """
+        Stack per-sample means (dictionary of sample to the data of one simulation) into the table compared to reference.
+        """
+        return concat_sample_means(means, axis=1, names=['sample', 'channel'])
+
     def compare(self, sample):
         """
         Assess the result per sample, in this case the likelihood
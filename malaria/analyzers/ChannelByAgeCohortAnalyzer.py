@@ -2,9 +2,10 @@ import logging
 from abc import abstractmethod
 import pandas as pd
 import numpy as np
-from malaria.analyzers.Helpers import convert_annualized, convert_to_counts, age_from_birth_cohort, aggregate_on_index
+from malaria.analyzers.Helpers import convert_annualized, convert_to_counts, age_from_birth_cohort, aggregate_on_index, \
+    report_intervals, summary_channel_stack, bin_indicator
 from scipy.stats import binom
-from dtk.utils.parsers.malaria_summary import summary_channel_to_pandas
+from malaria.analyzers.ParsedOutputCache import summary_channel
 from calibtool.analyzers.BaseCalibrationAnalyzer import BaseCalibrationAnalyzer, thread_lock
 from calibtool.LL_calculators import gamma_poisson_pandas, beta_binomial_pandas
 
@@ -47,12 +48,9 @@ class ChannelByAgeCohortAnalyzer(BaseCalibrationAnalyzer):
         Extract data from output data and accumulate in same bins as reference.
         """
 
-        # Load data from simulation
-        data = parser.raw_data[self.filenames[0]]
-
-        # Get channels by age and time series
-        channel_series = summary_channel_to_pandas(data, self.channel)
-        population_series = summary_channel_to_pandas(data, self.population_channel)
+        # Get channels by age and time series (decoded once per simulation for all analyzers)
+        channel_series = summary_channel(parser, self.filenames[0], self.channel)
+        population_series = summary_channel(parser, self.filenames[0], self.population_channel)
         channel_data = pd.concat([channel_series, population_series], axis=1)
 
         # Convert Average Population to Person Years
@@ -78,6 +76,44 @@ class ChannelByAgeCohortAnalyzer(BaseCalibrationAnalyzer):
 
         return sim_data
 
+    def apply_batch(self, parsers):
+        """
+        Extract data from a stack of simulations sharing the same report binning, with the count conversion and
+        re-binning done once on a (simulation, time, age) array. Simulations are analyzed one by one with apply
+        if their reports are binned differently.
+        :return: list of the per-simulation results of apply, in the order of parsers
+        """
+        datas = [parser.raw_data[self.filenames[0]] for parser in parsers]
+        try:
+            rates, bins, metadata = summary_channel_stack(datas, self.channel, bin_order=['Time', 'Age Bin'])
+            pops, _, _ = summary_channel_stack(datas, self.population_channel, bin_order=['Time', 'Age Bin'])
+        except ValueError as e:
+            logger.warning('Analyzing simulations one by one: %s', e)
+            return [self.apply(parser) for parser in parsers]
+
+        # Person Years and Incidents by simulation, time and age
+        times = np.asarray(bins['Time'])
+        intervals = report_intervals(times, metadata.get('Reporting_Interval'), metadata.get('Start_Day'))
+        trials = pops * (intervals / 365.0)[None, :, None]
+        observations = rates * trials
+
+        # Re-bin birth-cohort age (from time) on the reference bins, summing over the reported age bins
+        age_edges = self.reference.index.values
+        age_bins = bin_indicator(times / 365.0, age_edges)
+        observed = age_bins.any(axis=0)
+        binned_trials = np.einsum('nta,tk->nk', np.nan_to_num(trials), age_bins)[:, observed]
+        binned_observations = np.einsum('nta,tk->nk', np.nan_to_num(observations), age_bins)[:, observed]
+        index = pd.CategoricalIndex(age_edges[observed], categories=age_edges, ordered=True, name='Age Bin')
+
+        results = []
+        for parser, obs, tri in zip(parsers, binned_observations, binned_trials):
+            sim_data = pd.DataFrame({'Observations': obs, 'Trials': tri}, index=index, columns=['Observations', 'Trials'])
+            sim_data.sample = parser.sim_data.get('__sample_index__')
+            sim_data.sim_id = parser.sim_id
+            results.append(sim_data)
+
+        return results
+
     @staticmethod
     def error_bars(df):
         return (np.sqrt(df.Observations) / df.Trials).tolist()
@@ -1,12 +1,16 @@
 import logging
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
 
-from dtk.utils.parsers.malaria_summary import summary_channel_to_pandas
+from malaria.analyzers.ParsedOutputCache import summary_channel
 
 from calibtool.analyzers.BaseCalibrationAnalyzer import BaseCalibrationAnalyzer, thread_lock
 from calibtool import LL_calculators
 from calibtool.analyzers.Helpers import \
     convert_to_counts, age_from_birth_cohort, season_from_time, aggregate_on_index
+from malaria.analyzers.Helpers import summary_channel_stack, bin_indicator, category_indicator, month_names
 
 logger = logging.getLogger(__name__)
 
@@ -36,18 +40,15 @@ class ChannelBySeasonAgeDensityCohortAnalyzer(BaseCalibrationAnalyzer):
         Extract data from output simulation data and accumulate in same bins as reference.
         """
 
-        # Load data from simulation
-        data = parser.raw_data[self.filenames[0]]
-
-        # Population by age and time series (to convert parasite prevalence to counts)
-        population = summary_channel_to_pandas(data, self.population_channel)
+        # Population by age and time series (to convert parasite prevalence to counts), decoded once per simulation
+        population = summary_channel(parser, self.filenames[0], self.population_channel)
 
         # Coerce channel data into format for comparison with reference
         channel_data_dict = {}
         for channel in self.channels:
 
             # Prevalence by density, age, and time series
-            channel_data = summary_channel_to_pandas(data, channel)
+            channel_data = summary_channel(parser, self.filenames[0], channel)
 
             with thread_lock:  # TODO: re-code following block to ensure thread safety (Issue #758)?
 
@@ -70,6 +71,63 @@ class ChannelBySeasonAgeDensityCohortAnalyzer(BaseCalibrationAnalyzer):
 
         return sim_data
 
+    def apply_batch(self, parsers):
+        """
+        Extract data from a stack of simulations sharing the same report binning, with the count conversion and
+        re-binning done once on a (simulation, time, density, age) array. Simulations are analyzed one by one with
+        apply if their reports are binned differently.
+        :return: list of the per-simulation results of apply, in the order of parsers
+        """
+        datas = [parser.raw_data[self.filenames[0]] for parser in parsers]
+        try:
+            population, _, _ = summary_channel_stack(datas, self.population_channel, bin_order=['Time', 'Age Bin'])
+            stacks = OrderedDict((channel, summary_channel_stack(datas, channel,
+                                                                 bin_order=['Time', 'PfPR Bin', 'Age Bin'])[:2])
+                                 for channel in self.channels)
+        except ValueError as e:
+            logger.warning('Analyzing simulations one by one: %s', e)
+            return [self.apply(parser) for parser in parsers]
+
+        season_name = 'Season' if self.seasons else 'Month'
+        channel_counts = OrderedDict()
+        for channel, (prevalence, bins) in stacks.items():
+            ref_ix = self.reference.loc(axis=1)[channel].index
+            seasons = ref_ix.levels[ref_ix.names.index(season_name)].values
+            age_edges = ref_ix.levels[ref_ix.names.index('Age Bin')].values
+            pfpr_edges = ref_ix.levels[ref_ix.names.index('PfPR Bin')].values
+
+            # Each report time falls in one (season, birth-cohort age) cell; each reported density in one PfPR bin
+            times = np.asarray(bins['Time'])
+            months = month_names(times)
+            labels = [self.seasons.get(m) for m in months] if self.seasons else months
+            season_bins = category_indicator(labels, seasons)
+            age_bins = bin_indicator(times / 365.0, age_edges)
+            time_cells = (season_bins[:, :, None] * age_bins[:, None, :]).reshape(len(times), -1)
+            pfpr_bins = bin_indicator(bins['PfPR Bin'], pfpr_edges)
+
+            # Counts from prevalence and population, summed over reported age bins and re-binned in one contraction
+            counts = np.nan_to_num(prevalence * population[:, :, None, :]).sum(axis=3)
+            binned = np.einsum('ntp,tc,pj->ncj', counts, time_cells, pfpr_bins)
+            binned = binned.reshape(len(parsers), len(seasons), len(age_edges), len(pfpr_edges))
+
+            observed = time_cells.any(axis=0).reshape(len(seasons), len(age_edges))[:, :, None] \
+                & pfpr_bins.any(axis=0)[None, None, :]
+            cells = np.nonzero(observed)
+            index = pd.MultiIndex.from_arrays([seasons[cells[0]], age_edges[cells[1]], pfpr_edges[cells[2]]],
+                                              names=[season_name, 'Age Bin', 'PfPR Bin'])
+            channel_counts[channel] = (index, binned[:, cells[0], cells[1], cells[2]])
+
+        results = []
+        for i, parser in enumerate(parsers):
+            series = [pd.Series(counts[i], index=index, name='Counts') for index, counts in channel_counts.values()]
+            sim_data = pd.concat(series, keys=list(channel_counts.keys()), names=['Channel'])
+            sim_data = pd.DataFrame(sim_data)  # single-column DataFrame for standardized combine/compare pattern
+            sim_data.sample = parser.sim_data.get('__sample_index__')
+            sim_data.sim_id = parser.sim_id
+            results.append(sim_data)
+
+        return results
+
     @classmethod
     def plot_comparison(cls, fig, data, **kwargs):
         axs = fig.axes
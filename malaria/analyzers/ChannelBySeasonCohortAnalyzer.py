@@ -9,6 +9,7 @@ from scipy.stats import binom
 from calibtool import LL_calculators
 from dtk.utils.parsers.malaria_summary import summary_channel_to_pandas
 from calibtool.analyzers.BaseCalibrationAnalyzer import BaseCalibrationAnalyzer, thread_lock
+from malaria.analyzers.ParsedOutputCache import vector_stats
 from calibtool.analyzers.Helpers import \
     convert_annualized, convert_to_counts, age_from_birth_cohort, aggregate_on_index, aggregate_on_month
 
@@ -34,22 +35,8 @@ class ChannelBySeasonCohortAnalyzer(BaseCalibrationAnalyzer):
         Extract data from output data and accumulate in same bins as reference.
         """
 
-        # Load data from simulation
-        data = parser.raw_data[self.filenames[0]]
-
-        data = data[2*365:]
-        data['Day'] = data['Time'].apply(lambda x: (x + 1) % 365)
-        data = data[['Day', 'Species', 'Population', 'VectorPopulation']]
-        data['Vector_per_Human'] = data['VectorPopulation'] / data['Population']
-        data = data.groupby(['Day', 'Species'])['Vector_per_Human'].apply(np.mean).reset_index()
-
-        dateparser = lambda x: datetime.datetime.strptime(x, '%j').month
-        data['Month'] = data['Day'].apply(lambda x: dateparser(str(x + 1)))
-        data = data.groupby(['Month', 'Species'])['Vector_per_Human'].apply(np.mean).reset_index()
-
-        data = data.rename(columns={'Vector_per_Human': 'Counts', 'Species': 'Channel'})
-        data = data.sort_values(['Channel', 'Month'])
-        data = data.set_index(['Channel', 'Month'])
+        # Monthly vectors per human by species, decoded once per simulation for all analyzers
+        data = vector_stats(parser, self.filenames[0])
         channel_data_dict = {}
 
         for channel in self.site.metadata['species']:
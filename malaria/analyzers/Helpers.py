@@ -203,21 +203,11 @@ def convert_annualized(s, reporting_interval=None, start_day=None):
 
     s_ix = s.index
     time_ix = s_ix.names.index('Time')
-    time_levels = s_ix.levels[time_ix].values
+    time_intervals = report_intervals(s_ix.levels[time_ix].values, reporting_interval, start_day)
 
-    start_time = (start_day - 1) if start_day else 0  # metadata reported at end of first time step
-
-    time_intervals = np.diff(np.insert(time_levels, 0, values=start_time))  # prepending simulation Start_Time
-
-    if reporting_interval and len(time_intervals) > 1 and np.abs(time_intervals[0] - reporting_interval) > 1:
-        raise Exception('Time differences between reports differ by more than integer rounding.')
-    if len(time_intervals) > 2 and np.abs(time_intervals[0] - time_intervals[1]) > 1:
-        raise Exception('Time differences between reports differ by more than integer rounding.')
-
-    intervals_by_time = dict(zip(time_levels, time_intervals))
-    df = s.reset_index()
-    df[s.name] *= df.Time.apply(lambda x: intervals_by_time[x] / 365.0)
-    return df.set_index(s_ix.names)
+    # Broadcast the interval of each 'Time' level value to the rows through the level codes
+    time_codes = index_level_codes(s_ix, time_ix)
+    return (s * (time_intervals[time_codes] / 365.0)).to_frame()
 
 
 def convert_to_counts(rates, pops):
@@ -230,15 +220,104 @@ def convert_to_counts(rates, pops):
     rate_idx = rates.index.names
     pop_idx = pops.index.names
 
-    # Join rates to population counts on the binning of the latter
-    df = rates.reset_index().set_index(pop_idx)\
-              .join(pops, how='left')\
-              .reset_index().set_index(rate_idx)
+    # Align population counts to the rates on the binning of the latter (e.g. broadcast over 'PfPR Bin')
+    key = rates.index
+    extra_levels = [name for name in rate_idx if name not in pop_idx]
+    if extra_levels:
+        key = key.droplevel(extra_levels)
+    if isinstance(key, pd.MultiIndex) and list(key.names) != list(pop_idx):
+        key = key.reorder_levels(pop_idx)
 
-    counts = (df[rates.name] * df[pops.name]).rename(rates.name)
+    counts = (rates * pops.reindex(key).values).rename(rates.name)
     return counts
 
 
+def index_level_codes(ix, level):
+    """
+    Integer codes of a MultiIndex level, i.e. the position of each row's value in ix.levels[level]
+    """
+    codes = ix.codes if hasattr(ix, 'codes') else ix.labels  # renamed in pandas 0.24
+    return np.asarray(codes[level])
+
+
+def report_intervals(times, reporting_interval=None, start_day=None):
+    """
+    Duration of the aggregation interval ending at each report time
+    :param times: array of report times
+    :param reporting_interval: (optional) metadata from original output file on interval related to times
+    :param start_day: (optional) metadata from original output file on beginning of first aggregation interval
+    :return: numpy array of intervals in days
+    """
+    start_time = (start_day - 1) if start_day else 0  # metadata reported at end of first time step
+
+    time_intervals = np.diff(np.insert(np.asarray(times), 0, values=start_time))  # prepending simulation Start_Time
+
+    if reporting_interval and len(time_intervals) > 1 and np.abs(time_intervals[0] - reporting_interval) > 1:
+        raise Exception('Time differences between reports differ by more than integer rounding.')
+    if len(time_intervals) > 2 and np.abs(time_intervals[0] - time_intervals[1]) > 1:
+        raise Exception('Time differences between reports differ by more than integer rounding.')
+
+    return time_intervals
+
+
+def summary_channel_stack(datas, channel, bin_order=None):
+    """
+    Stack one channel of summary reports sharing the same binning into a single array
+    :param datas: list of MalariaSummaryReport json dictionaries, one per simulation
+    :param channel: channel name
+    :param bin_order: (optional) list of bin names giving the order of the array axes after the simulation axis
+    :return: (numpy array of shape (simulations, bins...), OrderedDict of bin name to bin values, report Metadata)
+    :raises ValueError: if the reports are not binned identically
+    """
+    grouping = malaria_summary.get_grouping_for_summary_channel(datas[0], channel)
+    bins = malaria_summary.get_bins_for_summary_grouping(datas[0], grouping)
+    metadata = datas[0]['Metadata']
+
+    for data in datas[1:]:
+        if malaria_summary.get_bins_for_summary_grouping(data, grouping) != bins \
+                or data['Metadata'].get('Start_Day') != metadata.get('Start_Day') \
+                or data['Metadata'].get('Reporting_Interval') != metadata.get('Reporting_Interval'):
+            raise ValueError('Summary reports are not binned identically for channel %s' % channel)
+
+    stack = np.array([data[grouping][channel] for data in datas], dtype=float)
+    if stack.shape[1:] != tuple(len(v) for v in bins.values()):
+        raise ValueError('Unexpected shape %s of channel %s for bins %s' % (stack.shape[1:], channel, list(bins)))
+
+    if bin_order:
+        names = list(bins.keys())
+        stack = np.transpose(stack, [0] + [1 + names.index(name) for name in bin_order])
+        bins = OrderedDict((name, bins[name]) for name in bin_order)
+
+    return stack, bins, metadata
+
+
+def bin_indicator(values, edges):
+    """
+    One-hot matrix assigning values to bins by right edges, as pd.cut(values, [-inf] + edges)
+    :param values: array of values
+    :param edges: sorted array of right-bin-edges
+    :return: float array of shape (len(values), len(edges)); rows of values beyond the last edge are all zeros
+    """
+    bin_ix = np.searchsorted(np.asarray(edges), np.asarray(values), side='left')
+    return (bin_ix[:, None] == np.arange(len(edges))[None, :]).astype(float)
+
+
+def category_indicator(values, categories):
+    """
+    One-hot matrix assigning values to categories
+    :return: float array of shape (len(values), len(categories)); rows of values not in categories are all zeros
+    """
+    values = np.asarray(values, dtype=object)
+    return np.array([[v == c for c in categories] for v in values], dtype=float).reshape(len(values), len(categories))
+
+
+def month_names(times):
+    """
+    Month name of each Time (in days), as in season_from_time
+    """
+    return [calendar.month_name[date.fromordinal(int(1 + t % 365)).month] for t in times]
+
+
 def age_from_birth_cohort(df):
     """
     Reinterpret 'Time' as 'Age Bin' for a birth cohort
@@ -0,0 +1,164 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class GaussianProcess(object):
+    """
+    Gaussian-process regression with a squared-exponential kernel on inputs scaled to the unit box, fitted by exact
+    Cholesky factorization (numpy only). The length scale is chosen from a grid by marginal likelihood.
+    """
+
+    def __init__(self, length_scales=(0.05, 0.1, 0.2, 0.4, 0.8), noise=0.05):
+        """
+        :param length_scales: candidate kernel length scales, in units of the parameter ranges
+        :param noise: observation noise variance, as a fraction of the variance of the outputs
+        """
+        self.length_scales = length_scales
+        self.noise = noise
+
+    @staticmethod
+    def _kernel(a, b, length_scale):
+        d2 = ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2)
+        return np.exp(-0.5 * d2 / length_scale ** 2)
+
+    def fit(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.y_mean, self.y_std = y.mean(), y.std() or 1.0
+        z = (y - self.y_mean) / self.y_std
+
+        best = None
+        for length_scale in self.length_scales:
+            k = self._kernel(x, x, length_scale) + self.noise * np.eye(len(x))
+            try:
+                chol = np.linalg.cholesky(k)
+            except np.linalg.LinAlgError:
+                continue
+            alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, z))
+            log_marginal = -0.5 * z.dot(alpha) - np.log(np.diag(chol)).sum()
+            if best is None or log_marginal > best[0]:
+                best = (log_marginal, length_scale, chol, alpha)
+
+        if best is None:
+            raise ValueError('Gaussian process could not be fitted to %d points' % len(x))
+        _, self.length_scale, self.chol, self.alpha = best
+        self.x = x
+        return self
+
+    def predict(self, x):
+        """
+        :return: (mean, standard deviation) arrays of the predicted outputs
+        """
+        x = np.asarray(x, dtype=float)
+        k = self._kernel(x, self.x, self.length_scale)
+        mean = k.dot(self.alpha)
+        v = np.linalg.solve(self.chol, k.T)
+        variance = np.clip(1 + self.noise - (v ** 2).sum(axis=0), 0, None)
+        return self.y_mean + self.y_std * mean, self.y_std * np.sqrt(variance)
+
+
+class LikelihoodEmulator(object):
+    """
+    Emulator of the calibration likelihood of a parameter point, trained on the (sample parameters, per-analyzer
+    likelihood) pairs of past iterations, to pre-screen proposed samples before simulating them.
+
+    One Gaussian process is fitted per analyzer; the emulated total likelihood is their sum, with variances added.
+    A proposed sample is skipped when even its optimistic likelihood (mean + z standard deviations) falls below a
+    quantile of the likelihoods seen so far, i.e. when it is predicted to be poor with high confidence.
+    """
+
+    def __init__(self, param_names, likelihood_columns, max_points=1500, z=2.0, quantile=0.5, **gp_kwargs):
+        """
+        :param param_names: names of the calibrated parameters
+        :param likelihood_columns: names of the per-analyzer likelihood columns (already weighted)
+        :param max_points: maximum number of past samples fitted (the most recent are kept)
+        :param z: number of standard deviations of optimism when screening
+        :param quantile: quantile of the past total likelihoods below which samples are considered poor
+        :param gp_kwargs: arguments of GaussianProcess
+        """
+        self.param_names = list(param_names)
+        self.likelihood_columns = list(likelihood_columns)
+        self.max_points = max_points
+        self.z = z
+        self.quantile = quantile
+        self.gp_kwargs = gp_kwargs
+
+    def _scale(self, params):
+        x = np.asarray(params[self.param_names], dtype=float)
+        return (x - self.lower) / self.span
+
+    def fit(self, history):
+        """
+        :param history: pandas.DataFrame of past samples with the parameter and likelihood columns
+        """
+        history = history.dropna(subset=self.param_names + self.likelihood_columns).iloc[-self.max_points:]
+        x = np.asarray(history[self.param_names], dtype=float)
+        self.lower = x.min(axis=0)
+        self.span = np.where(x.max(axis=0) > self.lower, x.max(axis=0) - self.lower, 1.0)
+
+        x = self._scale(history)
+        self.processes = [GaussianProcess(**self.gp_kwargs).fit(x, history[c].values) for c in self.likelihood_columns]
+        self.threshold = history[self.likelihood_columns].sum(axis=1).quantile(self.quantile)
+        logger.debug('Emulator fitted to %d samples; length scales %s; threshold %f', len(history),
+                     [gp.length_scale for gp in self.processes], self.threshold)
+        return self
+
+    def predict(self, params):
+        """
+        :param params: pandas.DataFrame of proposed samples with the parameter columns
+        :return: pandas.DataFrame with the emulated total likelihood mean and std of each sample
+        """
+        x = self._scale(params)
+        predictions = [gp.predict(x) for gp in self.processes]
+        mean = np.sum([m for m, _ in predictions], axis=0)
+        std = np.sqrt(np.sum([s ** 2 for _, s in predictions], axis=0))
+        return pd.DataFrame({'mean': mean, 'std': std}, index=params.index, columns=['mean', 'std'])
+
+    def screen(self, params):
+        """
+        :param params: pandas.DataFrame of proposed samples with the parameter columns
+        :return: boolean pandas.Series, True for samples worth simulating
+        """
+        prediction = self.predict(params)
+        keep = prediction['mean'] + self.z * prediction['std'] >= self.threshold
+        logger.info('Emulator pre-screening keeps %d of %d proposed samples', keep.sum(), len(keep))
+        return keep
+
+    def prioritize(self, params):
+        """
+        :return: the proposed samples ordered by optimistic emulated likelihood, most promising first
+        """
+        prediction = self.predict(params)
+        return params.loc[(prediction['mean'] + self.z * prediction['std']).sort_values(ascending=False).index]
+
+
+def replay_screening(history, param_names, likelihood_columns, iteration_column='iteration', top_quantile=0.9,
+                     **kwargs):
+    """
+    Replay a past calibration: screen the samples of each iteration with an emulator trained on all earlier
+    iterations, and count the simulations that would have been avoided.
+
+    :param history: pandas.DataFrame of past samples with iteration, parameter and likelihood columns
+    :param top_quantile: samples of an iteration above this quantile of its total likelihood count as good
+    :param kwargs: arguments of LikelihoodEmulator
+    :return: pandas.DataFrame by iteration of proposed, skipped and wrongly skipped (good) samples
+    """
+    rows = []
+    iterations = sorted(history[iteration_column].unique())
+    for iteration in iterations[1:]:
+        past = history[history[iteration_column] < iteration]
+        current = history[history[iteration_column] == iteration]
+        emulator = LikelihoodEmulator(param_names, likelihood_columns, **kwargs).fit(past)
+        keep = emulator.screen(current)
+
+        total = current[likelihood_columns].sum(axis=1)
+        good = total >= total.quantile(top_quantile)
+        rows.append({'iteration': iteration, 'proposed': len(current), 'skipped': int((~keep).sum()),
+                     'good_skipped': int((~keep & good).sum()), 'good': int(good.sum())})
+
+    replay = pd.DataFrame(rows, columns=['iteration', 'proposed', 'skipped', 'good_skipped', 'good'])
+    return replay.set_index('iteration')
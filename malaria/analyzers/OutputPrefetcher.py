@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+
+class LocalDirectoryStore(object):
+    """
+    Output store reading simulation outputs from a local or mounted directory laid out as <root>/<sim_id>/<filename>;
+    also the stand-in for a remote store when testing.
+
+    A store only needs a fetch(sim_id, filename, destination) method writing the file to the destination path.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def fetch(self, sim_id, filename, destination):
+        shutil.copyfile(os.path.join(self.root, str(sim_id), filename), destination)
+
+
+class ContentCache(object):
+    """
+    Local content-addressed cache of output files: files are stored once by the sha256 of their content, and a
+    manifest maps each (simulation, filename) to its content hash.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.objects = os.path.join(root, 'objects')
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self.lock = threading.Lock()
+        if not os.path.exists(self.objects):
+            os.makedirs(self.objects)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as fin:
+                self.manifest = json.load(fin)
+
+    @staticmethod
+    def _key(sim_id, filename):
+        return '%s/%s' % (sim_id, filename)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects, digest[:2], digest)
+
+    def get(self, sim_id, filename):
+        """
+        :return: local path of the cached file, or None if it is not cached
+        """
+        digest = self.manifest.get(self._key(sim_id, filename))
+        if digest and os.path.exists(self._object_path(digest)):
+            return self._object_path(digest)
+        return None
+
+    def put(self, sim_id, filename, path):
+        """
+        Move a downloaded file into the cache.
+        :return: local path of the cached file
+        """
+        sha = hashlib.sha256()
+        with open(path, 'rb') as fin:
+            for chunk in iter(lambda: fin.read(1 << 20), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        object_path = self._object_path(digest)
+
+        with self.lock:
+            if os.path.exists(object_path):
+                os.remove(path)  # identical content is already cached
+            else:
+                if not os.path.exists(os.path.dirname(object_path)):
+                    os.makedirs(os.path.dirname(object_path))
+                shutil.move(path, object_path)
+            self.manifest[self._key(sim_id, filename)] = digest
+        return object_path
+
+    def save_manifest(self):
+        with self.lock:
+            tmp = self.manifest_path + '.tmp'
+            with open(tmp, 'w') as fout:
+                json.dump(self.manifest, fout)
+            os.rename(tmp, self.manifest_path)
+
+
+def analyzer_filenames(analyzers):
+    """
+    The output files declared by a list of analyzers, without duplicates, in order of declaration
+    """
+    return list(OrderedDict((f, None) for analyzer in analyzers for f in analyzer.filenames))
+
+
+class OutputPrefetcher(object):
+    """
+    Fetch the output files declared by the analyzers of a calibration concurrently into a local content-addressed
+    cache, handing each simulation over as soon as all its files are local so it can be analyzed while the files of
+    later simulations are still being transferred.
+    """
+
+    def __init__(self, store, cache_dir, analyzers=None, filenames=None, max_connections=8):
+        """
+        :param store: output store with a fetch(sim_id, filename, destination) method (e.g. LocalDirectoryStore)
+        :param cache_dir: directory of the local cache
+        :param analyzers: analyzers whose declared filenames are fetched
+        :param filenames: (optional) additional output files to fetch
+        :param max_connections: maximum number of concurrent transfers
+        """
+        self.store = store
+        self.cache = ContentCache(cache_dir)
+        self.filenames = analyzer_filenames(analyzers or [])
+        self.filenames += [f for f in filenames or [] if f not in self.filenames]
+        self.max_connections = max_connections
+
+    def _fetch(self, sim_id, filename):
+        cached = self.cache.get(sim_id, filename)
+        if cached:
+            return cached
+        fd, tmp = tempfile.mkstemp(dir=self.cache.root, suffix='.part')
+        os.close(fd)
+        try:
+            self.store.fetch(sim_id, filename, tmp)
+        except Exception:
+            os.remove(tmp)
+            raise
+        return self.cache.put(sim_id, filename, tmp)
+
+    def prefetch(self, sim_ids):
+        """
+        :param sim_ids: simulations to fetch, in the order they should preferably be transferred
+        :return: generator of (sim_id, dictionary of filename to local path) in order of completion; the path is None
+            for files that could not be fetched
+        """
+        if not self.filenames:
+            for sim_id in sim_ids:
+                yield sim_id, {}
+            return
+
+        pending = {}
+        futures = {}
+        executor = ThreadPoolExecutor(max_workers=self.max_connections)
+        try:
+            for sim_id in sim_ids:
+                pending[sim_id] = {}
+                for filename in self.filenames:
+                    futures[executor.submit(self._fetch, sim_id, filename)] = (sim_id, filename)
+
+            for future in as_completed(futures):
+                sim_id, filename = futures[future]
+                try:
+                    pending[sim_id][filename] = future.result()
+                except Exception as e:
+                    logger.error('Could not fetch %s of simulation %s: %s', filename, sim_id, e)
+                    pending[sim_id][filename] = None
+                if len(pending[sim_id]) == len(self.filenames):
+                    yield sim_id, pending.pop(sim_id)
+        finally:
+            for future in futures:  # e.g. the consumer stopped early: drop the transfers not yet started
+                future.cancel()
+            executor.shutdown(wait=True)  # and let those in progress land in the cache before the manifest is saved
+            self.cache.save_manifest()
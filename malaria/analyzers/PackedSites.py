@@ -0,0 +1,99 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def packed_sites(sim_data):
+    """
+    :return: names of the sites packed in a simulation (see malaria.study_sites.site_packing), empty if it is not packed
+    """
+    sites = sim_data.get('__sites__') or []
+    return [site for site in sites.split(',') if site] if isinstance(sites, str) else list(sites)
+
+
+def packed_filename(filename, site):
+    """
+    Output file of the node of a site in a packed simulation, e.g. output/MalariaSummaryReport_Annual_Report.json
+    becomes output/MalariaSummaryReport_Annual_Report_Namawala.json
+    """
+    root, ext = os.path.splitext(filename)
+    return '%s_%s%s' % (root, site, ext)
+
+
+class _SiteOutputFiles(dict):
+    """
+    Output files of one site of a packed simulation, under the names the site analyzers expect.
+    """
+
+    def __init__(self, raw_data, site):
+        super(_SiteOutputFiles, self).__init__()
+        self.raw_data = raw_data
+        self.site = site
+
+    def __missing__(self, filename):
+        value = self[filename] = self.raw_data[packed_filename(filename, self.site)]
+        return value
+
+
+class SiteOutputParser(object):
+    """
+    Parser of the outputs of one site of a packed simulation, seen by the site analyzers as a simulation of that site
+    alone: its sim_data has the site as __site__ and the input EIR of the site as monthlyEIRs, and its output files
+    are those of the site node.
+    """
+
+    def __init__(self, parser, site):
+        self.parser = parser
+        self.site = site
+        self.sim_id = '%s_%s' % (parser.sim_id, site)
+        self.sim_data = dict(parser.sim_data, __site__=site)
+        if 'monthlyEIRs_%s' % site in self.sim_data:
+            self.sim_data['monthlyEIRs'] = self.sim_data['monthlyEIRs_%s' % site]
+        self.raw_data = _SiteOutputFiles(parser.raw_data, site)
+        self.selected_data = {}
+
+    def release(self):
+        self.raw_data.clear()
+        self.__dict__.pop('_parsed_output_cache', None)
+
+
+def split_packed_parser(parser):
+    """
+    Route the outputs of a packed simulation to its sites.
+    :return: list of one SiteOutputParser per packed site, or of the parser itself if the simulation is not packed
+    """
+    sites = packed_sites(parser.sim_data)
+    if not sites:
+        return [parser]
+    return [SiteOutputParser(parser, site) for site in sites]
+
+
+class PackedSiteAnalyzer(object):
+    """
+    Adapter applying the analyzer of a site to the node of that site in packed simulations, for analysis managers
+    that apply analyzers to whole simulations: it selects the packed simulations containing the site, declares the
+    site output files, and hands the analyzer a SiteOutputParser. Everything else is the analyzer's.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.site_name = analyzer.site.name
+        self.filenames = [packed_filename(f, self.site_name) for f in analyzer.filenames]
+
+    def __getattr__(self, name):
+        if name == 'analyzer':  # not yet set, e.g. while unpickling
+            raise AttributeError(name)
+        return getattr(self.analyzer, name)
+
+    def filter(self, sim_metadata):
+        return self.site_name in packed_sites(sim_metadata)
+
+    def apply(self, parser):
+        return self.analyzer.apply(SiteOutputParser(parser, self.site_name))
+
+    def combine(self, parsers):
+        for parser in (parsers.values() if hasattr(parsers, 'values') else parsers):
+            if id(self) in parser.selected_data:
+                parser.selected_data[id(self.analyzer)] = parser.selected_data[id(self)]
+        return self.analyzer.combine(parsers)
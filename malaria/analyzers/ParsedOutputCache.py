@@ -0,0 +1,76 @@
+import datetime
+import logging
+import threading
+
+import numpy as np
+
+from dtk.utils.parsers.malaria_summary import summary_channel_to_pandas
+
+logger = logging.getLogger(__name__)
+
+_cache_lock = threading.Lock()
+
+
+def parsed_output(parser, filename, key, decode):
+    """
+    Decode an output file of a simulation once, for every analyzer of that simulation needing the same typed form.
+
+    Decoded forms are kept on the parser, so they are released with it; they are shared between analyzers and must
+    be treated as read-only (copy before modifying).
+
+    :param parser: the output parser of the simulation
+    :param filename: output file, as in the analyzer filenames
+    :param key: hashable identifier of the decoded form (e.g. a channel name)
+    :param decode: function of the raw file data returning the decoded form
+    :return: the decoded form
+    """
+    with _cache_lock:
+        cache = parser.__dict__.setdefault('_parsed_output_cache', {})
+        entry = cache.get((filename, key))
+        if entry is None:
+            entry = cache[(filename, key)] = {'lock': threading.Lock()}
+
+    with entry['lock']:  # other analyzers of the same simulation wait for the first decode rather than repeat it
+        if 'value' not in entry:
+            entry['value'] = decode(parser.raw_data[filename])
+            logger.debug('Decoded %s (%s) for simulation %s', filename, key, parser.sim_id)
+        return entry['value']
+
+
+def summary_channel(parser, filename, channel):
+    """
+    A channel of a MalariaSummaryReport as a pandas.Series (see summary_channel_to_pandas), decoded once per simulation
+    """
+    return parsed_output(parser, filename, ('summary_channel', channel),
+                         lambda data: summary_channel_to_pandas(data, channel))
+
+
+def vector_stats_by_month(data, by_node=False):
+    """
+    Mean vectors per human by month and species (and node) from ReportVectorStats, after two years of burn-in
+    :param data: pandas.DataFrame of ReportVectorStats.csv
+    :param by_node: keep the NodeID level
+    :return: pandas.DataFrame of 'Counts' indexed by Channel (species), Month (and NodeID)
+    """
+    nodes = ['NodeID'] if by_node else []
+
+    data = data[2*365:][['Time'] + nodes + ['Species', 'Population', 'VectorPopulation']].copy()
+    data['Day'] = (data['Time'] + 1) % 365
+    data['Vector_per_Human'] = data['VectorPopulation'] / data['Population']
+    data = data.groupby(['Day'] + nodes + ['Species'])['Vector_per_Human'].apply(np.mean).reset_index()
+
+    months = {day: datetime.datetime.strptime(str(day + 1), '%j').month for day in data['Day'].unique()}
+    data['Month'] = data['Day'].map(months)
+    data = data.groupby(['Month'] + nodes + ['Species'])['Vector_per_Human'].apply(np.mean).reset_index()
+
+    data = data.rename(columns={'Vector_per_Human': 'Counts', 'Species': 'Channel'})
+    data = data.sort_values(['Channel', 'Month'] + nodes)
+    return data.set_index(['Channel', 'Month'] + nodes)
+
+
+def vector_stats(parser, filename, by_node=False):
+    """
+    Monthly vectors per human from ReportVectorStats (see vector_stats_by_month), decoded once per simulation
+    """
+    return parsed_output(parser, filename, ('vector_stats_by_month', by_node),
+                         lambda data: vector_stats_by_month(data, by_node=by_node))
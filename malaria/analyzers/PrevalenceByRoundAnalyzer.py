@@ -5,11 +5,14 @@ import pandas as pd
 
 from calibtool import LL_calculators
 from calibtool.analyzers.BaseCalibrationAnalyzer import BaseCalibrationAnalyzer
+from malaria.analyzers.SampleAggregateAnalyzer import SampleAggregateAnalyzer
+from malaria.analyzers.SampleAggregates import concat_sample_means
+from malaria.analyzers.SharedInputs import share_frames
 
 logger = logging.getLogger(__name__)
 
 
-class PrevalenceByRoundAnalyzer(BaseCalibrationAnalyzer):
+class PrevalenceByRoundAnalyzer(SampleAggregateAnalyzer, BaseCalibrationAnalyzer):
 
     required_reference_types = ['prevalence_by_round']
 
@@ -19,6 +22,7 @@ class PrevalenceByRoundAnalyzer(BaseCalibrationAnalyzer):
 
     def __init__(self, site, weight=1, compare_fn=LL_calculators.euclidean_distance, **kwargs):
         super(PrevalenceByRoundAnalyzer, self).__init__(site, weight, compare_fn)
+        self.streaming = kwargs.get('streaming', False)  # fold results into running per-sample moments
         self.reference = site.get_reference_data('prevalence_by_round')
         self.refdf = pd.DataFrame(self.reference)
         self.regions = site.get_region_list()
@@ -31,6 +35,13 @@ class PrevalenceByRoundAnalyzer(BaseCalibrationAnalyzer):
         else :
             self.filenames = region_filenames
 
+    def share_inputs(self):
+        '''
+        Publish the reference data once in shared memory: worker processes receiving this analyzer then read zero-copy read-only
+        views instead of each unpickling its own copy. Release with unlink_shared_inputs(analyzer) after analysis.
+        '''
+        return share_frames(self, ['refdf'])
+
     def filter(self, sim_metadata):
         '''
         This analyzer only needs to analyze simulations for the site it is linked to.
@@ -73,19 +84,17 @@ class PrevalenceByRoundAnalyzer(BaseCalibrationAnalyzer):
         channel_data.sample = parser.sim_data.get('__sample_index__')
         channel_data.sim_id = parser.sim_id
 
+        if self.streaming:
+            return self.fold(channel_data)
+
         return channel_data
 
-    def combine(self, parsers):
+    def sample_table(self, means):
         '''
-        Combine the simulation data into a single table for all analyzed simulations.
+        Stack per-sample means (dictionary of sample to the data of one simulation) into the table compared to reference.
         '''
-        selected = [p.selected_data[id(self)] for p in parsers.values() if id(self) in p.selected_data]
-        combined = pd.concat(selected, axis=1,
-                             keys=[(d.sample, d.sim_id) for d in selected],
-                             names=self.data_group_names)
-        stacked = combined.stack(['sample', 'sim_id'])
-        self.data = stacked.groupby(level=['sample', 'region', 'sim_date']).mean()
-        logger.debug(self.data)
+        table = concat_sample_means(means).dropna(how='all')
+        return table.reorder_levels(['sample', 'region', 'sim_date']).sort_index()
 
     def compare(self, sample):
         '''
@@ -0,0 +1,124 @@
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def likelihood_uncertainty(analyzer, aggregate, n_draws=100, seed=None):
+    """
+    Propagate the spread of the replicates of each sample to the likelihood of its mean.
+
+    The mean over n replicates is drawn from Normal(mean, variance / n) in every bin (clipped at zero, as analyzer
+    outputs are counts, prevalences or risks) and compared to reference; the standard deviation of the likelihood
+    over the draws measures how stable the sample likelihood is.
+
+    :param analyzer: calibration analyzer with sample_table and compare methods
+    :param aggregate: the SampleAggregate or RunningSampleMoments combined by the analyzer
+    :param n_draws: number of draws per sample
+    :param seed: (optional) seed of the draws
+    :return: pandas.DataFrame indexed by sample with columns likelihood, std and replicates; std is infinite for
+        samples with a single replicate
+    """
+    rng = np.random.RandomState(seed)
+    means = aggregate.means()
+    variances = aggregate.variances()
+
+    rows = []
+    for sample in aggregate.samples():
+        n = aggregate.replicates(sample)
+        mean = means[sample]
+        likelihood = analyzer.compare(analyzer.sample_table({sample: mean}))
+
+        std = np.inf
+        if n > 1:
+            stderr = (variances[sample] / n).fillna(0) ** 0.5
+            draws = [analyzer.compare(analyzer.sample_table(
+                        {sample: (mean + stderr * rng.standard_normal(mean.shape)).clip(lower=0)}))
+                     for _ in range(n_draws)]
+            std = float(np.std(draws, ddof=1))
+        rows.append({'sample': sample, 'likelihood': likelihood, 'std': std, 'replicates': n})
+
+    return pd.DataFrame(rows, columns=['sample', 'likelihood', 'std', 'replicates']).set_index('sample')
+
+
+class ReplicatePlanner(object):
+    """
+    Decide how many more replicates each sample needs before its likelihood is stable within a tolerance.
+
+    The standard deviation of the likelihood of a mean over n replicates shrinks as 1/sqrt(n), so a sample with
+    likelihood standard deviation std needs n * (std / tolerance)^2 replicates in all. Samples that are clearly poor,
+    i.e. whose likelihood is below that of the best sample even allowing z standard deviations for both, need none.
+    """
+
+    def __init__(self, tolerance=1.0, min_replicates=2, max_replicates=10, z=2.0):
+        """
+        :param tolerance: acceptable standard deviation of the (weighted, summed) sample log-likelihood
+        :param min_replicates: number of replicates needed to estimate any spread
+        :param max_replicates: maximum number of replicates of a sample
+        :param z: number of standard deviations separating clearly poor samples from the best
+        """
+        self.tolerance = tolerance
+        self.min_replicates = min_replicates
+        self.max_replicates = max_replicates
+        self.z = z
+
+    @staticmethod
+    def uncertainty(analyzers, n_draws=100, seed=None):
+        """
+        Weighted sum of the likelihoods of several analyzers (e.g. of all sites), with their uncertainties combined
+        as independent.
+
+        :param analyzers: combined analyzers with a likelihood_uncertainty method
+        :return: pandas.DataFrame indexed by sample with columns likelihood, std and replicates
+        """
+        total = None
+        for analyzer in analyzers:
+            weight = getattr(analyzer, 'weight', 1)
+            u = analyzer.likelihood_uncertainty(n_draws=n_draws, seed=seed)
+            u = pd.DataFrame({'likelihood': weight * u.likelihood,
+                              'variance': (weight * u['std']) ** 2,
+                              'replicates': u.replicates})
+            if total is None:
+                total = u
+            else:
+                total = pd.DataFrame({'likelihood': total.likelihood + u.likelihood,
+                                      'variance': total.variance + u.variance,
+                                      'replicates': np.minimum(total.replicates, u.replicates)})
+        total['std'] = np.sqrt(total.pop('variance'))
+        return total[['likelihood', 'std', 'replicates']]
+
+    def plan(self, uncertainty):
+        """
+        :param uncertainty: pandas.DataFrame indexed by sample with columns likelihood, std and replicates
+            (see :py:meth:`uncertainty` or the likelihood_uncertainty method of an analyzer)
+        :return: pandas.Series of the number of additional replicates needed by each sample (0 if none)
+        """
+        best_lower = (uncertainty.likelihood - self.z * uncertainty['std']).max()
+        poor = uncertainty.likelihood + self.z * uncertainty['std'] < best_lower
+
+        extra = {}
+        for sample, row in uncertainty.iterrows():
+            n = int(row.replicates)
+            if n < self.min_replicates:
+                needed = self.min_replicates
+            elif poor[sample]:
+                needed = n
+            elif not np.isfinite(row['std']):  # spread unknown or unbounded: as many replicates as allowed
+                needed = self.max_replicates
+            else:
+                needed = int(math.ceil(n * (row['std'] / self.tolerance) ** 2))
+            extra[sample] = max(0, min(needed, self.max_replicates) - n)
+
+        extra = pd.Series(extra, name='extra_replicates').reindex(uncertainty.index)
+        logger.info('%d of %d samples need %d more replicates; %d samples are clearly poor',
+                    (extra > 0).sum(), len(extra), extra.sum(), poor.sum())
+        return extra
+
+    def plan_analyzers(self, analyzers, n_draws=100, seed=None):
+        """
+        Number of additional replicates needed by each sample, from the combined analyzers of an iteration.
+        """
+        return self.plan(self.uncertainty(analyzers, n_draws=n_draws, seed=seed))
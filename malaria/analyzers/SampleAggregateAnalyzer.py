@@ -0,0 +1,74 @@
+import logging
+import threading
+
+from malaria.analyzers.SampleAggregates import SampleAggregate, RunningSampleMoments, selected_data, \
+    merge_aggregates, concat_sample_means
+from malaria.analyzers.ReplicatePlanner import likelihood_uncertainty
+from malaria.analyzers.SharedInputs import shared_state, restore_shared_state
+
+logger = logging.getLogger(__name__)
+thread_lock = threading.Lock()
+
+
+class SampleAggregateAnalyzer(object):
+    """
+    Mixin of calibration analyzers combining their per-simulation output through mergeable per-sample aggregates (see
+    SampleAggregates) into the table of per-sample means over replicates, which sample_table arranges for compare.
+
+    In streaming mode, apply returns fold(data): the data of each simulation is folded into running per-sample moments
+    instead of being kept until combine (apply must then run in the process that calls combine).
+    """
+
+    streaming = False
+
+    def fold(self, data):
+        """
+        Streaming combine: fold the data of one simulation into the running per-sample moments, so it is not kept.
+        """
+        with thread_lock:
+            if getattr(self, 'moments', None) is None:
+                self.moments = RunningSampleMoments()
+            self.moments.add(data.sample, data)
+
+    def combine(self, parsers):
+        """
+        Combine the simulation data into a single table for all analyzed simulations.
+        """
+        partials = [self.reduce(parsers)]
+        if self.streaming:
+            partials.append(getattr(self, 'moments', None))
+        self.combine_partials(partials)
+
+    def reduce(self, parsers):
+        """
+        Reduce the simulation data selected from the parsers to a mergeable partial aggregate of per-sample sums
+        and replicate counts, e.g. in a worker process analyzing a shard of the simulations.
+        """
+        aggregate = RunningSampleMoments if self.streaming else SampleAggregate
+        return aggregate.from_selected(selected_data(parsers, self))
+
+    def combine_partials(self, partials):
+        """
+        Combine the partial aggregates of all shards into the table of per-sample means over replicates.
+        """
+        self.aggregate = merge_aggregates(partials)
+        self.data = self.sample_table(self.aggregate.means())
+        logger.debug(self.data)
+
+    def sample_table(self, means):
+        """
+        Stack per-sample means (dictionary of sample to the data of one simulation) into the table compared to reference.
+        """
+        return concat_sample_means(means)
+
+    def likelihood_uncertainty(self, n_draws=100, seed=None):
+        """
+        Per-sample likelihood and its standard deviation from the spread of the replicates (see ReplicatePlanner).
+        """
+        return likelihood_uncertainty(self, self.aggregate, n_draws=n_draws, seed=seed)
+
+    def __getstate__(self):
+        return shared_state(self)
+
+    def __setstate__(self, state):
+        restore_shared_state(self, state)
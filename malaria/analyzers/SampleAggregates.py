@@ -0,0 +1,246 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def selected_data(parsers, analyzer):
+    """
+    The data selected by an analyzer from each parser that it analyzed
+    :param parsers: dictionary (as passed to combine) or list of parsers
+    :param analyzer: the analyzer whose apply produced the data
+    :return: list of per-simulation data
+    """
+    if hasattr(parsers, 'values'):
+        parsers = parsers.values()
+    selected = [p.selected_data.get(id(analyzer)) for p in parsers]
+    return [data for data in selected if data is not None]  # None when folded into a streaming combine
+
+
+def _chan_update(a, b):
+    """
+    Chan's parallel update of the (counts, means, sums of squared deviations) of two disjoint sets of values, bin by
+    bin over the union of their bins
+    """
+    na, ma, m2a = a
+    nb, mb, m2b = b
+    na, nb = na.align(nb, fill_value=0)
+    ma, mb = ma.align(mb, fill_value=0)
+    m2a, m2b = m2a.align(m2b, fill_value=0)
+    n = na + nb
+    weight = (nb / n.where(n > 0)).fillna(0)
+    delta = mb - ma
+    return n, ma + delta * weight, m2a + m2b + delta ** 2 * na * weight
+
+
+class SampleAggregate(object):
+    """
+    Mergeable partial aggregate of per-simulation analyzer output: for each sample, the replicate counts, means and
+    sums of squared deviations from the mean of the non-missing values in every bin (accumulated with Chan's update,
+    which stays accurate where sums of squares would cancel).
+
+    Partial aggregates of disjoint sets of simulations (e.g. analyzed in different processes or on different machines)
+    merge into the aggregate of their union, so the per-sample means over replicates can be computed without ever
+    holding the data of every simulation in one place. Aggregates are picklable.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.mean = {}
+        self.m2 = {}
+
+    @classmethod
+    def from_selected(cls, selected):
+        """
+        :param selected: iterable of per-simulation pandas.DataFrame or Series, with a sample attribute
+        """
+        aggregate = cls()
+        for data in selected:
+            aggregate.add(data.sample, data)
+        return aggregate
+
+    def _update(self, sample, moments):
+        if sample in self.counts:
+            moments = _chan_update((self.counts[sample], self.mean[sample], self.m2[sample]), moments)
+        self.counts[sample], self.mean[sample], self.m2[sample] = moments
+
+    def add(self, sample, data):
+        """
+        Fold the data of one simulation into the aggregate of its sample.
+        """
+        values = data.fillna(0).astype(float)
+        self._update(sample, (data.notnull().astype(int), values, values * 0))
+        return self
+
+    def merge(self, other):
+        """
+        Merge another partial aggregate into this one.
+        """
+        for sample in other.counts:
+            self._update(sample, (other.counts[sample], other.mean[sample], other.m2[sample]))
+        return self
+
+    def samples(self):
+        return sorted(self.counts.keys())
+
+    def replicates(self, sample):
+        """
+        Largest number of replicates contributing to any bin of the sample
+        """
+        return int(self.counts[sample].values.max())
+
+    def means(self):
+        """
+        :return: dictionary of sample to the mean over its replicates, NaN in bins without any values
+        """
+        return {sample: self.mean[sample].where(self.counts[sample] > 0) for sample in self.counts}
+
+    def variances(self, ddof=1):
+        """
+        :return: dictionary of sample to the variance over its replicates, NaN in bins with ddof values or fewer
+        """
+        return {sample: self.m2[sample] / (self.counts[sample] - ddof).where(self.counts[sample] > ddof)
+                for sample in self.counts}
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class RunningSampleMoments(object):
+    """
+    Streaming alternative to SampleAggregate: running per-sample means and variances over replicates, accumulated in
+    preallocated (sample x bin) arrays with Welford's method as each simulation is analyzed.
+
+    The bins are those of the first data added; every simulation must produce the same bins (data is re-indexed on
+    them). Memory is constant in the number of replicates. Partial moments merge with Chan's parallel update.
+    """
+
+    def __init__(self, expected_samples=16):
+        self.template = None
+        self.rows = {}
+        self.expected_samples = max(1, expected_samples)
+        self.count = self.mean = self.m2 = None
+
+    @classmethod
+    def from_selected(cls, selected):
+        """
+        :param selected: iterable of per-simulation pandas.DataFrame or Series, with a sample attribute
+        """
+        moments = cls()
+        for data in selected:
+            moments.add(data.sample, data)
+        return moments
+
+    def _allocate(self, template):
+        self.template = template * np.nan
+        shape = (self.expected_samples, template.size)
+        self.count, self.mean, self.m2 = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+
+    def _row(self, sample):
+        if sample not in self.rows:
+            if len(self.rows) == self.count.shape[0]:  # double the sample capacity
+                self.count, self.mean, self.m2 = [np.concatenate([a, np.zeros_like(a)])
+                                                  for a in (self.count, self.mean, self.m2)]
+            self.rows[sample] = len(self.rows)
+        return self.rows[sample]
+
+    def _frame(self, values):
+        t = self.template
+        if isinstance(t, pd.Series):
+            return pd.Series(values, index=t.index, name=t.name)
+        return pd.DataFrame(values.reshape(t.shape), index=t.index, columns=t.columns)
+
+    def add(self, sample, data):
+        """
+        Fold the data of one simulation into the running moments of its sample.
+        """
+        if self.template is None:
+            self._allocate(data)
+        x = np.asarray(data.reindex_like(self.template).values, dtype=float).ravel()
+        r = self._row(sample)
+
+        valid = ~np.isnan(x)
+        self.count[r] += valid
+        delta = np.where(valid, x - self.mean[r], 0)
+        self.mean[r] += delta / np.maximum(self.count[r], 1)
+        self.m2[r] += delta * np.where(valid, x - self.mean[r], 0)
+        return self
+
+    def merge(self, other):
+        """
+        Merge other partial moments with the same bins into these.
+        """
+        if other.template is None:
+            return self
+        if self.template is None:
+            self._allocate(other.template)
+        elif not (self.template.index.equals(other.template.index) and
+                  getattr(self.template, 'columns', self.template.index).equals(
+                      getattr(other.template, 'columns', other.template.index))):
+            raise ValueError('Cannot merge running moments over different bins')
+
+        for sample, o in other.rows.items():
+            r = self._row(sample)
+            na, nb = self.count[r], other.count[o]
+            n = na + nb
+            delta = other.mean[o] - self.mean[r]
+            weight = np.where(n > 0, nb / np.maximum(n, 1), 0)
+            self.mean[r] += delta * weight
+            self.m2[r] += other.m2[o] + delta ** 2 * na * weight
+            self.count[r] = n
+        return self
+
+    def samples(self):
+        return sorted(self.rows.keys())
+
+    def replicates(self, sample):
+        """
+        Largest number of replicates contributing to any bin of the sample
+        """
+        return int(self.count[self.rows[sample]].max())
+
+    def means(self):
+        """
+        :return: dictionary of sample to the mean over its replicates, NaN in bins without any values
+        """
+        return {sample: self._frame(np.where(self.count[r] > 0, self.mean[r], np.nan))
+                for sample, r in self.rows.items()}
+
+    def variances(self, ddof=1):
+        """
+        :return: dictionary of sample to the variance over its replicates, NaN in bins with ddof values or fewer
+        """
+        return {sample: self._frame(np.where(self.count[r] > ddof, self.m2[r] / np.maximum(self.count[r] - ddof, 1),
+                                             np.nan))
+                for sample, r in self.rows.items()}
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def merge_aggregates(partials):
+    """
+    Tree-reduce a list of partial aggregates pairwise into a single aggregate
+    :param partials: list of SampleAggregate
+    :return: SampleAggregate of all partials
+    """
+    partials = [p for p in partials if p is not None and len(p)]
+    if not partials:
+        return SampleAggregate()
+    while len(partials) > 1:
+        partials = [partials[i].merge(partials[i + 1]) if i + 1 < len(partials) else partials[i]
+                    for i in range(0, len(partials), 2)]
+    return partials[0]
+
+
+def concat_sample_means(means, axis=0, names=('sample',)):
+    """
+    Stack per-sample means into one table with a leading 'sample' level, sorted as groupby(level='sample') would be.
+    :param means: dictionary of sample to mean pandas.DataFrame
+    :param axis: axis along which to stack the samples
+    :param names: names of the resulting levels along that axis (levels not named keep their names)
+    """
+    samples = sorted(means.keys())
+    return pd.concat([means[s] for s in samples], axis=axis, keys=samples, names=list(names))
@@ -0,0 +1,138 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def _attach(name):
+    from multiprocessing import shared_memory
+
+    # attaching registers the segment with the resource tracker again; worker processes share the tracker of the
+    # publisher, which holds a single registration per segment, released when the publisher unlinks it
+    return shared_memory.SharedMemory(name=name)
+
+
+class SharedFrame(object):
+    """
+    A pandas.DataFrame published once in shared memory, for analysis worker processes to read without copying.
+
+    Each numeric (or boolean) column is stored as a shared block of its own dtype, so e.g. integer dates and node IDs
+    are read back as integers; other columns and the index are small and travel with the handle. A SharedFrame
+    pickles as a handle on the shared blocks: unpickling it in a worker attaches to the blocks, and frame() returns
+    a read-only view with the columns in their original order. The publishing process must keep the SharedFrame
+    alive while workers use it, and release it with unlink().
+    """
+
+    def __init__(self, df):
+        from multiprocessing import shared_memory
+
+        self.shms = []
+        self.handle = {'columns': df.columns, 'index': df.index, 'blocks': [], 'others': []}
+        try:
+            for i, column in enumerate(df.columns):
+                values = df.iloc[:, i].values
+                if not isinstance(values, np.ndarray) or not (np.issubdtype(values.dtype, np.number) or
+                                                               values.dtype == np.bool_):
+                    self.handle['others'].append((i, values))
+                    continue
+                values = np.ascontiguousarray(values)
+                shm = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+                self.shms.append(shm)
+                np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+                self.handle['blocks'].append((i, {'name': shm.name, 'shape': values.shape,
+                                                  'dtype': values.dtype.str}))
+        except Exception:
+            for shm in self.shms:
+                shm.close()
+                shm.unlink()
+            raise
+
+        self._frame = None
+        self.owner = True
+        logger.debug('Published %d columns (%.1f MB) in shared memory', len(self.shms),
+                     sum(shm.size for shm in self.shms) / 1e6)
+
+    def __getstate__(self):
+        return {'handle': self.handle}
+
+    def __setstate__(self, state):
+        self.handle = state['handle']
+        self.shms = [_attach(block['name']) for i, block in self.handle['blocks']]
+        self._frame = None
+        self.owner = False
+
+    def frame(self):
+        """
+        :return: read-only pandas.DataFrame view of the shared data
+        """
+        if self._frame is None:
+            h = self.handle
+            values = dict(h['others'])
+            for (i, block), shm in zip(h['blocks'], self.shms):
+                array = np.ndarray(block['shape'], dtype=np.dtype(block['dtype']), buffer=shm.buf)
+                array.flags.writeable = False
+                values[i] = array
+            df = pd.DataFrame({i: values[i] for i in range(len(h['columns']))}, index=h['index'], copy=False)
+            df.columns = h['columns']
+            self._frame = df
+        return self._frame
+
+    def close(self):
+        self._frame = None
+        for shm in self.shms:
+            shm.close()
+
+    def unlink(self):
+        """
+        Release the shared memory (publisher only, once the workers are done).
+        """
+        self.close()
+        if self.owner:
+            for shm in self.shms:
+                shm.unlink()
+
+
+def share_frames(obj, names):
+    """
+    Publish DataFrame attributes of an object (e.g. an analyzer) in shared memory; once published, pickling the
+    object sends only handles, and unpickled copies read the frames from shared memory (see shared_state).
+    :param obj: object holding the frames
+    :param names: attribute names of the frames to publish
+    :return: dictionary of attribute name to SharedFrame
+    """
+    shared = getattr(obj, 'shared_inputs', None) or {}
+    for name in names:
+        if name not in shared and isinstance(getattr(obj, name, None), pd.DataFrame):
+            shared[name] = SharedFrame(getattr(obj, name))
+    obj.shared_inputs = shared
+    return shared
+
+
+def shared_state(obj):
+    """
+    State of an object for pickling, with its published frames left out (they travel as handles in shared_inputs)
+    """
+    state = dict(obj.__dict__)
+    for name in state.get('shared_inputs') or {}:
+        state.pop(name, None)
+    return state
+
+
+def restore_shared_state(obj, state):
+    """
+    Restore the pickled state of an object, with its published frames as views of shared memory
+    """
+    obj.__dict__.update(state)
+    for name, shared in (state.get('shared_inputs') or {}).items():
+        setattr(obj, name, shared.frame())
+
+
+def unlink_shared_inputs(obj):
+    """
+    Release the shared memory published for an object
+    """
+    for shared in (getattr(obj, 'shared_inputs', None) or {}).values():
+        shared.unlink()
+    obj.shared_inputs = {}
@@ -0,0 +1,218 @@
+import json
+from collections import defaultdict
+
+# Individual events raised by the model itself rather than by campaign interventions
+builtin_events = {
+    'Births', 'EveryUpdate', 'EveryTimeStep', 'NewInfectionEvent', 'NewClinicalCase', 'NewSevereCase',
+    'NewlySymptomatic', 'SymptomaticCleared', 'InfectionCleared', 'NonDiseaseDeaths', 'DiseaseDeaths', 'OnDeathBed',
+    'HappyBirthday', 'Emigrating', 'Immigrating', 'Pregnant', 'GaveBirth', 'PropertyChange', 'ExposureComplete',
+    'TestedPositive', 'TestedNegative', 'ParasiteClearance', 'NodePropertyChange', 'NoTrigger', 'NewMalariaInfection',
+    'NewExternalHIVInfection', 'STIDebut', 'STINewInfection'
+}
+
+# Campaign parameters naming an event that an intervention broadcasts ...
+broadcast_keys = ('Broadcast_Event', 'Event_Trigger', 'Positive_Diagnosis_Event', 'Negative_Diagnosis_Event',
+                  'Took_Dose_Event', 'Blackout_Event_Trigger', 'Event_To_Broadcast', 'Expired_Event_Trigger')
+
+# ... and parameters listing the events an intervention listens for
+trigger_keys = ('Trigger_Condition_List', 'Start_Trigger_Condition_List', 'Stop_Trigger_Condition_List')
+
+
+def walk_campaign(campaign, classes=False):
+    """
+    Iterate once over every dictionary nested in a campaign, in a single pass with an explicit stack.
+
+    The campaign may be the campaign dictionary, its list of events, or the campaign objects held by a config builder
+    (``cb.campaign``); objects are traversed through their attributes.
+
+    :param campaign: campaign to traverse
+    :param classes: if True, also yield the class of each dictionary: its 'class' parameter, or the type name of the
+        campaign object it was read from (None for a plain dictionary without 'class')
+    :return: generator of (event label, dictionary) tuples, the label identifying the top-level campaign event, or
+        (event label, dictionary, class) tuples
+    """
+    if isinstance(campaign, dict) and 'Events' in campaign:
+        events = campaign['Events']
+    elif isinstance(campaign, (list, tuple)):
+        events = campaign
+    else:
+        events = getattr(campaign, 'Events', None) or [campaign]
+
+    for i, event in enumerate(events):
+        stack = [event]
+        label = None
+        while stack:
+            item = stack.pop()
+            kind = None
+            if hasattr(item, '__dict__') and not isinstance(item, dict):
+                kind = type(item).__name__
+                item = vars(item)
+            if isinstance(item, dict):
+                if label is None:
+                    name = item.get('Event_Name')
+                    label = 'event %d' % i + (' (%s)' % name if name else '')
+                if classes:
+                    yield label, item, item.get('class', kind)
+                else:
+                    yield label, item
+                stack.extend(v for v in item.values() if isinstance(v, (dict, list, tuple)) or hasattr(v, '__dict__'))
+            elif isinstance(item, (list, tuple)):
+                stack.extend(v for v in item if isinstance(v, (dict, list, tuple)) or hasattr(v, '__dict__'))
+
+
+class CampaignIndex(object):
+    """
+    Index of the event names, property restrictions and node lists used in a campaign, built in one traversal.
+    """
+
+    def __init__(self, campaign):
+        self.broadcasts = defaultdict(set)
+        self.triggers = defaultdict(set)
+        self.individual_properties = defaultdict(set)
+        self.node_properties = defaultdict(set)
+        self.node_ids = defaultdict(set)
+        self.empty_node_sets = set()
+
+        for label, item in walk_campaign(campaign):
+            for key in broadcast_keys:
+                name = item.get(key)
+                if name and isinstance(name, str):
+                    self.broadcasts[name].add(label)
+            for key in trigger_keys:
+                for name in item.get(key) or []:
+                    if isinstance(name, str):
+                        self.triggers[name].add(label)
+
+            for restriction in item.get('Property_Restrictions_Within_Node') or []:
+                self._add_restriction(self.individual_properties, restriction, label)
+            for restriction in item.get('Property_Restrictions') or []:
+                self._add_restriction(self.individual_properties, restriction, label)
+            for restriction in item.get('Node_Property_Restrictions') or []:
+                self._add_restriction(self.node_properties, restriction, label)
+            if 'Target_Property_Key' in item:
+                self.individual_properties[(item['Target_Property_Key'], item.get('Target_Property_Value'))].add(label)
+            if 'Target_NP_Key_Value' in item:
+                self._add_restriction(self.node_properties, item['Target_NP_Key_Value'], label)
+
+            if 'Node_List' in item or item.get('class') == 'NodeSetNodeList':
+                node_list = item.get('Node_List') or []
+                if not node_list:
+                    self.empty_node_sets.add(label)
+                for node_id in node_list:
+                    self.node_ids[node_id].add(label)
+
+    @staticmethod
+    def _add_restriction(index, restriction, label):
+        if isinstance(restriction, dict):
+            for key, value in restriction.items():
+                index[(key, value)].add(label)
+        elif isinstance(restriction, str) and ':' in restriction:
+            index[tuple(restriction.split(':', 1))].add(label)
+
+    def dangling_triggers(self):
+        """
+        Events listened for that no intervention broadcasts and the model does not raise.
+        """
+        known = builtin_events.union(self.broadcasts)
+        return {name: labels for name, labels in self.triggers.items() if name not in known}
+
+    def undeclared_events(self, listed_events):
+        """
+        Custom events used by the campaign that are missing from the Listed_Events of the config.
+        """
+        listed = set(listed_events)
+        used = set(self.broadcasts).union(self.triggers)
+        return {name: self.broadcasts.get(name, set()) | self.triggers.get(name, set())
+                for name in used if name not in listed and name not in builtin_events}
+
+    @staticmethod
+    def _unknown_properties(index, declared):
+        return {'%s:%s' % kv: labels for kv, labels in index.items()
+                if kv[0] not in declared or kv[1] not in declared[kv[0]]}
+
+    def validate(self, config=None, demographics=None):
+        """
+        List the problems found in the indexed campaign.
+
+        :param config: (optional) config dictionary, to check custom events against its Listed_Events
+        :param demographics: (optional) demographics dictionary, to check property restrictions against its
+            IndividualProperties and NodeProperties, and node lists against its Nodes
+        :return: list of problem descriptions; empty when the campaign is consistent
+        """
+        problems = []
+        for name, labels in sorted(self.dangling_triggers().items()):
+            problems.append('Trigger "%s" is never broadcast (listened for in %s)' % (name, ', '.join(sorted(labels))))
+
+        for label in sorted(self.empty_node_sets):
+            problems.append('Node set of %s has an empty Node_List' % label)
+
+        if config is not None:
+            params = config.get('parameters', config)
+            if 'Listed_Events' in params:
+                for name, labels in sorted(self.undeclared_events(params['Listed_Events']).items()):
+                    problems.append('Event "%s" is missing from Listed_Events (used in %s)' %
+                                    (name, ', '.join(sorted(labels))))
+
+        if demographics is not None:
+            defaults = demographics.get('Defaults', {})
+            for kind, index in (('IndividualProperties', self.individual_properties),
+                                ('NodeProperties', self.node_properties)):
+                declared = {p['Property']: set(p.get('Values', [])) for p in defaults.get(kind, [])}
+                for node in demographics.get('Nodes', []):
+                    for p in node.get(kind, []):
+                        declared.setdefault(p['Property'], set()).update(p.get('Values', []))
+                for kv, labels in sorted(self._unknown_properties(index, declared).items()):
+                    problems.append('%s value %s is not declared in demographics (used in %s)' %
+                                    (kind, kv, ', '.join(sorted(labels))))
+
+            nodes = {node.get('NodeID') for node in demographics.get('Nodes', [])}
+            if nodes:
+                for node_id, labels in sorted(self.node_ids.items()):
+                    if node_id not in nodes:
+                        problems.append('Node %s is not in demographics (targeted in %s)' %
+                                        (node_id, ', '.join(sorted(labels))))
+
+        return problems
+
+
+def validate_campaign(campaign, config=None, demographics=None):
+    """
+    Check a campaign for dangling triggers, events missing from Listed_Events, empty node lists, and property
+    restrictions or node IDs that are not declared in the demographics.
+
+    :param campaign: campaign dictionary, list of events, or ``cb.campaign``
+    :param config: (optional) config dictionary, e.g. ``cb.config``
+    :param demographics: (optional) demographics dictionary (with any overlays already applied)
+    :return: list of problem descriptions; empty when the campaign is consistent
+    """
+    return CampaignIndex(campaign).validate(config=config, demographics=demographics)
+
+
+def validate_campaign_files(campaign_filename, config_filename=None, demographics_filenames=()):
+    """
+    Pre-flight check of campaign.json (and optionally config.json and demographics files) before submission.
+
+    :param campaign_filename: path to the campaign file
+    :param config_filename: (optional) path to the config file
+    :param demographics_filenames: (optional) paths to the demographics file and overlays declaring properties and nodes
+    :return: list of problem descriptions; empty when the campaign is consistent
+    """
+    with open(campaign_filename) as fin:
+        campaign = json.load(fin)
+
+    config = None
+    if config_filename:
+        with open(config_filename) as fin:
+            config = json.load(fin)
+
+    demographics = None
+    for fname in demographics_filenames:
+        with open(fname) as fin:
+            layer = json.load(fin)
+        if demographics is None:
+            demographics = {'Defaults': {}, 'Nodes': []}
+        for kind in ('IndividualProperties', 'NodeProperties'):
+            demographics['Defaults'].setdefault(kind, []).extend(layer.get('Defaults', {}).get(kind, []))
+        demographics['Nodes'].extend(layer.get('Nodes', []))
+
+    return validate_campaign(campaign, config=config, demographics=demographics)
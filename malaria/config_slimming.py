@@ -0,0 +1,84 @@
+import logging
+
+from malaria.campaign_validation import walk_campaign
+
+logger = logging.getLogger(__name__)
+
+drug_classes = ('AntimalarialDrug', 'AdherentDrug')
+
+# Parameters by which a drug intervention names its drugs
+drug_keys = ('Drug_Type', 'Doses')
+
+
+def referenced_drugs(campaign):
+    """
+    Drugs given by the AntimalarialDrug and AdherentDrug interventions of a campaign, found in one traversal.
+
+    :param campaign: campaign dictionary, list of events, or ``cb.campaign``
+    :return: set of drug names, or None if a drug intervention names its drugs in a way that cannot be read, or an
+        intervention naming drugs is of a class that cannot be determined (so every drug must be kept)
+    """
+    drugs = set()
+    for label, item, kind in walk_campaign(campaign, classes=True):
+        if kind is None and any(key in item for key in drug_keys):
+            # a drug intervention without its class (e.g. a raw dictionary missing 'class'): keep every drug
+            return None
+        if kind not in drug_classes:
+            continue
+        if kind == 'AdherentDrug':
+            doses = item.get('Doses')
+            if not isinstance(doses, list) or not all(isinstance(dose, list) for dose in doses):
+                return None
+            drugs.update(drug for dose in doses for drug in dose)
+        elif isinstance(item.get('Drug_Type'), str):
+            drugs.add(item['Drug_Type'])
+        else:
+            return None
+    return drugs
+
+
+def slim_config(config, campaign):
+    """
+    Remove from a config the drug parameters of drugs the campaign never gives and the parameters of vector species
+    that are not simulated, before the config is written.
+
+    :param config: config dictionary (e.g. ``cb.config``), modified in place
+    :param campaign: campaign dictionary, list of events, or ``cb.campaign``
+    :return: dictionary of the removed drugs and species
+    """
+    params = config.get('parameters', config)
+    removed = {'drugs': [], 'species': []}
+
+    drug_params = params.get('Malaria_Drug_Params')
+    if isinstance(drug_params, dict):
+        drugs = referenced_drugs(campaign)
+        if drugs is not None:
+            removed['drugs'] = sorted(d for d in drug_params if d not in drugs)
+            params['Malaria_Drug_Params'] = {d: p for d, p in drug_params.items() if d in drugs}
+
+    species_params = params.get('Vector_Species_Params')
+    if 'Vector_Species_Names' in params and species_params:
+        names = set(params['Vector_Species_Names'])
+        if isinstance(species_params, dict):
+            removed['species'] = sorted(s for s in species_params if s not in names)
+            params['Vector_Species_Params'] = {s: p for s, p in species_params.items() if s in names}
+        elif isinstance(species_params, list):
+            removed['species'] = sorted(p.get('Name') for p in species_params if p.get('Name') not in names)
+            params['Vector_Species_Params'] = [p for p in species_params if p.get('Name') in names]
+
+    if removed['drugs'] or removed['species']:
+        logger.debug('Removed parameters of %d unused drugs (%s) and %d unused vector species (%s)',
+                     len(removed['drugs']), ', '.join(removed['drugs']),
+                     len(removed['species']), ', '.join(removed['species']))
+    return removed
+
+
+def slim_config_builder(cb):
+    """
+    Slim the config of a config builder against its campaign (see :py:func:`slim_config`); to be called once the
+    campaign is complete, just before the files are written.
+
+    :param cb: The :py:class:`DTKConfigBuilder <dtk.utils.core.DTKConfigBuilder>`
+    :return: dictionary of the removed drugs and species
+    """
+    return slim_config(cb.config, cb.campaign)
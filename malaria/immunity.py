@@ -1,10 +1,16 @@
 # This comment is only a test, still
+import bisect
+import logging
 import os
+import threading
+from functools import lru_cache
 
 from simtools.SetupParser import SetupParser
 from dtk.utils.parsers.JSON import json2dict
 from dtk.vector.study_sites import StudySite, set_habitat_scale
 
+logger = logging.getLogger(__name__)
+
 params = {
     "Antibody_CSP_Decay_Days": 90,
     "Antibody_CSP_Killing_Inverse_Width": 1.5,
@@ -47,20 +53,58 @@ params = {
 }
 
 
-def add_immune_overlays(cb, tags, directory=None, site=None):
+_overlay_cache = {}
+_overlay_lock = threading.Lock()
+
+
+def copy_overlay(overlay):
     """
-    Add an immunity overlay.
+    Copy of a parsed overlay: its dictionaries and lists are copied, its numbers and strings shared.
+    """
+    if isinstance(overlay, dict):
+        return {k: copy_overlay(v) for k, v in overlay.items()}
+    if isinstance(overlay, list):
+        return [copy_overlay(v) for v in overlay]
+    return overlay
+
+
+def _cached_immune_overlay(path):
+    # parsed overlay shared by every caller: not to be modified
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    with _overlay_lock:
+        cached = _overlay_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    overlay = json2dict(path)
+    with _overlay_lock:
+        _overlay_cache[path] = (mtime, overlay)
+    return overlay
 
-    To do so, reads the demographics files and find the corresponding immunity initialization overlay.
+
+def load_immune_overlay(path):
+    """
+    Parse an immune-init overlay once per process, and again only when the file is modified.
+
+    Each call returns a copy of the parsed overlay (see :any:`copy_overlay`), so the overlay handed to a config
+    builder can be modified without affecting other builders.
+
+    :param path: path of the overlay json
+    :return: the overlay dictionary
+    """
+    return copy_overlay(_cached_immune_overlay(path))
+
+
+def immune_init_files(cb, tags, site=None):
+    """
+    Relative paths of the immune-init overlays of a set of tags, following the name of the demographics file.
 
     :param cb: The :py:class:`DTKConfigBuilder <dtk.utils.core.DTKConfigBuilder>` holding the configuration
     :param tags: List of immunity tags that have corresponding initialization files
-    :param directory: Main directory where the ..._immune_init_x_...json files are stored
     :param site: If the site is specified, the files will be expected to be found in the immune_init/site subdirectory.
-    :return: Nothing
+    :return: list of (overlay name, relative path) tuples, one per tag
     """
-    if not directory:
-        directory = SetupParser().get('input_root')
     demogfiles = cb.get_param("Demographics_Filenames")
 
     if len(demogfiles) != 1:
@@ -82,12 +126,30 @@ def add_immune_overlays(cb, tags, directory=None, site=None):
     if 'demographics' not in prefix:
         raise Exception('add_immune_init function expecting a base demographics layer with demographics in the name.')
 
-    for tag in tags:
-        immune_init_name = prefix.replace("demographics", "immune_init_" + tag, 1)
+    names = [prefix.replace("demographics", "immune_init_" + tag, 1) for tag in tags]
+    return [(name, os.path.join(subdirs, '%s.json' % name)) for name in names]
+
+
+def add_immune_overlays(cb, tags, directory=None, site=None):
+    """
+    Add an immunity overlay.
+
+    To do so, reads the demographics files and find the corresponding immunity initialization overlay.
+
+    :param cb: The :py:class:`DTKConfigBuilder <dtk.utils.core.DTKConfigBuilder>` holding the configuration
+    :param tags: List of immunity tags that have corresponding initialization files
+    :param directory: Main directory where the ..._immune_init_x_...json files are stored
+    :param site: If the site is specified, the files will be expected to be found in the immune_init/site subdirectory.
+    :return: Nothing
+    """
+    if not directory:
+        directory = SetupParser().get('input_root')
+
+    for immune_init_name, path in immune_init_files(cb, tags, site=site):
         if directory:
-            cb.add_demog_overlay(immune_init_name, json2dict(os.path.join(directory, subdirs, '%s.json' % immune_init_name)))
+            cb.add_demog_overlay(immune_init_name, load_immune_overlay(os.path.join(directory, path)))
         else:
-            cb.append_overlay(os.path.join(subdirs, '%s.json' % immune_init_name))
+            cb.append_overlay(path)
 
     cb.enable("Immunity_Initialization_Distribution")  # compatibility with EMOD v2.0 and earlier
     cb.set_param("Immunity_Initialization_Distribution_Type", "DISTRIBUTION_COMPLEX")
@@ -109,21 +171,137 @@ def add_immune_init(cb, site, x_temp_habitats, directory=None):
     add_immune_overlays(cb, tags, directory, site=site)
 
 
-def scale_habitat_with_immunity(cb, available=[], scale=1.0):
+class HabitatScaleIndex(object):
+    """
+    Sorted index of the habitat scales with precomputed immune-init overlays.
+    """
+
+    def __init__(self, available):
+        self.scales = sorted(set(available))
+
+    def nearest(self, scale):
+        i = bisect.bisect_left(self.scales, scale)
+        candidates = self.scales[max(0, i - 1):i + 1]
+        return min(candidates, key=lambda x: abs(x - scale))
+
+    def bracket(self, scale):
+        """
+        :return: (lower scale, upper scale, weight of the upper scale) of the available scales around a scale, the
+            same scale twice if it is available or outside the range
+        """
+        i = bisect.bisect_left(self.scales, scale)
+        if i < len(self.scales) and self.scales[i] == scale:
+            return scale, scale, 0.0
+        if i == 0 or i == len(self.scales):
+            nearest = self.nearest(scale)
+            return nearest, nearest, 0.0
+        lower, upper = self.scales[i - 1], self.scales[i]
+        return lower, upper, (scale - lower) / float(upper - lower)
+
+
+@lru_cache(maxsize=32)
+def _habitat_scale_index(available):
+    return HabitatScaleIndex(available)
+
+
+def habitat_scale_index(available):
+    """
+    :return: the :py:class:`HabitatScaleIndex` of the available scales, built once for the most recent sets of scales
+    """
+    return _habitat_scale_index(tuple(available))
+
+
+def blend_immune_overlays(lower, upper, weight):
+    """
+    Immune-init overlay interpolated between two overlays of the same structure: the ResultValues of every
+    distribution are blended linearly, (1 - weight) * lower + weight * upper, and everything else (axes, population
+    groups, nodes) must be identical.
+
+    :param lower: overlay of the lower habitat scale
+    :param upper: overlay of the upper habitat scale
+    :param weight: weight of the upper overlay, between 0 and 1
+    :return: the blended overlay
+    :raise ValueError: if the overlays do not have the same structure
+    """
+    def blend(a, b, path, values=False):
+        if isinstance(a, dict) and isinstance(b, dict):
+            if path and path[-1] == 'Metadata':
+                return copy_overlay(a)
+            if set(a) != set(b):
+                raise ValueError('Immune-init overlays differ in keys at %s' % '.'.join(path))
+            return {k: blend(a[k], b[k], path + (k,), values or k == 'ResultValues') for k in a}
+        if isinstance(a, list) and isinstance(b, list):
+            if len(a) != len(b):
+                raise ValueError('Immune-init overlays differ in length at %s' % '.'.join(path))
+            return [blend(x, y, path, values) for x, y in zip(a, b)]
+        if values and isinstance(a, (int, float)) and isinstance(b, (int, float)):
+            return (1 - weight) * a + weight * b
+        if a != b:
+            raise ValueError('Immune-init overlays differ at %s' % '.'.join(path))
+        return a
+
+    return blend(lower, upper, ())
+
+
+def add_interpolated_immune_init(cb, site, scale, available, directory=None):
     """
+    Initializes the immunity for a habitat scale between the precomputed ones by blending the overlays of the two
+    bracketing scales (see :any:`blend_immune_overlays`), so a habitat sweep does not need burn-in simulations at every
+    scale. Falls back to the nearest available scale outside the range, or when the overlays cannot be blended.
+
+    :param cb: The :py:class:`DTKConfigBuilder <dtk.utils.core.DTKConfigBuilder>` holding the configuration
+    :param site: If the site is specified, the files will be expected to be found in the immune_init/site subdirectory.
+    :param scale: habitat scale
+    :param available: habitat scales with precomputed overlays
+    :param directory: Main directory where the ..._immune_init_x_...json files are stored
+    :return: the scales whose overlays were used
+    """
+    if not directory:
+        directory = SetupParser().get('input_root')
+    index = habitat_scale_index(available)
+    lower, upper, weight = index.bracket(scale)
+
+    if lower == upper or not directory:
+        nearest = index.nearest(scale)
+        add_immune_init(cb, site, [nearest], directory)
+        return [nearest]
+
+    (lower_name, lower_path), (upper_name, upper_path) = immune_init_files(cb, ["x_" + str(lower), "x_" + str(upper)],
+                                                                           site=site)
+    try:
+        overlay = blend_immune_overlays(_cached_immune_overlay(os.path.join(directory, lower_path)),
+                                        _cached_immune_overlay(os.path.join(directory, upper_path)), weight)
+    except ValueError as e:
+        logger.warning('Cannot interpolate immune-init overlays for habitat scale %s (%s): using the nearest scale',
+                       scale, e)
+        nearest = index.nearest(scale)
+        add_immune_init(cb, site, [nearest], directory)
+        return [nearest]
 
-    .. todo::
-        Document this function.
+    name = immune_init_files(cb, ["x_" + str(scale)], site=site)[0][0]
+    cb.add_demog_overlay(name, overlay)
+    cb.enable("Immunity_Initialization_Distribution")  # compatibility with EMOD v2.0 and earlier
+    cb.set_param("Immunity_Initialization_Distribution_Type", "DISTRIBUTION_COMPLEX")
+    return [lower, upper]
 
-    :param cb:
-    :param available:
-    :param scale:
-    :return:
+
+def scale_habitat_with_immunity(cb, available=[], scale=1.0, interpolate=False):
+    """
+    Scale the larval habitats of the study site and initialize the immunity from the overlay of the nearest available
+    habitat scale, or, with interpolate, from the overlays of the two scales around it blended.
+
+    :param cb: The :py:class:`DTKConfigBuilder <dtk.utils.core.DTKConfigBuilder>` holding the configuration
+    :param available: habitat scales with precomputed immune-init overlays
+    :param scale: habitat scale
+    :param interpolate: blend the overlays of the bracketing scales rather than using the nearest
+    :return: tags
     """
     set_habitat_scale(cb, scale)
     cb.set_param("Config_Name", StudySite.site + '_x_' + str(scale))
-    nearest = lambda num, numlist: min(numlist, key=lambda x: abs(x - num))
-    nearest_scale = scale if not available else nearest(scale, available)
-    add_immune_init(cb, StudySite.site, [nearest_scale])
+    if interpolate and available:
+        add_interpolated_immune_init(cb, StudySite.site, scale, available)
+    else:
+        nearest_scale = scale if not available else habitat_scale_index(available).nearest(scale)
+        add_immune_init(cb, StudySite.site, [nearest_scale])
     return {'Config_Name': StudySite.site + '_x_' + str(scale),
             'habitat_scale': scale}
@@ -0,0 +1,159 @@
+import copy
+import itertools
+import os
+from multiprocessing import Pool
+
+from malaria.interventions.malaria_drug_campaigns import add_drug_campaign
+
+
+class DrugCampaignOverlay(object):
+    """
+    Stand-in for a :py:class:`DTKConfigBuilder <dtk.utils.core.DTKConfigBuilder>` that records only what a single
+    drug campaign adds on top of a shared base simulation: the campaign events and the drug/config parameters.
+
+    An overlay is cheap to build (it never touches the base campaign) and can be applied to any copy of the base
+    config builder with :py:meth:`apply`.
+    """
+
+    def __init__(self, params):
+        self.params = params
+        self.tags = {}
+        self.events = []
+        self.config = {'parameters': {'Malaria_Drug_Params': {}, 'Listed_Events': []}}
+
+    def add_event(self, event):
+        self.events.append(event)
+
+    def set_param(self, param, value):
+        self.config['parameters'][param] = value
+
+    def update_params(self, params):
+        self.config['parameters'].update(params)
+
+    def get_param(self, param, default=None):
+        return self.config['parameters'].get(param, default)
+
+    def apply(self, cb):
+        """
+        Add the recorded events and parameters to the config builder passed.
+
+        :param cb: The :py:class:`DTKConfigBuilder <dtk.utils.core.DTKConfigBuilder>` receiving the overlay
+        :return: The tags returned by :py:func:`add_drug_campaign` for this variant
+        """
+        params = self.config['parameters']
+        cb_params = cb.config['parameters']
+
+        cb_params.setdefault('Malaria_Drug_Params', {}).update(params['Malaria_Drug_Params'])
+        listed_events = cb_params.setdefault('Listed_Events', [])
+        for event_name in params['Listed_Events']:
+            if event_name not in listed_events:
+                listed_events.append(event_name)
+        cb.update_params({k: v for k, v in params.items() if k not in ('Malaria_Drug_Params', 'Listed_Events')})
+
+        for event in self.events:
+            cb.add_event(event)
+
+        return self.tags
+
+
+def drug_campaign_grid(**sweep):
+    """
+    Expand lists of :py:func:`add_drug_campaign` arguments into the list of all their combinations.
+
+    For example::
+
+        drug_campaign_grid(campaign_type=['MDA', 'MSAT'], drug_code=['AL', 'DP'], coverage=[0.5, 0.8],
+                           start_days=[[100], [100, 160]])
+
+    returns 16 dictionaries of keyword arguments.
+
+    :param sweep: keyword arguments of :py:func:`add_drug_campaign`, each with the list of values to sweep
+    :return: a list of keyword-argument dictionaries, one per combination
+    """
+    keys = list(sweep.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*[sweep[k] for k in keys])]
+
+
+def build_drug_campaign_overlays(grid, **fixed):
+    """
+    Build the per-simulation overlays of a drug-campaign sweep without rebuilding the base campaign of each variant.
+
+    :param grid: list of keyword-argument dictionaries for :py:func:`add_drug_campaign` (see :py:func:`drug_campaign_grid`)
+    :param fixed: keyword arguments of :py:func:`add_drug_campaign` shared by every variant
+    :return: a list of :py:class:`DrugCampaignOverlay`, in the order of the grid
+    """
+    overlays = []
+    for variant in grid:
+        kwargs = dict(fixed)
+        kwargs.update(variant)
+        overlay = DrugCampaignOverlay(variant)
+        overlay.tags = add_drug_campaign(overlay, **kwargs)
+        overlays.append(overlay)
+    return overlays
+
+
+def clone_for_overlay(cb):
+    """
+    Copy of a base config builder that an overlay can be applied to (see :py:meth:`DrugCampaignOverlay.apply`): only
+    the containers an overlay modifies are copied, i.e. the config parameters, drug parameters, listed events and the
+    list of campaign events. The base campaign events and all other values are shared with the base, unmodified.
+
+    :param cb: The :py:class:`DTKConfigBuilder <dtk.utils.core.DTKConfigBuilder>` holding the shared base simulation
+    :return: the copy
+    """
+    clone = copy.copy(cb)
+    params = dict(cb.config['parameters'])
+    params['Malaria_Drug_Params'] = dict(params.get('Malaria_Drug_Params', {}))
+    params['Listed_Events'] = list(params.get('Listed_Events', []))
+    clone.config = dict(cb.config, parameters=params)
+
+    campaign = copy.copy(cb.campaign)
+    if isinstance(campaign, dict):
+        campaign['Events'] = list(campaign.get('Events', []))
+    else:
+        campaign.Events = list(campaign.Events)
+    clone.campaign = campaign
+    return clone
+
+
+_base_cb = None
+
+
+def _init_worker(cb):
+    global _base_cb
+    _base_cb = cb
+
+
+def _write_variant(args):
+    working_directory, overlay = args
+    cb = clone_for_overlay(_base_cb)
+    overlay.apply(cb)
+    if not os.path.exists(working_directory):
+        os.makedirs(working_directory)
+    cb.dump_files(working_directory)
+    return working_directory
+
+
+def write_drug_campaign_variants(cb, overlays, output_dir, processes=None, dirname_format='variant_%05d'):
+    """
+    Write the config and campaign files of every overlay applied to the base config builder, in one pass over a
+    process pool. The base config builder is sent once to each worker process rather than once per variant, and each
+    variant starts from a shallow copy of it (see :py:func:`clone_for_overlay`) rather than a deep copy.
+
+    :param cb: The :py:class:`DTKConfigBuilder <dtk.utils.core.DTKConfigBuilder>` holding the shared base simulation
+    :param overlays: list of :py:class:`DrugCampaignOverlay` (see :py:func:`build_drug_campaign_overlays`)
+    :param output_dir: directory receiving one sub-directory per variant
+    :param processes: number of worker processes (default: number of CPUs)
+    :param dirname_format: format of the per-variant sub-directory names
+    :return: a list of (working directory, tags) tuples, in the order of the overlays
+    """
+    jobs = [(os.path.join(output_dir, dirname_format % i), overlay) for i, overlay in enumerate(overlays)]
+
+    pool = Pool(processes=processes, initializer=_init_worker, initargs=(cb,))
+    try:
+        directories = pool.map(_write_variant, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+    return [(d, overlay.tags) for d, overlay in zip(directories, overlays)]
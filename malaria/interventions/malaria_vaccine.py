@@ -1,12 +1,17 @@
-import copy, math, collections
+import copy, math
 from dtk.utils.Campaign.utils.RawCampaignObject import RawCampaignObject
 
+try:
+    from collections.abc import Mapping, MutableMapping
+except ImportError:
+    from collections import Mapping, MutableMapping
+
 
 def flatten(d, parent_key='', sep='_'):
     items = []
     for k, v in d.items():
         new_key = parent_key + sep + k if parent_key else k
-        if isinstance(v, collections.MutableMapping):
+        if isinstance(v, MutableMapping):
             items.extend(flatten(v, new_key, sep=sep).items())
         else:
             items.append((new_key, v))
@@ -20,11 +25,7 @@ def add_vaccine(cb, vaccine_type='RTSS', vaccine_params={}, start_days=[0], cove
     if vaccine_type not in ['RTSS', 'PEV', 'TBV'] :
         raise ValueError('Requested vaccine type %s has not been specified' % vaccine_type)
 
-    vaccine_dict = load_vaccines()
-    vaccine = copy.deepcopy(vaccine_dict[vaccine_type])
-
-    if vaccine_params :
-        vaccine.update(vaccine_params)
+    vaccine = get_vaccine(vaccine_type, vaccine_params)
 
     receiving_vaccine_event = {
         "class": "BroadcastEvent",
@@ -150,4 +151,77 @@ def load_vaccines() :
                     'PEV': preerythrocytic_vaccine,
                     'TBV': sexual_stage_vaccine}
 
-    return vaccine_dict
\ No newline at end of file
+    return vaccine_dict
+
+
+class VaccineRegistry(Mapping):
+    """
+    Read-only registry of the vaccine configurations returned by :py:func:`load_vaccines`.
+
+    Looking up a vaccine returns a deep copy of its config, which can be modified without affecting the registry.
+    """
+
+    def __init__(self, vaccines):
+        self._vaccines = vaccines
+
+    def __getitem__(self, vaccine_type):
+        return copy.deepcopy(self._vaccines[vaccine_type])
+
+    def __iter__(self):
+        return iter(self._vaccines)
+
+    def __len__(self):
+        return len(self._vaccines)
+
+
+_vaccine_registry = None
+
+
+def get_vaccine_registry():
+    """
+    The :py:class:`VaccineRegistry` of the standard vaccines, built once per process.
+    """
+    global _vaccine_registry
+    if _vaccine_registry is None:
+        _vaccine_registry = VaccineRegistry(load_vaccines())
+    return _vaccine_registry
+
+
+def override_vaccine(vaccine, overrides):
+    """
+    Return a copy of a vaccine config with parameters overridden.
+
+    As with ``dict.update``, an override replaces the parameter as a whole, nested configs included:
+    ``{'Waning_Config': {'Decay_Time_Constant': 100}}`` replaces the whole Waning_Config. A single nested parameter is
+    overridden with a dotted key, e.g. ``{'Waning_Config.Decay_Time_Constant': 100}``, leaving the rest of its config
+    unchanged.
+
+    :param vaccine: vaccine config dictionary (left unchanged)
+    :param overrides: dictionary of parameters to override, with dotted keys for nested parameters
+    :return: the overridden vaccine config
+    """
+    result = copy.deepcopy(vaccine)
+    for path, value in overrides.items():
+        keys = path.split('.')
+        target = result
+        for key in keys[:-1]:
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            target = target[key]
+        target[keys[-1]] = value
+
+    return result
+
+
+def get_vaccine(vaccine_type, vaccine_params=None):
+    """
+    Vaccine config from the registry, with optional parameter overrides (see :py:func:`override_vaccine`).
+
+    :param vaccine_type: RTSS, PEV or TBV
+    :param vaccine_params: dictionary of parameters to override
+    :return: the vaccine config dictionary
+    """
+    vaccine = get_vaccine_registry()[vaccine_type]
+    if vaccine_params:
+        vaccine = override_vaccine(vaccine, vaccine_params)
+    return vaccine
@@ -0,0 +1,290 @@
+import json
+from collections import deque
+
+import numpy as np
+
+from malaria.interventions.malaria_drugs import drug_configs_from_code
+from malaria.interventions.malaria_diagnostic import add_diagnostic_survey
+from malaria.interventions.malaria_drug_campaigns import fmda_cfg
+from dtk.utils.Campaign.utils.RawCampaignObject import RawCampaignObject
+
+
+def rcd_radius_km(fmda_radius):
+    """
+    Radius of the focal response in km, as configured by :py:func:`fmda_cfg` ('hh' is within-household only).
+    """
+    return fmda_cfg(fmda_radius)["Max_Distance_To_Other_Nodes_Km"]
+
+
+def rcd_neighbors(distmat, fmda_radius, nodes=None, node_selection_type='DISTANCE_ONLY', migration_links=None):
+    """
+    Precompute the reactive-response topology: the nodes reached by one focal broadcast from each node.
+
+    :param distmat: pandas.DataFrame of node distances with columns node1, node2, dist (as returned by
+        HouseholdCalibSite.get_distance_matrix)
+    :param fmda_radius: radius of focal response, in km or 'hh' for within-household only
+    :param nodes: list of node IDs included in the response; if empty, defaults to all nodes in distmat
+    :param node_selection_type: DISTANCE_ONLY, MIGRATION_NODES_ONLY or DISTANCE_AND_MIGRATION
+    :param migration_links: dict of node ID to the node IDs it can migrate to; required by the migration types
+    :return: dict of node ID to a sorted numpy array of the node IDs reached (including the node itself)
+    """
+    if node_selection_type != 'DISTANCE_ONLY' and migration_links is None:
+        raise ValueError('migration_links are required for Node_Selection_Type %s' % node_selection_type)
+
+    radius = rcd_radius_km(fmda_radius)
+    node1 = distmat['node1'].values
+    node2 = distmat['node2'].values
+    dist = distmat['dist'].values
+
+    if nodes is None or len(nodes) == 0:
+        nodes = np.union1d(node1, node2)
+    nodes = np.asarray(nodes)
+
+    within = (dist <= radius) & np.isin(node1, nodes) & np.isin(node2, nodes)
+    src, dst = node1[within], node2[within]
+    order = np.argsort(src, kind='mergesort')
+    src, dst = src[order], dst[order]
+    starts = np.searchsorted(src, nodes, side='left')
+    ends = np.searchsorted(src, nodes, side='right')
+
+    neighbors = {}
+    for node, start, end in zip(nodes.tolist(), starts, ends):
+        if node_selection_type == 'MIGRATION_NODES_ONLY':
+            reached = np.asarray(migration_links.get(node, []))
+        elif node_selection_type == 'DISTANCE_AND_MIGRATION':
+            reached = np.intersect1d(dst[start:end], migration_links.get(node, []))
+        else:
+            reached = dst[start:end]
+        neighbors[node] = np.union1d(reached, [node])  # Include_My_Node
+
+    return neighbors
+
+
+def snowball_reach(neighbors, snowballs):
+    """
+    Mean number of nodes reached from an index node after each level of a snowball response.
+
+    :param neighbors: dict of node ID to reached node IDs (see :py:func:`rcd_neighbors`)
+    :param snowballs: number of snowball levels
+    :return: list of mean cumulative nodes reached, one entry per level (0 to snowballs)
+    """
+    totals = np.zeros(snowballs + 1)
+    for index_node in neighbors:
+        visited = {index_node}
+        frontier = deque([index_node])
+        for level in range(snowballs + 1):
+            next_frontier = deque()
+            while frontier:
+                for n in neighbors.get(frontier.popleft(), []):
+                    if n not in visited:
+                        visited.add(n)
+                        next_frontier.append(n)
+            totals[level] += len(visited)
+            frontier = next_frontier
+
+    return (totals / max(1, len(neighbors))).tolist()
+
+
+def campaign_event_counts(events):
+    """
+    Count the campaign events, the intervention configs nested in them, and their serialized size.
+
+    :param events: list of campaign events (dictionaries or campaign objects)
+    :return: dictionary with the numbers of events, interventions and bytes
+    """
+    interventions = 0
+    stack = list(events)
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            if 'class' in item and item['class'] != 'CampaignEvent':
+                interventions += 1
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif hasattr(item, '__dict__'):
+            stack.extend(vars(item).values())
+
+    return {'events': len(events),
+            'interventions': interventions,
+            'bytes': len(json.dumps(events, default=vars))}
+
+
+def add_reactive_case_detection(cb, campaign_type, drug_code, start_day=0, coverage=1.0, interval=60,
+                                treatment_delay=0, trigger_coverage=1.0,
+                                diagnostic_type='TRUE_PARASITE_DENSITY', diagnostic_threshold=40,
+                                fmda_radius='hh', node_selection_type='DISTANCE_ONLY', snowballs=0, nodes=[],
+                                drug_ineligibility_duration=0, node_property_restrictions=[],
+                                ind_property_restrictions=[], neighbors=None):
+    """
+    Add a reactive case detection campaign (rfMSAT or rfMDA) as a single flattened event chain per snowball level
+    (see :py:func:`add_rcd_event_chain`).
+
+    Given the response topology precomputed by :py:func:`rcd_neighbors` for the same fmda_radius,
+    node_selection_type and nodes, the snowball levels that reach no new node from any index node are not emitted:
+    they would only repeat the response in nodes already reached.
+
+    :param cb: The :py:class:`DTKConfigBuilder <dtk.utils.core.DTKConfigBuilder>` that will receive the campaign
+    :param campaign_type: rfMSAT or rfMDA
+    :param drug_code: The drug code of the drug regimen (AL, DP, etc; allowable types defined in malaria_drugs.py)
+    :param start_day: day on which the response starts listening for index cases
+    :param coverage: fraction of individuals reached during the response
+    :param interval: duration of the reactive response
+    :param treatment_delay: time between treating the index case and triggering the response
+    :param trigger_coverage: fraction of index cases that trigger a response
+    :param diagnostic_type, diagnostic_threshold: diagnostic config for rfMSAT
+    :param fmda_radius: radius of focal response upon finding infection, in km or 'hh' for within-household only
+    :param node_selection_type: restriction on broadcasting focal response trigger
+    :param snowballs: number of snowball levels in reactive response
+    :param nodes: list of node IDs; if empty, defaults to all nodes
+    :param drug_ineligibility_duration: days during which treated individuals are ineligible for campaign drugs
+        (requires the DrugStatus IndividualProperty)
+    :param node_property_restrictions: used with NodePropertyRestrictions
+    :param ind_property_restrictions: used with Property_Restrictions_Within_Node
+    :param neighbors: (optional) response topology, dict of node ID to reached node IDs (see :py:func:`rcd_neighbors`)
+    :return: dictionary with the counts of events, interventions and bytes added to the campaign, and with a
+        topology the number of snowball levels emitted and the mean number of nodes reached by each
+    """
+    if campaign_type not in ('rfMSAT', 'rfMDA'):
+        raise ValueError('Reactive case detection campaign type must be rfMSAT or rfMDA, not %s' % campaign_type)
+
+    expire_recent_drugs = {}
+    if drug_ineligibility_duration > 0:
+        expire_recent_drugs = {"class": "PropertyValueChanger",
+                               "Target_Property_Key": "DrugStatus",
+                               "Target_Property_Value": "RecentDrug",
+                               "Daily_Probability": 1.0,
+                               "Maximum_Duration": 0,
+                               'Revert': drug_ineligibility_duration}
+
+    reach = None
+    if neighbors is not None:
+        reach = snowball_reach(neighbors, snowballs)
+        snowballs = next((level - 1 for level in range(1, snowballs + 1) if reach[level] <= reach[level - 1]),
+                         snowballs)
+
+    recorder = _EventRecorder(cb)
+    add_rcd_event_chain(recorder, campaign_type, start_day, coverage, drug_configs_from_code(cb, drug_code),
+                        {"class": "BroadcastEvent", "Broadcast_Event": 'Received_RCD_Drugs'}, interval,
+                        treatment_delay, trigger_coverage, diagnostic_type, diagnostic_threshold, fmda_radius,
+                        node_selection_type, snowballs,
+                        {'Node_List': nodes, "class": "NodeSetNodeList"} if nodes else {"class": "NodeSetAll"},
+                        expire_recent_drugs, node_property_restrictions, ind_property_restrictions)
+
+    counts = campaign_event_counts(recorder.events)
+    if reach is not None:
+        counts.update({'snowballs': snowballs, 'reach': reach[:snowballs + 1]})
+    return counts
+
+
+def add_rcd_event_chain(cb, campaign_type, start_day, coverage, drug_configs, receiving_drugs_event, interval,
+                        treatment_delay, trigger_coverage, diagnostic_type, diagnostic_threshold, fmda_radius,
+                        node_selection_type, snowballs, nodes, expire_recent_drugs, node_property_restrictions,
+                        ind_property_restrictions):
+    """
+    Events of a reactive case detection campaign (rfMSAT or rfMDA): an index-case event, then a single event per
+    snowball level. Every level listens for its own trigger, treats (after testing,
+    for rfMSAT) the individuals reached, and for all but the last level broadcasts the trigger of the next level to
+    the neighboring nodes, so individuals reached at a level are tested and treated once.
+
+    Unlike add_rfMSAT and add_rfMDA of add_drug_campaign, which are kept unchanged, the index-case event is delayed
+    by treatment_delay for both campaign types, and rfMDA can have snowball levels.
+
+    :param nodes: Nodeset_Config of the events
+    :param expire_recent_drugs: PropertyValueChanger making treated individuals ineligible for campaign drugs, or
+        empty
+    (see :py:func:`add_reactive_case_detection` for the other parameters)
+    """
+    trigger_prefix = 'Diagnostic_Survey_' if campaign_type == 'rfMSAT' else 'Give_Drugs_rfMDA_'
+    level_triggers = [trigger_prefix + str(level) for level in range(snowballs + 1)]
+    if campaign_type == 'rfMDA':
+        level_triggers[0] = 'Give_Drugs_rfMDA'
+
+    treatment = drug_configs + [receiving_drugs_event]
+    IP_restrictions = []
+    if expire_recent_drugs:
+        treatment.append(expire_recent_drugs)
+        IP_restrictions = [{"DrugStatus": "None"}]
+
+    index_case_event = {"Event_Name": "Trigger RCD %s" % campaign_type[2:],
+                        "class": "CampaignEvent",
+                        "Start_Day": start_day,
+                        "Event_Coordinator_Config": {
+                            "class": "StandardInterventionDistributionEventCoordinator",
+                            "Intervention_Config": {
+                                "class": "NodeLevelHealthTriggeredIV",
+                                "Demographic_Coverage": trigger_coverage,
+                                "Node_Property_Restrictions": node_property_restrictions,
+                                "Trigger_Condition_List": ["Received_Treatment"],
+                                "Duration": interval,
+                                "Actual_IndividualIntervention_Config": {
+                                    "class": "DelayedIntervention",
+                                    "Delay_Distribution": "FIXED_DURATION",
+                                    "Delay_Period": treatment_delay,
+                                    "Actual_IndividualIntervention_Configs": [
+                                        fmda_cfg(fmda_radius, node_selection_type, event_trigger=level_triggers[0])]
+                                }
+                            }
+                        },
+                        "Nodeset_Config": nodes}
+    if campaign_type == 'rfMDA':  # only index cases with the individual properties trigger a response
+        index_case_event["Event_Coordinator_Config"]["Intervention_Config"]["Property_Restrictions_Within_Node"] = \
+            ind_property_restrictions
+    cb.add_event(RawCampaignObject(index_case_event))
+
+    for level, trigger in enumerate(level_triggers):
+        level_config = list(treatment)
+        if level < snowballs:
+            level_config.insert(0, fmda_cfg(fmda_radius, node_selection_type, event_trigger=level_triggers[level + 1]))
+
+        if campaign_type == 'rfMSAT':
+            add_diagnostic_survey(cb, coverage=coverage, start_day=start_day,
+                                  diagnostic_type=diagnostic_type, diagnostic_threshold=diagnostic_threshold,
+                                  node_cfg=nodes, trigger_condition_list=[trigger],
+                                  event_name='Reactive MSAT level %d' % level,
+                                  positive_diagnosis_configs=level_config,
+                                  IP_restrictions=ind_property_restrictions,
+                                  NP_restrictions=node_property_restrictions,
+                                  pos_diag_IP_restrictions=IP_restrictions)
+        else:
+            restrictions = [dict(x, **IP_restrictions[0]) for x in ind_property_restrictions] \
+                if IP_restrictions and ind_property_restrictions else (IP_restrictions or ind_property_restrictions)
+            distribute_event = {"Event_Name": "Reactive MDA level %d" % level if level else "Distribute fMDA",
+                                "class": "CampaignEvent",
+                                "Start_Day": start_day,
+                                "Event_Coordinator_Config": {
+                                    "class": "StandardInterventionDistributionEventCoordinator",
+                                    "Intervention_Config": {
+                                        "class": "NodeLevelHealthTriggeredIV",
+                                        "Demographic_Coverage": coverage,
+                                        "Node_Property_Restrictions": node_property_restrictions,
+                                        "Property_Restrictions_Within_Node": restrictions,
+                                        "Duration": interval,
+                                        "Trigger_Condition_List": [trigger],
+                                        "Actual_IndividualIntervention_Config": {
+                                            "Intervention_List": level_config,
+                                            "class": "MultiInterventionDistributor"
+                                        }
+                                    }
+                                },
+                                "Nodeset_Config": nodes}
+            cb.add_event(RawCampaignObject(distribute_event))
+
+
+class _EventRecorder(object):
+    """
+    Forward campaign events to a config builder while keeping track of them.
+    """
+
+    def __init__(self, cb):
+        self.cb = cb
+        self.events = []
+
+    def add_event(self, event):
+        self.events.append(event)
+        self.cb.add_event(event)
+
+    def __getattr__(self, name):
+        if name == 'cb':  # not yet set
+            raise AttributeError(name)
+        return getattr(self.cb, name)
@@ -1,9 +1,122 @@
+"""
+Default malaria disease, drug and vector parameters (params) and their innate-immunity-only variant (innate_only).
+
+innate_only_layered is innate_only as a read-only LayeredParams over params, sharing the values of params: use it to
+build further variants (innate_only_layered.layer(...)) without copying the whole parameter tree.
+"""
 import copy
 
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 from malaria import infection, immunity, symptoms
 from dtk.vector.species import set_params_by_species
 from malaria.interventions.malaria_drugs import drug_params
 
+
+class _Removed(object):
+    """
+    Marker of a parameter removed by a layer; a singleton that pickles and copies as itself, so removals survive
+    copy.deepcopy and worker processes.
+    """
+
+    def __reduce__(self):
+        return '_REMOVED'
+
+    def __repr__(self):
+        return '<removed>'
+
+
+_REMOVED = _Removed()
+
+
+class LayeredParams(Mapping):
+    """
+    Read-only parameter set made of a base dictionary and sparse overlays of changes, looked up like a ChainMap.
+
+    Variants of a parameter set (e.g. innate_only) and per-simulation overrides are new layers sharing the base and
+    the earlier layers, so they cost memory and time in proportion to the changes rather than a deep copy of the whole
+    malaria, drug and vector tree. Values are shared with the base and must not be modified in place: add a layer, or
+    use to_dict() for a flat copy that can be modified.
+
+    A LayeredParams can be passed to DTKConfigBuilder.update_params like the dictionary it flattens to.
+    """
+
+    def __init__(self, base, *overlays):
+        """
+        :param base: dictionary of parameters, not copied and treated as read-only
+        :param overlays: dictionaries of changes, in order of application (see layer)
+        """
+        self.base = base
+        self.overlays = tuple(overlays)
+
+    def _lookup(self, key):
+        for overlay in reversed(self.overlays):
+            if key in overlay:
+                return overlay[key]
+        return self.base.get(key, _REMOVED)
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is _REMOVED:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._lookup(key) is not _REMOVED
+
+    def __iter__(self):
+        seen = set()
+        for mapping in (self.base,) + self.overlays:
+            for key in mapping:
+                if key not in seen:
+                    seen.add(key)
+                    if key in self:
+                        yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def layer(self, changes=None, removed=(), **kwargs):
+        """
+        Parameter set with changes applied on top of this one, sharing everything unchanged.
+
+        Changes to nested values can be given with dotted keys, e.g. {'Malaria_Drug_Params.Artemether.Drug_Cmax': 120}:
+        only the dictionaries along the path are copied.
+
+        :param changes: dictionary of parameters to set
+        :param removed: parameters to leave out
+        :return: the new LayeredParams
+        """
+        changes = dict(changes or {}, **kwargs)
+        overlay = {}
+        copied = set()
+        for path in sorted(changes, key=lambda p: p.count('.')):
+            keys = path.split('.')
+            target = overlay
+            for depth, key in enumerate(keys[:-1]):
+                if tuple(keys[:depth + 1]) not in copied:
+                    current = target.get(key, self.get(key) if depth == 0 else None)
+                    target[key] = dict(current) if isinstance(current, Mapping) else {}
+                    copied.add(tuple(keys[:depth + 1]))
+                target = target[key]
+            target[keys[-1]] = changes[path]
+        for key in removed:
+            overlay[key] = _REMOVED
+        return LayeredParams(self.base, *(self.overlays + (overlay,)))
+
+    def to_dict(self):
+        """
+        :return: the flat parameter dictionary, deep-copied so it can be modified or serialized
+        """
+        return {key: copy.deepcopy(self[key]) for key in self}
+
+    def __repr__(self):
+        return 'LayeredParams(%d parameters, %d layers)' % (len(self), len(self.overlays))
+
+
 # --------------------------------------------------------------
 # Malaria disease + drug parameters
 # --------------------------------------------------------------
@@ -28,9 +141,10 @@ set_params_by_species(params, ["arabiensis", "funestus", "gambiae"], "MALARIA_SI
 # Innate immunity only
 # --------------------------------------------------------------
 
-innate_only = copy.deepcopy(params)
-innate_only.update({
+innate_only_layered = LayeredParams(params).layer({
     "Antibody_Capacity_Growth_Rate": 0,
     "Max_MSP1_Antibody_Growthrate": 0,
     "Min_Adapted_Response": 0
 })
+
+innate_only = innate_only_layered.to_dict()
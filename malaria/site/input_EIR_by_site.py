@@ -1,4 +1,5 @@
-from collections import deque
+import numpy as np
+
 from dtk.generic.geography import set_geography
 from dtk.vector.study_sites import geography_from_site
 from dtk.interventions.input_EIR import add_InputEIR
@@ -26,23 +27,56 @@ study_site_monthly_EIRs = {
 
 def mAb_vs_EIR(EIR):
     # Rough cut at function from eyeballing a few BinnedReport outputs parsed into antibody fractions
-    mAb = 0.9 * (1e-4*EIR*EIR + 0.7*EIR) / ( 0.7*EIR + 2 )
-    return min(mAb, 1.0)
+    # (annual EIR or array of annual EIRs)
+    EIR = np.asarray(EIR, dtype=float)
+    mAb = np.minimum(0.9 * (1e-4*EIR*EIR + 0.7*EIR) / ( 0.7*EIR + 2 ), 1.0)
+    return float(mAb) if mAb.ndim == 0 else mAb
 
 
-# Configuration of study-site input EIR
-def configure_site_EIR(cb, site, habitat=1, circular_shift=0, birth_cohort=True, set_site_geography=True, **geo_kwargs):
+def site_EIR_profiles(sites, habitats=1, shifts=0, daily=False, maternal_protection=1.0):
+    """
+    Input-EIR profiles of many (site, habitat, circular shift) variants at once, as configure_site_EIR would set them.
+
+    :param sites: site name or sequence of site names (keys of study_site_monthly_EIRs)
+    :param habitats: habitat scale or sequence of scales, broadcast against sites
+    :param shifts: circular shift of the months or sequence of shifts, broadcast against sites
+    :param daily: return daily rather than monthly EIRs, each month spread evenly over its 30 or 31 days
+    :param maternal_protection: Maternal_Antibody_Protection scaled by the annual EIR of each variant
+    :return: (N x 12, or N x 365 if daily, array of EIRs; array of the N maternal antibody protections)
+    """
+    sites, habitats, shifts = np.broadcast_arrays(np.asarray(sites, dtype=object), np.asarray(habitats, dtype=float),
+                                                  np.asarray(shifts, dtype=int))
+    sites, habitats, shifts = np.atleast_1d(sites), np.atleast_1d(habitats), np.atleast_1d(shifts)
+
+    unknown = set(sites) - set(study_site_monthly_EIRs)
+    if unknown:
+        raise Exception("Don't know how to configure site: %s " % ', '.join(sorted(unknown)))
+
+    names = sorted(set(sites))
+    table = np.array([study_site_monthly_EIRs[name] for name in names], dtype=float)
+    codes = np.searchsorted(names, sites.astype(str))
 
-    if site not in study_site_monthly_EIRs.keys():
-        raise Exception("Don't know how to configure site: %s " % site)
+    months = (np.arange(12)[None, :] - shifts[:, None]) % 12  # as deque.rotate(shift)
+    EIRs = habitats[:, None] * table[codes[:, None], months]
 
-    EIRs = [habitat * m for m in study_site_monthly_EIRs[site]]
+    mAb = maternal_protection * mAb_vs_EIR(EIRs.sum(axis=1))
+
+    if daily:  # each month spread over its own days, so the daily EIRs sum to the annual EIR
+        month_of_day = np.arange(365) * 12 // 365
+        EIRs = EIRs[:, month_of_day] / np.bincount(month_of_day, minlength=12)[month_of_day]
+
+    return EIRs, mAb
+
+
+# Configuration of study-site input EIR
+def configure_site_EIR(cb, site, habitat=1, circular_shift=0, birth_cohort=True, set_site_geography=True, **geo_kwargs):
 
     # Calibration is done with CONSTANT_INITIAL_IMMUNITY on birth cohort
     # but with a downscaling to account for maternal immunity levels
     # Here, we'll keep the CONSTANT model and downscale as a function of annual EIR
-    annual_EIR = sum(EIRs)
-    mAb = cb.get_param('Maternal_Antibody_Protection') * mAb_vs_EIR(annual_EIR)
+    # (months shifted according to circular_shift argument)
+    EIRs, mAb = site_EIR_profiles([site], habitat, circular_shift,
+                                  maternal_protection=cb.get_param('Maternal_Antibody_Protection'))
 
     if birth_cohort:
         set_geography(cb, "Birth_Cohort")
@@ -52,13 +86,10 @@ def configure_site_EIR(cb, site, habitat=1, circular_shift=0, birth_cohort=True,
     cb.update_params({ 'Config_Name': site,
                        'Vector_Species_Names': [], # no mosquitoes
                        'Maternal_Antibodies_Type': 'CONSTANT_INITIAL_IMMUNITY',
-                       'Maternal_Antibody_Protection': mAb
+                       'Maternal_Antibody_Protection': float(mAb[0])
                        })
 
-    # Shift order of months according to circular_shift argument
-    EIR_deque = deque(EIRs)
-    EIR_deque.rotate(circular_shift)
-    monthlyEIRs=list(EIR_deque)
+    monthlyEIRs = EIRs[0].tolist()
     add_InputEIR(cb, monthlyEIRs=monthlyEIRs)
 
-    return {'monthlyEIRs':monthlyEIRs}
\ No newline at end of file
+    return {'monthlyEIRs':monthlyEIRs}
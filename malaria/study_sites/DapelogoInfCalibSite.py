@@ -3,8 +3,8 @@ from collections import OrderedDict
 
 import numpy as np
 from calibtool.analyzers.Helpers import season_channel_age_density_json_to_pandas
-from calibtool.study_sites.site_setup_functions import \
-    config_setup_fn, survey_report_fn, summary_report_fn, add_treatment_fn, site_input_eir_fn
+from malaria.study_sites.site_setup_functions import \
+    config_setup_fn, survey_report_fn, summary_report_fn, add_treatment_fn, site_input_eir_fn, update_params_fn
 
 from calibtool.study_sites.DensityCalibSite import DensityCalibSite
 
@@ -105,7 +105,7 @@ class DapelogoInfCalibSite(DensityCalibSite):
                                           targets=[{'trigger': 'NewClinicalCase',
                                                     'coverage': 1, 'seek': 0.15, 'rate': 0.3}]))
         setup_fns.append(site_input_eir_fn(self.name, birth_cohort=True))
-        setup_fns.append(lambda cb: cb.update_params({'Demographics_Filenames': [
+        setup_fns.append(update_params_fn({'Demographics_Filenames': [
             'Calibration\\birth_cohort_demographics.compiled.json']}))
 
         return setup_fns
@@ -5,7 +5,7 @@ from abc import ABCMeta
 import numpy as np
 import pandas as pd
 from calibtool.CalibSite import CalibSite
-from calibtool.study_sites.site_setup_functions import *
+from malaria.study_sites.site_setup_functions import *
 
 from calibtool.analyzers.PrevalenceByRoundAnalyzer import PrevalenceByRoundAnalyzer
 from calibtool.analyzers.PositiveFractionByDistanceAnalyzer import PositiveFractionByDistanceAnalyzer
@@ -68,7 +68,7 @@ class HouseholdCalibSite(CalibSite):
                              },
                                  "CONSTANT": 2e6,
                                  "WATER_VEGETATION": 2e6}),
-            update_params({
+            update_params_fn({
                 "Geography": "Household",
                 "Enable_Climate_Stochasticity": 0, # daily in raw data series
                 'Enable_Nondisease_Mortality' : 1,
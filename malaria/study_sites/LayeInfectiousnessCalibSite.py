@@ -3,8 +3,8 @@ from collections import OrderedDict
 
 import numpy as np
 from calibtool.analyzers.Helpers import season_channel_age_density_infectiousness_json_to_pandas
-from calibtool.study_sites.site_setup_functions import \
-    config_setup_fn, summary_report_fn, site_input_eir_fn
+from malaria.study_sites.site_setup_functions import \
+    config_setup_fn, summary_report_fn, site_input_eir_fn, update_params_fn
 
 from calibtool.study_sites.InfectiousnessCalibSite import InfectiousnessCalibSite
 
@@ -73,7 +73,7 @@ class LayeInfectiousnessCalibSite(InfectiousnessCalibSite):
                                            infection_bins=[0, 5, 20, 50, 80, 100],
                                            age_bins=[5, 15, 100]))
         setup_fns.append(site_input_eir_fn(self.name, birth_cohort=True))
-        setup_fns.append(lambda cb: cb.update_params({'Demographics_Filenames': [
+        setup_fns.append(update_params_fn({'Demographics_Filenames': [
             'Calibration\\birth_cohort_demographics.compiled.json'],
             'Antigen_Switch_Rate_LOG': -9.530186548,
             'Base_Gametocyte_Production_Rate': 0.024177457,
@@ -2,7 +2,7 @@ import logging
 import pandas as pd
 import os
 
-from calibtool.study_sites.site_setup_functions import *
+from malaria.study_sites.site_setup_functions import *
 from malaria.study_sites.HouseholdCalibSite import HouseholdCalibSite
 
 logger = logging.getLogger(__name__)
@@ -67,7 +67,7 @@ class MapatizyaCalibSite(HouseholdCalibSite):
         msat_setup_functions = self.get_msat_setup_functions()
 
         site_setup_functions = [
-            update_params( {
+            update_params_fn( {
                 "Air_Temperature_Filename": "Household/Mapatizya/Mapatizya_filled_all_air_temperature_daily.bin",
                 "Land_Temperature_Filename": "Household/Mapatizya/Mapatizya_filled_all_air_temperature_daily.bin",
                 "Rainfall_Filename": "Household/Mapatizya/Mapatizya_filled_all_rainfall_daily.bin",
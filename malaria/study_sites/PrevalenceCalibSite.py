@@ -2,7 +2,7 @@ import logging
 from abc import ABCMeta
 
 from calibtool.CalibSite import CalibSite
-from calibtool.study_sites.site_setup_functions import config_setup_fn, summary_report_fn, site_input_eir_fn
+from malaria.study_sites.site_setup_functions import config_setup_fn, summary_report_fn, site_input_eir_fn
 from calibtool.analyzers.ChannelByAgeCohortAnalyzer import PrevalenceByAgeCohortAnalyzer
 from calibtool.analyzers.Helpers import channel_age_json_to_pandas
 
@@ -2,7 +2,7 @@ import logging
 import os
 import numpy as np
 from calibtool.analyzers.Helpers import season_channel_age_density_csv_to_pandas
-from calibtool.study_sites.site_setup_functions import \
+from malaria.study_sites.site_setup_functions import \
     config_setup_fn, summary_report_fn, add_treatment_fn, site_input_eir_fn
 
 from calibtool.study_sites.DensityCalibSite import DensityCalibSite
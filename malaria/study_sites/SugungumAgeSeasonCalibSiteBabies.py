@@ -2,8 +2,8 @@ import logging
 import os
 import numpy as np
 from calibtool.analyzers.Helpers import season_channel_age_density_csv_to_pandas
-from calibtool.study_sites.site_setup_functions import \
-    config_setup_fn, summary_report_fn, add_treatment_fn, site_input_eir_fn
+from malaria.study_sites.site_setup_functions import \
+    config_setup_fn, summary_report_fn, add_treatment_fn, site_input_eir_fn, update_params_fn
 
 from calibtool.study_sites.DensityCalibSite import DensityCalibSite
 
@@ -42,7 +42,7 @@ class SugungumAgeSeasonCalibSiteBabies(DensityCalibSite):
                                            parasitemia_bins=[0.0, 16.0, 70.0, 409.0, 4000000.0],
                                            age_bins=[1.0, 4.0, 8.0, 18.0, 28.0, 43.0, 400000.0]))
         setup_fns.append(site_input_eir_fn(self.name, birth_cohort=True))
-        setup_fns.append(lambda cb: cb.update_params(
+        setup_fns.append(update_params_fn(
             {'Demographics_Filenames': ['Calibration\\birth_cohort_demographics_babies.json'],
              'Age_Initialization_Distribution_Type': 'DISTRIBUTION_SIMPLE',
              'Base_Population_Scale_Factor': 10,
@@ -6,12 +6,12 @@ survey_interval=10000
 setup_functions = [ config_setup_fn(duration=1461),
                     add_treatment_fn(),
                     survey_report_fn(days=[survey_day], interval=survey_interval),
-                    lambda cb : cb.update_params( {  "Geography": "Burkina",
+                    update_params_fn( {  "Geography": "Burkina",
                                                     'Base_Population_Scale_Factor' : 1,
                                                     'Enable_Vital_Dynamics' : 0,
                                                     "Climate_Model" : "CLIMATE_CONSTANT"
                                                 } ),
-                    lambda cb: cb.update_params({'Demographic_Coverage' : 0.95,
+                    update_params_fn({'Demographic_Coverage' : 0.95,
                     'Base_Gametocyte_Production_Rate' : 0.1,
                     "Gametocyte_Stage_Survival_Rate": 0.58,
                     'Antigen_Switch_Rate' : 2.83e-10,
@@ -36,7 +36,7 @@ analyzers = {         'seasonal_infectiousness_analyzer' : { 'name' : 'analyze_s
 def get_setup_functions(site) :
 
     setup_functions.append(site_input_eir_fn(site,birth_cohort=False, set_site_geography=False))
-    setup_functions.append(lambda cb : cb.update_params ( { "Demographics_Filenames" : ['Burkina/Burkina/Burkina Faso_' + site + '_2.5arcmin_demographics.static.compiled.json'] }))
+    setup_functions.append(update_params_fn( { "Demographics_Filenames" : ['Burkina/Burkina/Burkina Faso_' + site + '_2.5arcmin_demographics.static.compiled.json'] }))
     setup_functions.append(add_immunity_fn(['150113_calib9']))
     return setup_functions
 
@@ -1,7 +1,7 @@
 from site_setup_functions import *
 
 setup_functions = [ config_setup_fn(duration=730),
-                    lambda cb: cb.update_params( {    "Geography": "Calibration",
+                    update_params_fn( {    "Geography": "Calibration",
                                                       "Demographics_Filename": "Calibration/Malariatherapy_demographics.compiled.json",
                                                       "Base_Population_Scale_Factor" : 2,
                                                       "Enable_Vital_Dynamics" : 0,
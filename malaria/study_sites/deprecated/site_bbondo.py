@@ -83,7 +83,7 @@ setup_functions = [ config_setup_fn(duration=sim_duration) ,
                                          coverage=0.6, repetitions=3, nodes=range(745)),
                     add_drug_campaign_fn('MSAT', 'AL', [365*(burn_years+1)+msat_day-msat_offset],  delay=msat_offset,
                                          coverage=0.6, repetitions=3, nodes=range(745)),
-                    lambda cb : cb.update_params( { "Geography": "Household",
+                    update_params_fn( { "Geography": "Household",
                                                     "Listed_Events": [ "VaccinateNeighbors", "Blackout", "Distributing_AntimalariaDrug", 'TestedPositive', 'Give_Drugs', 
                                                                        'IRS_Blackout', 'Node_Sprayed',  'Spray_IRS', 'Received_Campaign_Drugs', 'Received_Treatment', 
                                                                        'Received_ITN', 'Received_Test', 'Received_RCD_Drugs'],
@@ -86,7 +86,7 @@ setup_functions = [ config_setup_fn(duration=sim_duration) ,
                                          repetitions=3, interval=60, coverage=0.4, delay=msat_offset,
                                          nodes=subset['all']),
 
-                    lambda cb : cb.update_params( { "Geography": "Household",
+                    update_params_fn( { "Geography": "Household",
                                                     "Listed_Events": [ "VaccinateNeighbors", "Blackout", "Distributing_AntimalariaDrug", 'TestedPositive', 'Give_Drugs', 
                                                                        'IRS_Blackout', 'Node_Sprayed',  'Spray_IRS', 'Received_Campaign_Drugs', 'Received_Treatment', 
                                                                        'Received_ITN', 'Received_Test', 'Received_RCD_Drugs'],
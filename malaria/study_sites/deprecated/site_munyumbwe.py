@@ -107,7 +107,7 @@ setup_functions = [ config_setup_fn(duration=sim_duration) ,
                                          repetitions=3, interval=60, coverage=0.6, delay=msat_offset, nodes=subset['all']),
 
                     #input_eir_fn([3]*12, nodes={'Node_List' : [10001], "class": "NodeSetNodeList"}),
-                    lambda cb : cb.update_params( { "Geography": "Household",
+                    update_params_fn( { "Geography": "Household",
                                                     "Listed_Events": [ "VaccinateNeighbors", "Blackout", "Distributing_AntimalariaDrug", 'TestedPositive', 'Give_Drugs',
                                                                        'IRS_Blackout', 'Node_Sprayed',  'Spray_IRS', 'Received_Campaign_Drugs', 'Received_Treatment',
                                                                        'Received_ITN', 'Received_Test', 'Received_RCD_Drugs'],
@@ -0,0 +1,249 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import types
+from collections import OrderedDict
+from multiprocessing import Pool
+
+from malaria.study_sites.site_setup_functions import SetupFunction, stable_value
+
+logger = logging.getLogger(__name__)
+
+_scalars = (str, bytes, int, float, bool, type(None))
+
+
+def _files(value):
+    if isinstance(value, str):
+        return [value] if os.path.isfile(value) else []
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        return [f for v in value for f in _files(v)]
+    return []
+
+
+def setup_function_key(fn):
+    """
+    Stable key of a setup function: its class and arguments, and the modification time of the files it reads.
+
+    Attributes listed in the outputs of a setup function (recorded when it is called) are not part of its key.
+    Functions, lambdas and closures have no key, nor do setup functions drawing unseeded random numbers (seed None),
+    as their effect cannot be known from their arguments.
+
+    :return: the key, or None if the setup function cannot be cached
+    """
+    if isinstance(fn, types.FunctionType) or not hasattr(fn, '__dict__'):
+        return None
+    if isinstance(fn, SetupFunction):
+        state = fn.arguments()
+    else:
+        state = {k: v for k, v in vars(fn).items() if k not in getattr(fn, 'outputs', ())}
+    if 'seed' in state and state['seed'] is None:
+        return None
+    try:
+        files = [[f, os.path.getmtime(f)] for f in _files(state)]
+        return json.dumps(['%s.%s' % (type(fn).__module__, type(fn).__name__), state, files],
+                          sort_keys=True, default=stable_value)
+    except (TypeError, ValueError):
+        return None
+
+
+def clone_state(obj):
+    """
+    Copy of the configuration held by a config builder, which can be modified freely without affecting the original.
+
+    This is a full structural copy, not copy-on-write: every dictionary, list and set is copied, and other objects
+    (e.g. typed campaign objects) are deep-copied; only strings and numbers, which cannot be modified, are shared with
+    the original. Its cost grows with the size of the configuration, but it is well below that of rerunning the setup
+    functions that built it (see examples/benchmarks/site_config_cache_benchmark.py).
+    """
+    if isinstance(obj, _scalars):
+        return obj
+    if isinstance(obj, dict):
+        return obj.__class__((k, clone_state(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return [clone_state(v) for v in obj]
+    if isinstance(obj, tuple):
+        return tuple(clone_state(v) for v in obj)
+    if isinstance(obj, (set, frozenset)):
+        return obj.__class__(obj)
+    return copy.deepcopy(obj)
+
+
+def _merge_tags(tags, result):
+    if isinstance(result, dict):
+        tags.update(result)
+
+
+class SiteConfigCache(object):
+    """
+    Cache of the config builder state (config, campaign, reports, ...) and tags produced by the static part of a site
+    setup chain, keyed by the setup-function arguments and the identity of the config builder state they were applied
+    to (see base_key).
+
+    The first build of a site runs its setup functions and records the result; later builds, e.g. for every sample of
+    every calibration iteration, start from a full copy of the recorded state (see clone_state). Only the cacheable prefix of the chain is
+    cached: setup functions without a key (see setup_function_key) and those after them are applied on every build.
+    Outputs recorded on the setup functions themselves (e.g. event_counts) are only set by the first build.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def base_key(cb):
+        """
+        Identity of the state of an unmodified clone of a config builder (see clone_builder): the base config builder
+        it was cloned from, which must not be modified once it serves as a base.
+        :return: the identity, or None if the config builder is not an unmodified clone
+        """
+        return cb.__dict__.get('_cloned_from')
+
+    def apply(self, cb, setup_fns, base=None):
+        """
+        Apply setup functions to a config builder, restoring the effect of their cacheable prefix from the cache.
+        :param cb: the config builder
+        :param setup_fns: list of setup functions, e.g. from CalibSite.get_setup_functions()
+        :param base: (optional) identity of the state of the config builder before the setup functions, e.g. a name or
+            version of the base configuration when every simulation starts from a fresh copy of it (default: base_key);
+            without one the setup functions are applied without caching
+        :return: dictionary of the tags returned by the setup functions
+        """
+        keys = []
+        for fn in setup_fns:
+            key = setup_function_key(fn)
+            if key is None:
+                break
+            keys.append(key)
+        static, dynamic = setup_fns[:len(keys)], setup_fns[len(keys):]
+
+        base = self.base_key(cb) if base is None else base
+        cb.__dict__.pop('_cloned_from', None)  # the state is about to change
+        tags = {}
+
+        if static and base is None:
+            logger.debug('Config builder has no base identity: setup functions applied without caching')
+            dynamic = setup_fns
+        elif static:
+            digest = hashlib.sha256(json.dumps([str(base), keys]).encode()).hexdigest()
+            with self.lock:
+                entry = self.entries.get(digest)
+                if entry is not None:
+                    self.entries.move_to_end(digest)
+
+            if entry is None:
+                for fn in static:
+                    _merge_tags(tags, fn(cb))
+                with self.lock:
+                    self.misses += 1
+                    self.entries[digest] = {'state': clone_state(vars(cb)), 'tags': clone_state(tags)}
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+            else:
+                cb.__dict__.clear()
+                cb.__dict__.update(clone_state(entry['state']))
+                tags.update(clone_state(entry['tags']))
+                with self.lock:
+                    self.hits += 1
+
+        for fn in dynamic:
+            _merge_tags(tags, fn(cb))
+        return tags
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __getstate__(self):  # recorded states stay in their process
+        return {'max_entries': self.max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+class cached_site_setup_fn(SetupFunction):
+    def __init__(self, setup_fns, cache=None, base=None):
+        """
+        Setup function applying a site setup chain through a SiteConfigCache
+        :param setup_fns: list of setup functions, e.g. from CalibSite.get_setup_functions()
+        :param cache: (optional) SiteConfigCache shared between sites
+        :param base: (optional) identity of the config builder the chain is applied to, e.g. a name or version of the
+            base configuration when every simulation receives a fresh copy of it (see SiteConfigCache.apply)
+        """
+        self.setup_fns = setup_fns
+        self.cache = cache or SiteConfigCache()
+        self.base = base
+
+    def __call__(self, cb):
+        return self.cache.apply(cb, self.setup_fns, base=self.base)
+
+    def arguments(self):
+        return {'setup_fns': self.setup_fns, 'base': self.base}
+
+
+def clone_builder(cb):
+    """
+    Copy of a config builder whose configuration can be modified without affecting the original (see clone_state)
+    """
+    clone = copy.copy(cb)
+    clone.__dict__ = clone_state(vars(cb))
+    clone._cloned_from = SiteConfigCache.base_key(cb) or '%s@%x' % (type(cb).__name__, id(cb))
+    return clone
+
+
+_base_cb = None
+_worker_cache = None
+
+
+def _init_worker(cb, max_entries):
+    global _base_cb, _worker_cache
+    _base_cb = cb
+    _worker_cache = SiteConfigCache(max_entries)
+
+
+def _write_config(args):
+    working_directory, setup_fns = args
+    cb = clone_builder(_base_cb)
+    tags = _worker_cache.apply(cb, setup_fns)
+    if not os.path.exists(working_directory):
+        os.makedirs(working_directory)
+    cb.dump_files(working_directory)
+    return working_directory, tags
+
+
+def write_site_configs(cb, setup_fn_lists, output_dir, processes=None, dirname_format='sim_%05d', chunksize=16,
+                       max_entries=64):
+    """
+    Write the config and campaign files of many simulations over a process pool, each built by applying a list of
+    setup functions (e.g. a site setup chain followed by the sample parameters) to the base config builder.
+
+    The base config builder is sent once to each worker process, and each worker keeps a SiteConfigCache so the static
+    part of a site setup chain is built once per worker rather than once per simulation. Setup functions are pickled
+    to the workers: lambdas and closures are not supported.
+
+    :param cb: The :py:class:`DTKConfigBuilder <dtk.utils.core.DTKConfigBuilder>` holding the shared base simulation
+    :param setup_fn_lists: list of lists of setup functions, one per simulation
+    :param output_dir: directory receiving one sub-directory per simulation
+    :param processes: number of worker processes (default: number of CPUs)
+    :param dirname_format: format of the per-simulation sub-directory names
+    :param chunksize: number of simulations sent to a worker at once
+    :param max_entries: maximum number of setup chains cached by each worker
+    :return: a list of (working directory, tags) tuples, in the order of the setup function lists
+    """
+    jobs = [(os.path.join(output_dir, dirname_format % i), list(fns)) for i, fns in enumerate(setup_fn_lists)]
+
+    pool = Pool(processes=processes, initializer=_init_worker, initargs=(cb, max_entries))
+    try:
+        results = pool.map(_write_config, jobs, chunksize=chunksize)
+    finally:
+        pool.close()
+        pool.join()
+
+    return results
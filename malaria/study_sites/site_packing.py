@@ -0,0 +1,225 @@
+"""
+Packing of input-EIR birth-cohort sites into multi-node simulations.
+
+Sites whose setup chains differ only by their input EIR (e.g. the incidence sites Dielmo and Ndiop, or the prevalence
+sites Namawala, Matsari, Rafin Marke and Sugungum) can run as the nodes of a single simulation for each parameter
+sample, rather than as one single-node simulation each. Every node receives the input EIR of its site and a summary
+report of its own, named after the site report with the site name appended; the analyzers of each site are then
+applied to the outputs of its node (see malaria.analyzers.PackedSites).
+
+Maternal_Antibody_Protection is a config parameter shared by all nodes, while configure_site_EIR scales it with the
+annual EIR of the site: only sites whose scalings are within a tolerance are packed together, and the pack uses their
+mean.
+
+write_packed_site_configs packs a set of sites and writes the simulations of every parameter sample.
+"""
+import copy
+import json
+import logging
+import os
+from collections import OrderedDict
+
+from dtk.generic.geography import set_geography
+from dtk.interventions.input_EIR import add_InputEIR
+
+from malaria.reports.MalariaReport import add_summary_report
+from malaria.site.input_EIR_by_site import site_EIR_profiles
+from malaria.study_sites.site_config_cache import setup_function_key, write_site_configs
+from malaria.study_sites.site_setup_functions import SetupFunction, site_input_eir_fn, summary_report_fn, \
+    update_params_fn
+
+logger = logging.getLogger(__name__)
+
+
+def replicate_demographics(demographics, n_nodes):
+    """
+    Multi-node demographics for a pack: the single node of a birth-cohort demographics file repeated, with node IDs
+    1 to n_nodes in the order of the sites of the pack.
+
+    :param demographics: single-node demographics dictionary (e.g. the compiled birth_cohort_demographics)
+    :param n_nodes: number of sites in the pack
+    :return: the multi-node demographics dictionary, to write as the demographics file of the pack
+    """
+    if len(demographics.get('Nodes', [])) != 1:
+        raise Exception('Packing sites needs a single-node demographics file.')
+
+    packed = dict(demographics)
+    packed['Nodes'] = []
+    for node_id in range(1, n_nodes + 1):
+        node = copy.deepcopy(demographics['Nodes'][0])
+        node['NodeID'] = node_id
+        packed['Nodes'].append(node)
+    packed['Metadata'] = dict(demographics.get('Metadata', {}), NodeCount=n_nodes)
+    return packed
+
+
+def _node_set(node_id):
+    return {'class': 'NodeSetNodeList', 'Node_List': [node_id]}
+
+
+class packed_site_input_eir_fn(SetupFunction):
+    def __init__(self, sites):
+        """
+        Input EIR of several sites, one per node (see configure_site_EIR)
+        :param sites: names of the sites, in node order
+        """
+        self.sites = sites
+
+    def __call__(self, cb):
+        EIRs, mAb = site_EIR_profiles(self.sites, maternal_protection=cb.get_param('Maternal_Antibody_Protection'))
+        maternal_protection = float(mAb.mean())
+
+        set_geography(cb, "Birth_Cohort")
+        cb.update_params({'Config_Name': '+'.join(self.sites),
+                          'Vector_Species_Names': [],  # no mosquitoes
+                          'Maternal_Antibodies_Type': 'CONSTANT_INITIAL_IMMUNITY',
+                          'Maternal_Antibody_Protection': maternal_protection})
+
+        tags = {'__sites__': ','.join(self.sites), 'Maternal_Antibody_Protection': maternal_protection}
+        for node_id, (site, monthlyEIRs) in enumerate(zip(self.sites, EIRs.tolist()), start=1):
+            add_InputEIR(cb, monthlyEIRs=monthlyEIRs, nodes=_node_set(node_id))
+            tags['monthlyEIRs_%s' % site] = monthlyEIRs
+        return tags
+
+
+class packed_summary_report_fn(SetupFunction):
+    def __init__(self, sites, report):
+        """
+        One summary report per node, named after the report of the sites with the site name appended
+        :param sites: names of the sites, in node order
+        :param report: the summary_report_fn of the sites
+        """
+        self.sites = sites
+        self.report = report
+
+    def __call__(self, cb):
+        r = self.report
+        for node_id, site in enumerate(self.sites, start=1):
+            add_summary_report(cb, start=r.start, interval=r.interval, nreports=r.nreports,
+                               description='%s_%s' % (r.description, site), age_bins=r.age_bins,
+                               parasitemia_bins=r.parasitemia_bins, infection_bins=r.infection_bins,
+                               nodes=_node_set(node_id), ipfilter=r.ip_filter)
+
+
+def site_signature(site):
+    """
+    Key of the setup chain of a site without its input EIR: sites with the same signature can be packed together.
+    :return: the signature, or None if the site cannot be packed
+    """
+    keys = []
+    for fn in site.get_setup_functions():
+        if isinstance(fn, site_input_eir_fn):
+            if not fn.birth_cohort:
+                return None
+            continue
+        key = setup_function_key(fn)
+        if key is None:
+            return None
+        keys.append(key)
+    return tuple(keys)
+
+
+def pack_sites(sites, tolerance=0.05, max_sites=8):
+    """
+    Group sites into packs that can share a simulation: same setup chain apart from the input EIR, and maternal
+    antibody scalings within a tolerance of each other.
+
+    :param sites: list of CalibSite
+    :param tolerance: largest difference of maternal antibody scaling (mAb_vs_EIR of the annual EIR) within a pack
+    :param max_sites: largest number of sites (nodes) in a pack
+    :return: list of lists of CalibSite; sites that cannot be packed are alone in their list
+    """
+    groups = OrderedDict()
+    packs = []
+    for site in sites:
+        signature = site_signature(site)
+        if signature is None:
+            packs.append([site])
+        else:
+            groups.setdefault(signature, []).append(site)
+
+    for group in groups.values():
+        scalings = site_EIR_profiles([site.name for site in group])[1]
+        ordered = sorted(zip(scalings.tolist(), range(len(group))))
+        pack, low = [], None
+        for scaling, i in ordered:
+            if pack and (scaling - low > tolerance or len(pack) == max_sites):
+                packs.append(pack)
+                pack = []
+            if not pack:
+                low = scaling
+            pack.append(group[i])
+        if pack:
+            packs.append(pack)
+
+    logger.info('Packed %d sites into %d simulations per sample', len(sites), len(packs))
+    return packs
+
+
+def packed_setup_functions(sites, demographics_filename):
+    """
+    Setup chain of a multi-node simulation running several sites, from the setup chain of the first site: its input
+    EIR and summary reports become one per node, and the demographics are those of the pack.
+
+    :param sites: list of CalibSite forming a pack (see pack_sites)
+    :param demographics_filename: demographics file of the pack, with one node per site (see replicate_demographics)
+    :return: list of setup functions
+    """
+    if len(sites) == 1:
+        return sites[0].get_setup_functions()
+
+    names = [site.name for site in sites]
+    setup_fns = []
+    for fn in sites[0].get_setup_functions():
+        if isinstance(fn, site_input_eir_fn):
+            setup_fns.append(packed_site_input_eir_fn(names))
+        elif isinstance(fn, summary_report_fn):
+            setup_fns.append(packed_summary_report_fn(names, fn))
+        else:
+            setup_fns.append(fn)
+    setup_fns.append(update_params_fn({'Demographics_Filenames': [demographics_filename]}))
+    return setup_fns
+
+
+def packed_demographics_filename(n_nodes):
+    return 'packed_birth_cohort_demographics_%d_nodes.json' % n_nodes
+
+
+def write_packed_site_configs(cb, sites, samples, output_dir, demographics, input_dir, tolerance=0.05, max_sites=8,
+                              **kwargs):
+    """
+    Write the config and campaign files of the simulations running a set of sites for every parameter sample, with
+    the sites packed into multi-node simulations (see pack_sites) and the simulations written by write_site_configs.
+
+    :param cb: The :py:class:`DTKConfigBuilder <dtk.utils.core.DTKConfigBuilder>` holding the shared base simulation
+    :param sites: list of CalibSite
+    :param samples: list of dictionaries of config parameters, one per sample
+    :param output_dir: directory receiving one sub-directory per simulation
+    :param demographics: single-node birth-cohort demographics dictionary (see replicate_demographics)
+    :param input_dir: input directory of the simulations, receiving one multi-node demographics file per pack size
+    :param tolerance: see pack_sites
+    :param max_sites: see pack_sites
+    :param kwargs: passed to write_site_configs (e.g. processes)
+    :return: list of (working directory, tags) tuples, the tags holding the sample index, and the site (__site__) or
+        packed sites (__sites__) with their input EIRs
+    """
+    packs = pack_sites(sites, tolerance=tolerance, max_sites=max_sites)
+
+    setup_fn_lists, sample_tags = [], []
+    for pack in packs:
+        filename = packed_demographics_filename(len(pack))
+        path = os.path.join(input_dir, filename)
+        if len(pack) > 1 and not os.path.exists(path):
+            if not os.path.exists(input_dir):
+                os.makedirs(input_dir)
+            with open(path, 'w') as fout:
+                json.dump(replicate_demographics(demographics, len(pack)), fout, indent=4)
+
+        chain = packed_setup_functions(pack, filename)
+        for i, sample in enumerate(samples):
+            setup_fn_lists.append(chain + [update_params_fn(sample)])
+            sample_tags.append({'__sample_index__': i, '__site__': pack[0].name} if len(pack) == 1 else
+                               {'__sample_index__': i})
+
+    results = write_site_configs(cb, setup_fn_lists, output_dir, **kwargs)
+    return [(directory, dict(tags, **extra)) for (directory, tags), extra in zip(results, sample_tags)]
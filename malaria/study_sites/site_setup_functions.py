@@ -10,18 +10,132 @@ from dtk.interventions.migrate_to import add_migration_event
 from dtk.interventions.health_seeking import add_health_seeking
 from dtk.utils.reports.CustomReport import BaseReport, BaseVectorStatsReport
 
+import hashlib
 import json
+import logging
+import os
+import threading
+import types
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+_coverage_files = {}
+_coverage_lock = threading.Lock()
+
+
+def load_coverage_file(fname):
+    """
+    Parse a node-ID coverage json once per process, and again only when the file is modified.
+
+    Channels listing {'coverage': ..., 'nodes': [...]} entries are returned with their node lists as numpy integer
+    arrays (call tolist() before putting them in a campaign). The result is shared: do not modify it.
+
+    :param fname: path of the coverage file
+    :return: dictionary of channel to list of coverage entries
+    """
+    path = os.path.abspath(fname)
+    mtime = os.path.getmtime(path)
+    with _coverage_lock:
+        cached = _coverage_files.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    with open(path) as fin:
+        raw = json.loads(fin.read())
+
+    coverage = {}
+    for channel, entries in raw.items():
+        if isinstance(entries, list) and all(isinstance(e, dict) and 'nodes' in e for e in entries):
+            entries = [dict(e, nodes=np.asarray(e['nodes'], dtype=np.int64)) for e in entries]
+        coverage[channel] = entries
+
+    with _coverage_lock:
+        _coverage_files[path] = (mtime, coverage)
+    return coverage
+
+def stable_value(obj):
+    """
+    JSON form of setup-function arguments that JSON cannot encode: numpy values, sets, read-only mappings (e.g.
+    LayeredParams) and nested value objects
+    """
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=repr)
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, types.FunctionType) or not hasattr(obj, '__dict__'):
+        raise TypeError('%r has no stable value' % obj)
+    return ['%s.%s' % (type(obj).__module__, type(obj).__name__), vars(obj)]
+
+
+class SetupFunction(ABCMeta('SetupFunctionBase', (object,), {})):  # abstract on Python 2 and 3
+    """
+    Base of the setup functions: declarative value objects holding their arguments and applied to a config builder
+    when called. They pickle to worker processes, and compare and hash by class and arguments.
+
+    Arguments must not be modified once a setup function is constructed, as its hash would change while it is held in
+    a set, a dictionary or a cache; create a new setup function instead. Only the attributes listed in outputs may be
+    set when it is called.
+    """
+
+    outputs = ()  # attributes recorded when called, not arguments
+
+    @abstractmethod
+    def __call__(self, cb):
+        """
+        Apply the setup function to a config builder.
+        :return: (optional) dictionary of tags of the simulation
+        """
+
+    def arguments(self):
+        return {k: v for k, v in vars(self).items() if k not in self.outputs}
+
+    def key(self):
+        """
+        :return: JSON string of the class and arguments, identical in every process (unlike hash)
+        """
+        return json.dumps(['%s.%s' % (type(self).__module__, type(self).__name__), self.arguments()],
+                          sort_keys=True, default=stable_value)
+
+    def digest(self):
+        return hashlib.sha256(self.key().encode()).hexdigest()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.key() == other.key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__,
+                           ', '.join('%s=%r' % item for item in sorted(self.arguments().items())))
+
+
 # Call update_params on the CB
-class update_params:
+class update_params_fn(SetupFunction):
     def __init__(self, params):
         self.params = params
 
     def __call__(self, cb):
         return cb.update_params(self.params)
 
-class config_setup_fn:
+
+update_params = update_params_fn  # previous name, for setup chains written against it
+
+class config_setup_fn(SetupFunction):
     def __init__(self, duration=21915):
         self.duration = duration
 
@@ -30,7 +144,7 @@ class config_setup_fn:
                             'Infection_Updates_Per_Timestep': 8})
 
 # reporters
-class summary_report_fn:
+class summary_report_fn(SetupFunction):
     def __init__(self, start=1, interval=365, nreports=2000, age_bins=[1000], parasitemia_bins=[0, 50, 500, 5000, 5000000], infection_bins=[0, 5, 20, 50, 80, 100], description='Annual_Report', nodes=None, ipfilter=None):
         self.start = start
         self.interval = interval
@@ -50,7 +164,7 @@ class summary_report_fn:
                                   nodes=self.nodes, ipfilter=self.ip_filter)
 
 
-class vector_stats_report_fn:
+class vector_stats_report_fn(SetupFunction):
     def __init__(self, start=1):
         self.start = start
 
@@ -58,7 +172,7 @@ class vector_stats_report_fn:
         return cb.add_reports(BaseVectorStatsReport(type="ReportVectorStats"))
 
 
-class survey_report_fn:
+class survey_report_fn(SetupFunction):
     def __init__(self, days, interval=10000, nreports=1, survey_days=None, reporting_interval=None):
         self.days = days
         self.interval = interval
@@ -71,7 +185,7 @@ class survey_report_fn:
         return add_survey_report(cb, survey_days=self.survey_days, reporting_interval=self.reporting_interval,
                                  nreports=self.nreports)
 
-class filtered_report_fn:
+class filtered_report_fn(SetupFunction):
     def __init__(self, start, end=100000, nodes=[], description=''):
         self.start = start
         self.end = end
@@ -82,7 +196,7 @@ class filtered_report_fn:
         from malaria.reports.MalariaReport import add_filtered_report
         return add_filtered_report(cb, start=self.start, end=self.end, nodes=self.nodes, description=self.description)
 
-class filtered_spatial_report_fn:
+class filtered_spatial_report_fn(SetupFunction):
     def __init__(self, start, end, channels, nodes=[], description=''):
         self.start = start
         self.end = end
@@ -95,7 +209,7 @@ class filtered_spatial_report_fn:
         return add_filtered_spatial_report(cb, start=self.start, end=self.end, channels=self.channels,
                                            nodes=self.nodes, description=self.description)
 
-class event_counter_report_fn:
+class event_counter_report_fn(SetupFunction):
     def __init__(self, channels, start, duration, nodes, description=''):
         self.start = start
         self.duration = duration
@@ -110,7 +224,7 @@ class event_counter_report_fn:
 
 
 # vector
-class larval_habitat_fn:
+class larval_habitat_fn(SetupFunction):
     def __init__(self, species, habitats):
         self.species = species
         self.habitats = habitats
@@ -118,7 +232,7 @@ class larval_habitat_fn:
     def __call__(self, cb):
         return set_larval_habitat(cb, {self.species: self.habitats})
 
-class species_param_fn:
+class species_param_fn(SetupFunction):
     def __init__(self, species, param, value):
         self.species = species
         self.param = param
@@ -127,7 +241,7 @@ class species_param_fn:
     def __call__(self, cb):
         return set_species_param(cb, self.species, self.param, self.value)
 
-class set_params_by_species_fn:
+class set_params_by_species_fn(SetupFunction):
     def __init__(self, species):
         self.species = species
 
@@ -135,7 +249,7 @@ class set_params_by_species_fn:
         return set_params_by_species(cb.params, self.species, 'MALARIA_SIM')
 
 # immune overlays
-class add_immunity_fn:
+class add_immunity_fn(SetupFunction):
     def __init__(self, tags):
         self.tags = tags
 
@@ -144,7 +258,7 @@ class add_immunity_fn:
         return add_immune_overlays(cb, tags=self.tags)
 
 # input EIR
-class site_input_eir_fn:
+class site_input_eir_fn(SetupFunction):
     def __init__(self, site, birth_cohort=True, set_site_geography=False):
         self.site = site
         self.birth_cohort = birth_cohort
@@ -154,7 +268,7 @@ class site_input_eir_fn:
         from malaria.site.input_EIR_by_site import configure_site_EIR
         return configure_site_EIR(cb, site=self.site, birth_cohort=self.birth_cohort, set_site_geography=False)
 
-class input_eir_fn:
+class input_eir_fn(SetupFunction):
     def __init__(self, monthlyEIRs, start_day=0, nodes=None):
         self.monthlyEIRs = monthlyEIRs
         self.start_day = start_day
@@ -164,7 +278,7 @@ class input_eir_fn:
         return add_InputEIR(cb, monthlyEIRs=self.monthlyEIRs, start_day=self.start_day, nodes=self.nodes)
 
 # importation pressure
-class add_outbreak_fn:
+class add_outbreak_fn(SetupFunction):
     def __init__(self, start_day=0, outbreak_fraction=0.01, repetitions=-1, tsteps_btwn=365, nodes=None):
         self.start_day = start_day
         self.outbreak_fraction = outbreak_fraction
@@ -177,7 +291,7 @@ class add_outbreak_fn:
                                   tsteps_btwn=self.tsteps_btwn, start_day=self.start_day, nodes=self.nodes)
 
 # migration
-class add_migration_fn:
+class add_migration_fn(SetupFunction):
     def __init__(self, nodeto, start_day=0, coverage=1, repetitions=1, tsteps_btwn=365,
                      duration_at_node_distr_type='FIXED_DURATION',
                      duration_of_stay=100, duration_of_stay_2=0,
@@ -212,7 +326,7 @@ class add_migration_fn:
 
 
 # mosquito release
-class add_mosquito_release_fn:
+class add_mosquito_release_fn(SetupFunction):
     def __init__(self, start_day, vector_species, number_vectors, repetitions=-1, tsteps_btwn=365, nodes=None) :
         self.start_day = start_day
         self.vector_species = vector_species
@@ -228,7 +342,7 @@ class add_mosquito_release_fn:
 
 
 # health-seeking
-class add_treatment_fn:
+class add_treatment_fn(SetupFunction):
     def __init__(self, start=0, drug=None, targets=None, nodes=None, drug_ineligibility_duration=0,
                  node_property_restrictions=[]):
         self.start = start
@@ -249,19 +363,7 @@ class add_treatment_fn:
 
 
 # health-seeking from nodeid-coverage specified in json
-def add_HS_by_node_id_fn(reffname, start=0) :        
-    def fn(cb) :
-        with open(reffname) as fin :
-            cov = json.loads(fin.read())
-        for hscov in cov['hscov'] :
-            targets = [ { 'trigger': 'NewClinicalCase', 'coverage': 1, 'agemin':15, 'agemax':200, 'seek': hscov['coverage'], 'rate': 0.3 },
-                        { 'trigger': 'NewClinicalCase', 'coverage': 1, 'agemin':0, 'agemax':15, 'seek':  min([1, hscov['coverage']*1.5]), 'rate': 0.3 },
-                        { 'trigger': 'NewSevereCase',   'coverage': 1, 'seek': 0.8, 'rate': 0.5 } ]
-            add_health_seeking(cb, start_day = start, targets=targets, nodes={'Node_List' : hscov['nodes'], "class": "NodeSetNodeList"})
-    return fn
-
-# seasonal health-seeking from nodeid-coverage specified in json
-class add_HS_by_node_id_fn:
+class add_HS_by_node_id_fn(SetupFunction):
     def __init__(self, reffname, start=0):
         self.reffname = reffname
         self.start = start
@@ -270,28 +372,90 @@ class add_HS_by_node_id_fn:
         return self.fn(cb)
 
     def fn(self, cb):
-        with open(self.reffname) as fin :
-            cov = json.loads(fin.read())
+        cov = load_coverage_file(self.reffname)
         for hscov in cov['hscov'] :
             targets = [{'trigger': 'NewClinicalCase', 'coverage': 1, 'agemin':15, 'agemax':200, 'seek': hscov['coverage'], 'rate': 0.3},
                        {'trigger': 'NewClinicalCase', 'coverage': 1, 'agemin':0, 'agemax':15, 'seek':  min([1, hscov['coverage']*1.5]), 'rate': 0.3},
                        {'trigger': 'NewSevereCase',   'coverage': 1, 'seek': 0.8, 'rate': 0.5}]
-            add_health_seeking(cb, start_day=self.start, targets=targets, nodes={'Node_List': hscov['nodes'], "class": "NodeSetNodeList"})
-
-
-class add_seasonal_HS_by_node_id_fn:
-    def __init__(self, reffname, days_in_month, scale_by_month, start=0):
+            add_health_seeking(cb, start_day=self.start, targets=targets, nodes={'Node_List': hscov['nodes'].tolist(), "class": "NodeSetNodeList"})
+
+
+# seasonal health-seeking targets, scaled each month from the coverage of each node group
+seasonal_hs_targets = [
+    {'trigger': 'NewClinicalCase', 'coverage': 1, 'agemin': 15, 'agemax': 200, 'rate': 0.3},
+    {'trigger': 'NewClinicalCase', 'coverage': 1, 'agemin': 0, 'agemax': 15, 'rate': 0.3},
+    {'trigger': 'NewSevereCase', 'coverage': 1, 'rate': 0.5}]
+
+
+def seasonal_hs_seeks(coverage, scale, sev_cov=0.8):
+    """
+    Seeking probabilities of the seasonal health-seeking targets (adults, children, severe cases).
+
+    :param coverage: adult coverage of a node group, or a numpy array of them
+    :param scale: seasonal scaling of the month
+    :return: list of the seeking probabilities, in the order of seasonal_hs_targets
+    """
+    ad_cov = np.asarray(coverage, dtype=float)
+    kid_cov = np.minimum(1, ad_cov * 1.5)
+    return [np.minimum(1, ad_cov * scale),
+            np.minimum(1, kid_cov * scale),
+            np.minimum(1, np.maximum(sev_cov * scale, kid_cov * scale))]
+
+
+def seasonal_hs_groups(covlist, scale_by_month, seek_precision=None):
+    """
+    Group the node groups of a health-seeking coverage channel by scaled seeking probability, for each month and
+    target. Groups sharing a month and target with equal seeking can be covered by a single campaign event.
+
+    :param covlist: list of {'coverage': ..., 'nodes': [...]} entries of the coverage channel
+    :param scale_by_month: seasonal scaling of each month
+    :param seek_precision: (optional) number of decimals to round seeking to before grouping
+    :return: list (one per month) of lists of (target, seek, indices into covlist)
+    """
+    coverage = [item['coverage'] for item in covlist]
+    months = []
+    for scale in scale_by_month:
+        groups = []
+        for target, seeks in zip(seasonal_hs_targets, seasonal_hs_seeks(coverage, scale)):
+            if seek_precision is not None:
+                seeks = np.round(seeks, seek_precision)
+            values, inverse = np.unique(seeks, return_inverse=True)
+            for k, seek in enumerate(values):
+                groups.append((target, float(seek), np.flatnonzero(inverse == k).tolist()))
+        months.append(groups)
+    return months
+
+
+def _log_event_counts(name, counts, events='health-seeking', merged='compact'):
+    logger.info('%s: %d %s events instead of %d (%.1fx fewer)' %
+                (name, counts[merged], events, counts['per_group'], counts['per_group'] / float(max(1, counts[merged]))))
+
+
+class add_seasonal_HS_by_node_id_fn(SetupFunction):
+    outputs = ('event_counts',)  # recorded when called, not arguments
+
+    def __init__(self, reffname, days_in_month, scale_by_month, start=0, compact=False, seek_precision=None):
+        """
+        :param compact: if True, emit one event per month and target for all node groups with equal scaled seeking
+            rather than one per node group
+        :param seek_precision: (optional) number of decimals to round seeking to before grouping (compact only)
+        """
         self.reffname = reffname
         self.days_in_month = days_in_month
         self.scale_by_month = scale_by_month
         self.start = start
+        self.compact = compact
+        self.seek_precision = seek_precision
+        self.event_counts = None
 
     def __call__(self, cb):
         return self.fn(cb)
 
     def fn(self, cb):
-        with open(self.reffname) as fin :
-            cov = json.loads(fin.read())
+        cov = load_coverage_file(self.reffname)
+        if self.compact:
+            return self.compact_fn(cb, cov['hscov'])
+
         for hscov in cov['hscov']:
             ad_cov = hscov['coverage']
             kid_cov = min([1, hscov['coverage']*1.5])
@@ -313,10 +477,34 @@ class add_seasonal_HS_by_node_id_fn:
                 add_health_seeking(cb, start_day=start_day, targets=targets,
                                    duration=duration, repetitions=-1,
                                    drug_ineligibility_duration=14,
-                                   nodes={'Node_List': hscov['nodes'], "class": "NodeSetNodeList"})
-
-class add_seasonal_HS_by_NP_fn:
-    def __init__(self, fname, channel, start_day, days_in_month, scale_by_month, duration_years):
+                                   nodes={'Node_List': hscov['nodes'].tolist(), "class": "NodeSetNodeList"})
+
+    def compact_fn(self, cb, covlist):
+        month_starts = self.start + np.cumsum(self.days_in_month)
+        compact = 0
+        for start_month, groups in enumerate(seasonal_hs_groups(covlist, self.scale_by_month, self.seek_precision)):
+            for target, seek, indices in groups:
+                nodes = np.concatenate([covlist[i]['nodes'] for i in indices]).tolist()
+                add_health_seeking(cb, start_day=int(month_starts[start_month]), targets=[dict(target, seek=seek)],
+                                   duration=self.days_in_month[start_month + 1], repetitions=-1,
+                                   drug_ineligibility_duration=14,
+                                   nodes={'Node_List': nodes, "class": "NodeSetNodeList"})
+                compact += 1
+
+        self.event_counts = {'per_group': len(covlist) * len(self.scale_by_month) * len(seasonal_hs_targets),
+                             'compact': compact}
+        _log_event_counts(self.reffname, self.event_counts)
+
+class add_seasonal_HS_by_NP_fn(SetupFunction):
+    outputs = ('event_counts',)  # recorded when called, not arguments
+
+    def __init__(self, fname, channel, start_day, days_in_month, scale_by_month, duration_years, compact=False,
+                 seek_precision=None):
+        """
+        :param compact: if True, emit one event per month and target restricted to all node groups with equal scaled
+            seeking rather than one per node group
+        :param seek_precision: (optional) number of decimals to round seeking to before grouping (compact only)
+        """
         self.fname = fname
         self.channel = channel
         self.date = start_day
@@ -324,31 +512,39 @@ class add_seasonal_HS_by_NP_fn:
         self.scale_by_month = scale_by_month
         self.duration_years = duration_years
         self.prop_name = 'HScategory' if self.channel == 'hscov' else 'CHWcategory'
+        self.compact = compact
+        self.seek_precision = seek_precision
+        self.event_counts = None
 
     def __call__(self, cb):
         return self.fn(cb)
 
     def fn(self, cb):
-        self.set_hs_group(cb)
-        self.seasonal_health_seeking(cb)
+        covlist = self.load_coverage()
+        self.set_hs_group(cb, covlist)
+        self.seasonal_health_seeking(cb, covlist)
 
-    def set_hs_group(self, cb):
+    def load_coverage(self):
+        return load_coverage_file(self.fname)[self.channel]
 
-        from dtk.interventions.property_change import change_node_property
+    def set_hs_group(self, cb, covlist=None):
 
-        with open(self.fname) as fin:
-            interv = json.loads(fin.read())
+        from dtk.interventions.property_change import change_node_property
 
-        covlist = interv[self.channel]
+        if covlist is None:
+            covlist = self.load_coverage()
         for i, item in enumerate(covlist):
             code = 'group%d' % i
-            change_node_property(cb, self.prop_name, code, start_day=self.date, nodeIDs=item['nodes'])
+            change_node_property(cb, self.prop_name, code, start_day=self.date, nodeIDs=item['nodes'].tolist())
+
+    def seasonal_health_seeking(self, cb, covlist=None):
 
-    def seasonal_health_seeking(self, cb):
+        if covlist is None:
+            covlist = self.load_coverage()
+        if self.compact:
+            return self.compact_health_seeking(cb, covlist)
 
-        with open(self.fname) as fin:
-            cov = json.loads(fin.read())
-        for i, hscov in enumerate(cov[self.channel]):
+        for i, hscov in enumerate(covlist):
 
             code = 'group%d' % i
             ad_cov = hscov['coverage']
@@ -372,9 +568,25 @@ class add_seasonal_HS_by_NP_fn:
                                    drug_ineligibility_duration=14,
                                    node_property_restrictions=[{self.prop_name: code}])
 
+    def compact_health_seeking(self, cb, covlist):
+        # node property restrictions listed in separate dictionaries are OR'ed together
+        month_starts = self.date + np.cumsum(self.days_in_month)
+        compact = 0
+        for start_month, groups in enumerate(seasonal_hs_groups(covlist, self.scale_by_month, self.seek_precision)):
+            for target, seek, indices in groups:
+                add_health_seeking(cb, start_day=int(month_starts[start_month]), targets=[dict(target, seek=seek)],
+                                   duration=self.days_in_month[start_month + 1], repetitions=self.duration_years + 1,
+                                   drug_ineligibility_duration=14,
+                                   node_property_restrictions=[{self.prop_name: 'group%d' % i} for i in indices])
+                compact += 1
+
+        self.event_counts = {'per_group': len(covlist) * len(self.scale_by_month) * len(seasonal_hs_targets),
+                             'compact': compact}
+        _log_event_counts('%s (%s)' % (self.fname, self.channel), self.event_counts)
+
 
 # ITNs
-class add_itn_fn:
+class add_itn_fn(SetupFunction):
     def __init__(self, start=0, coverage=1, waning=None, nodeIDs=None):
         self.start = start
         self.coverage = coverage
@@ -388,7 +600,7 @@ class add_itn_fn:
         coverage_by_age = {'min': 0, 'max': 200, 'coverage': self.coverage}
         add_ITN(cb, start=self.start, coverage_by_ages=[coverage_by_age], waning=self.waning, nodeIDs=self.nodeIDs)
 
-class add_itn_age_season_fn:
+class add_itn_age_season_fn(SetupFunction):
     def __init__(self, start=0, coverage=1, age_dep=[], seasonal_dep={}, discard={}):
         self.start = start
         self.coverage = coverage
@@ -408,39 +620,88 @@ class add_itn_age_season_fn:
                            discard=self.discard)
 
 
+def corrected_coverage_matrix(coverages, fracs):
+    """
+    Coverage of each distribution round such that the overall coverage of each group after all rounds matches its
+    target: round i covers coverage * frac_i / prod_{j > i}(1 - frac_j * coverage).
+
+    :param coverages: target coverage of each node group
+    :param fracs: fraction of the target covered by each round
+    :return: numpy array of shape (groups, rounds)
+    """
+    coverages = np.asarray(coverages, dtype=float)[:, None]
+    fracs = np.asarray(fracs, dtype=float)[None, :]
+    remaining = np.ones((coverages.shape[0], fracs.shape[1]))
+    remaining[:, :-1] = np.cumprod((1 - fracs * coverages)[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    return coverages * fracs / remaining
+
+
 # ITNs from nodeid-coverage specified in json
-class add_itn_by_node_id_fn:
-    def __init__(self, reffname, itn_dates, itn_fracs, channel='itn2012cov', waning=None):
+class add_itn_by_node_id_fn(SetupFunction):
+    outputs = ('event_counts',)  # recorded when called, not arguments
+
+    def __init__(self, reffname, itn_dates, itn_fracs, channel='itn2012cov', waning=None, grouped=False,
+                 coverage_decimals=3):
+        """
+        :param grouped: if True, emit one ITN event per date and distinct corrected coverage, for all node groups
+            sharing it, rather than one per node group and date
+        :param coverage_decimals: number of decimals corrected coverages are rounded to before grouping
+        """
         self.reffname = reffname
         self.itn_dates = itn_dates
         self.itn_fracs = itn_fracs
         self.channel = channel
         self.waning = waning or {}
+        self.grouped = grouped
+        self.coverage_decimals = coverage_decimals
+        self.event_counts = None
 
     def __call__(self, cb):
         return self.fn(cb)
 
+    def add_itn(self, cb, itn_date, c, birth_duration, nodeIDs):
+        add_ITN(cb, itn_date,
+                coverage_by_ages=[{'min': 0, 'max': 5, 'coverage': min([1, c*1.3])},
+                                  {'birth': 1, 'coverage': min([1,c*1.3]), 'duration': max([-1, birth_duration])},
+                                  {'min': 5, 'max': 20, 'coverage': c / 2},
+                                  {'min': 20, 'max': 100, 'coverage': min([1, c*1.3])}],
+                waning=self.waning, nodeIDs=nodeIDs)
+
     def fn(self, cb) :
         birth_durations = [self.itn_dates[x] - self.itn_dates[x + 1] for x in range(len(self.itn_dates) - 1)]
         # itn_distr = zip(self.itn_dates[:-1], self.itn_fracs)
-        with open(self.reffname) as fin :
-            cov = json.loads(fin.read())
+        cov = load_coverage_file(self.reffname)
+        if self.grouped:
+            return self.grouped_fn(cb, cov[self.channel], birth_durations)
+
         for itncov in cov[self.channel] :
             if itncov['coverage'] > 0 :
                 for i, (itn_date, itn_frac) in enumerate(zip(self.itn_dates, self.itn_fracs)):
                     c = itncov['coverage'] * itn_frac
                     if i < len(self.itn_fracs) - 1:
                         c /= np.prod([1 - x * itncov['coverage'] for x in self.itn_fracs[i + 1:]])
-                    add_ITN(cb, itn_date,
-                            coverage_by_ages=[{'min': 0, 'max': 5, 'coverage': min([1, c*1.3])},
-                                              {'birth': 1, 'coverage': min([1,c*1.3]), 'duration': max([-1, birth_durations[i]])},
-                                              {'min': 5, 'max': 20, 'coverage': c / 2},
-                                              {'min': 20, 'max': 100, 'coverage': min([1, c*1.3])}],
-                            waning=self.waning, nodeIDs=itncov['nodes'])
+                    self.add_itn(cb, itn_date, c, birth_durations[i], itncov['nodes'].tolist())
+
+    def grouped_fn(self, cb, covlist, birth_durations):
+        covlist = [itncov for itncov in covlist if itncov['coverage'] > 0]
+        rounds = min(len(self.itn_dates), len(self.itn_fracs))
+        corrected = corrected_coverage_matrix([itncov['coverage'] for itncov in covlist], self.itn_fracs)[:, :rounds]
+        corrected = np.round(corrected, self.coverage_decimals)
+
+        grouped = 0
+        for i, itn_date in enumerate(self.itn_dates[:rounds]):
+            values, inverse = np.unique(corrected[:, i], return_inverse=True)
+            for k, c in enumerate(values):
+                nodes = np.concatenate([covlist[g]['nodes'] for g in np.flatnonzero(inverse == k)])
+                self.add_itn(cb, itn_date, float(c), birth_durations[i], nodes.tolist())
+                grouped += 1
+
+        self.event_counts = {'per_group': len(covlist) * rounds, 'grouped': grouped}
+        _log_event_counts('%s (%s)' % (self.reffname, self.channel), self.event_counts, events='ITN', merged='grouped')
 
 
 # IRS
-class add_irs_fn:
+class add_irs_fn(SetupFunction):
     def __init__(self, start=0, coverage=1, waning=None, nodeIDs=None):
         self.start = start
         self.coverage = coverage
@@ -455,42 +716,66 @@ class add_irs_fn:
         add_IRS(cb, start=self.start, coverage_by_ages=[coverage_by_age], waning=self.waning, nodeIDs=self.nodeIDs)
 
 # IRS from nodeid-coverage specified in json
-class add_node_level_irs_by_node_id_fn:
+class add_node_level_irs_by_node_id_fn(SetupFunction):
+    outputs = ('nodelists',)  # recorded when called, not arguments
+
     def __init__(self, reffname, irs_dates, irs_fracs, channel='irs2012cov',
-                                     initial_killing=0.5, box_duration=90):
+                                     initial_killing=0.5, box_duration=90, seed=None):
+        """
+        :param seed: (optional) seed of the generator sampling the sprayed nodes, for reproducible node lists
+        """
         self.reffname = reffname
         self.irs_dates = irs_dates
         self.irs_fracs = irs_fracs
         self.channel = channel
         self.initial_killing = initial_killing
         self.box_duration = box_duration
+        self.seed = seed
+        self.nodelists = None
 
     def __call__(self, cb):
         return self.fn(cb)
 
+    def sample_nodelists(self, rng=None):
+        """
+        Sample the nodes sprayed on each IRS date: every node is sprayed independently with the corrected coverage of
+        its group.
+        :param rng: (optional) numpy.random.Generator drawing all nodes and dates at once; by default a new one seeded
+            with seed. Without either, the global numpy generator draws one block per node group, in the order of the
+            former per-node loop, so that np.random.seed gives the same node lists as before
+        :return: dictionary of IRS date to numpy array of node IDs
+        """
+        if rng is None and self.seed is not None:
+            rng = np.random.default_rng(self.seed)
+        covlist = [irscov for irscov in load_coverage_file(self.reffname)[self.channel] if irscov['coverage'] > 0]
+        rounds = min(len(self.irs_dates), len(self.irs_fracs))
+        if not covlist:
+            return OrderedDict((irs_date, np.array([], dtype=np.int64)) for irs_date in self.irs_dates[:rounds])
+
+        corrected = corrected_coverage_matrix([irscov['coverage'] for irscov in covlist], self.irs_fracs)[:, :rounds]
+        nodes = np.concatenate([irscov['nodes'] for irscov in covlist])
+        by_node = np.repeat(corrected, [len(irscov['nodes']) for irscov in covlist], axis=0)
+        if rng is None:  # group by group, each date in turn, each node in turn
+            draws = np.concatenate([np.random.random((rounds, len(irscov['nodes']))).T for irscov in covlist])
+        else:
+            draws = rng.random(by_node.shape)
+        sprayed = draws <= by_node
+
+        nodelists = OrderedDict()
+        for i, irs_date in enumerate(self.irs_dates[:rounds]):
+            nodelists[irs_date] = np.concatenate([nodelists.get(irs_date, nodes[:0]), nodes[sprayed[:, i]]])
+        return nodelists
+
     def fn(self, cb):
-        nodelist = {x: [] for x in self.irs_dates}
-
-        irs_distr = zip(self.irs_dates, self.irs_fracs)
-        with open(self.reffname) as fin:
-            cov = json.loads(fin.read())
-        for irscov in cov[self.channel]:
-            if irscov['coverage'] > 0:
-                for i, (irs_date, irs_frac) in enumerate(irs_distr):
-                    c = irscov['coverage'] * irs_frac
-                    if i < len(self.irs_fracs) - 1:
-                        c /= np.prod([1 - x * irscov['coverage'] for x in self.irs_fracs[i + 1:]])
-                    nodeIDs = [x for x in irscov['nodes'] if np.random.random() <= c]
-                    nodelist[irs_date] += nodeIDs
-
-        for i, (irs_date, irs_frac) in enumerate(irs_distr):
-            if len(nodelist[irs_date]) > 0 :
+        self.nodelists = self.sample_nodelists()
+        for irs_date, nodeIDs in self.nodelists.items():
+            if len(nodeIDs) > 0 :
                 add_node_IRS(cb, irs_date, initial_killing=self.initial_killing,
-                             box_duration=self.box_duration, nodeIDs=nodelist[irs_date])
+                             box_duration=self.box_duration, nodeIDs=nodeIDs.tolist())
 
 
 # drug campaign
-class add_drug_campaign_fn:
+class add_drug_campaign_fn(SetupFunction):
     def __init__(self, campaign_type, drug_code, start_days, coverage=1.0, repetitions=3,
                          interval=60, diagnostic_threshold=40, diagnostic_type='TRUE_PARASITE_DENSITY',
                          snowballs=0, delay=0, nodes=None, target_group='Everyone',
@@ -520,3 +805,13 @@ class add_drug_campaign_fn:
                                  snowballs=self.snowballs, treatment_delay=self.delay, nodes=self.nodes,
                                  target_group=self.target_group, node_property_restrictions=self.NP_restrictions)
 
+
+
+# prune unused drug and vector-species parameters: must come after every setup function adding to the campaign
+class slim_config_fn(SetupFunction):
+    def __call__(self, cb):  # no tags: the removals are logged rather than recorded in the simulation metadata
+        from malaria.config_slimming import slim_config_builder
+        removed = slim_config_builder(cb)
+        if removed['drugs'] or removed['species']:
+            logger.info('Slimmed config: removed %d unused drugs and %d unused vector species',
+                        len(removed['drugs']), len(removed['species']))
@@ -0,0 +1,81 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from malaria.analyzers.AnalysisService import AnalysisClient, AnalysisService
+
+
+class _MeanAnalyzer(object):
+    """
+    Mean of a report value per sample
+    """
+
+    filenames = ['output/report.json']
+
+    def filter(self, sim_data):
+        return '__sample_index__' in sim_data
+
+    def apply(self, parser):
+        return parser.sim_data['__sample_index__'], parser.raw_data[self.filenames[0]]['value']
+
+    def combine(self, parsers):
+        values = {}
+        for parser in parsers.values():
+            sample, value = parser.selected_data[id(self)]
+            values.setdefault(sample, []).append(value)
+        self.data = {sample: sum(v) / len(v) for sample, v in values.items()}
+
+    def finalize(self):
+        self.result = self.data
+
+    def uid(self):
+        return 'site_MeanAnalyzer'
+
+
+@pytest.fixture
+def workdir():
+    path = tempfile.mkdtemp()  # short path, within the length limit of Unix socket paths
+    yield path
+    shutil.rmtree(path)
+
+
+def _wait_for(path, timeout=10):
+    deadline = time.time() + timeout
+    while not os.path.exists(path):
+        if time.time() > deadline:
+            raise RuntimeError('Analysis service did not start')
+        time.sleep(0.01)
+
+
+def test_ping_reduce_shutdown(workdir):
+    socket_path = os.path.join(workdir, 'analysis.sock')
+    simulations = []
+    for i, (sample, value) in enumerate([(0, 1.0), (0, 3.0), (1, 5.0)]):
+        path = os.path.join(workdir, 'report%d.json' % i)
+        with open(path, 'w') as fout:
+            json.dump({'value': value}, fout)
+        simulations.append({'sim_id': 'sim%d' % i, 'sim_data': {'__sample_index__': sample},
+                            'outputs': {'output/report.json': path}})
+
+    service = AnalysisService(lambda: [_MeanAnalyzer()], socket_path)
+    thread = threading.Thread(target=service.run)  # serves in its own event loop
+    thread.start()
+    try:
+        _wait_for(socket_path)
+        client = AnalysisClient(socket_path, timeout=10)
+        assert client.ping() == ['site_MeanAnalyzer']
+        assert client.reduce(simulations) == [{'uid': 'site_MeanAnalyzer', 'result': {'0': 2.0, '1': 5.0}}]
+        with pytest.raises(RuntimeError):
+            client.request({'op': 'unknown'})
+        assert client.shutdown() == {'ok': True}
+    finally:
+        thread.join(10)
+    assert not thread.is_alive()
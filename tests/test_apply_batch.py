@@ -0,0 +1,92 @@
+import pytest
+
+pytest.importorskip('calibtool')
+pytest.importorskip('scipy')
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from malaria.analyzers.ChannelByAgeCohortAnalyzer import IncidenceByAgeCohortAnalyzer, PrevalenceByAgeCohortAnalyzer
+from malaria.analyzers.ChannelBySeasonAgeDensityCohortAnalyzer import ChannelBySeasonAgeDensityCohortAnalyzer
+
+age_bins = [1, 5, 15, 200]
+density_bins = [0, 50, 500, 5000]
+population_channel = 'Average Population by Age Bin'
+density_channels = ['PfPR by Parasitemia and Age Bin', 'PfPR by Gametocytemia and Age Bin']
+seasons = {'March': 'start_wet', 'July': 'peak_wet', 'August': 'peak_wet', 'November': 'end_wet'}
+
+
+class _Parser(object):
+    def __init__(self, filename, data, sample, sim_id):
+        self.raw_data = {filename: data}
+        self.sim_data = {'__sample_index__': sample}
+        self.sim_id = sim_id
+
+
+def _summary_report(rng, channel, interval, reports):
+    times = [interval * (i + 1) for i in range(reports)]
+    shape = (reports, len(age_bins))
+    return {'Metadata': {'Start_Day': 1, 'Reporting_Interval': interval,
+                         'Age Bins': age_bins, 'Parasitemia Bins': density_bins},
+            'DataByTime': {'Time Of Report': times},
+            'DataByTimeAndAgeBins': {population_channel: rng.uniform(50, 150, shape).tolist(),
+                                     channel: rng.uniform(0, 2, shape).tolist()},
+            'DataByTimeAndPfPRBinsAndAgeBins': {
+                c: rng.uniform(0, 1, (reports, len(density_bins), len(age_bins))).tolist() for c in density_channels}}
+
+
+def _parsers(analyzer, channel, interval, reports, n=4):
+    rng = np.random.RandomState(0)
+    return [_Parser(analyzer.filenames[0], _summary_report(rng, channel, interval, reports), i % 2, 'sim%d' % i)
+            for i in range(n)]
+
+
+def _flat(sim_data):
+    # index levels as plain values: apply cuts bins into categoricals, apply_batch indexes them by bin edges
+    df = sim_data.reset_index()
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = np.asarray(df[column], dtype=type(df[column].cat.categories[0]))
+    return df
+
+
+def _assert_same_results(analyzer, parsers):
+    batch = analyzer.apply_batch(parsers)
+    assert len(batch) == len(parsers)
+    for parser, result in zip(parsers, batch):
+        expected = analyzer.apply(parser)
+        assert (result.sample, result.sim_id) == (expected.sample, expected.sim_id)
+        assert list(result.columns) == list(expected.columns)
+        pd.testing.assert_frame_equal(_flat(result), _flat(expected), check_dtype=False, check_exact=False)
+
+
+@pytest.mark.parametrize('cls, channel', [(IncidenceByAgeCohortAnalyzer, 'Annual Clinical Incidence by Age Bin'),
+                                          (PrevalenceByAgeCohortAnalyzer, 'PfPR by Age Bin')])
+def test_age_cohort_apply_batch_matches_apply(cls, channel):
+    analyzer = cls.__new__(cls)
+    analyzer.channel = channel
+    analyzer.reference = pd.DataFrame({'Trials': 1.0, 'Observations': 1.0},
+                                      index=pd.Index([0.5, 2.0, 5.0, 10.0], name='Age Bin'))
+    _assert_same_results(analyzer, _parsers(analyzer, channel, interval=365, reports=8))
+
+
+@pytest.mark.parametrize('by_season', [False, True])
+def test_season_age_density_apply_batch_matches_apply(by_season):
+    analyzer = ChannelBySeasonAgeDensityCohortAnalyzer.__new__(ChannelBySeasonAgeDensityCohortAnalyzer)
+    analyzer.channels = density_channels
+    analyzer.seasons = seasons if by_season else None
+    season_names = sorted(set(seasons.values())) if by_season else ['January', 'June', 'March', 'November']
+    # season names as object levels, as aggregate_on_index expects categorical levels
+    index = pd.MultiIndex.from_product([pd.Index(season_names, dtype=object), [1.0, 3.0, 10.0], [0.0, 100.0, 1000.0]],
+                                       names=['Season' if by_season else 'Month', 'Age Bin', 'PfPR Bin'])
+    analyzer.reference = pd.DataFrame({c: 1.0 for c in density_channels}, index=index)  # read by loc(axis=1)[channel]
+    _assert_same_results(analyzer, _parsers(analyzer, 'PfPR by Age Bin', interval=30, reports=120))
+
+
+def test_apply_batch_falls_back_to_apply_for_different_binning():
+    analyzer = IncidenceByAgeCohortAnalyzer.__new__(IncidenceByAgeCohortAnalyzer)
+    analyzer.channel = 'Annual Clinical Incidence by Age Bin'
+    analyzer.reference = pd.DataFrame({'Trials': 1.0, 'Observations': 1.0},
+                                      index=pd.Index([0.5, 2.0, 5.0, 10.0], name='Age Bin'))
+    parsers = _parsers(analyzer, analyzer.channel, interval=365, reports=8)
+    parsers[1].raw_data[analyzer.filenames[0]]['Metadata']['Age Bins'] = [1, 5, 10, 200]
+    _assert_same_results(analyzer, parsers)
@@ -0,0 +1,101 @@
+import json
+
+from malaria.campaign_validation import CampaignIndex, validate_campaign, validate_campaign_files
+
+
+def _event(intervention, name=None, node_property_restrictions=None):
+    coordinator = {'class': 'StandardInterventionDistributionEventCoordinator', 'Intervention_Config': intervention}
+    if node_property_restrictions is not None:
+        intervention['Node_Property_Restrictions'] = node_property_restrictions
+    event = {'class': 'CampaignEvent', 'Start_Day': 0, 'Event_Coordinator_Config': coordinator,
+             'Nodeset_Config': {'class': 'NodeSetAll'}}
+    if name:
+        event['Event_Name'] = name
+    return event
+
+
+def _listener(triggers, broadcast=None, restrictions=None):
+    actual = {'class': 'BroadcastEvent', 'Broadcast_Event': broadcast} if broadcast else \
+        {'class': 'AntimalarialDrug', 'Drug_Type': 'Artemether'}
+    return {'class': 'NodeLevelHealthTriggeredIV', 'Trigger_Condition_List': triggers,
+            'Property_Restrictions_Within_Node': restrictions or [],
+            'Actual_IndividualIntervention_Config': actual}
+
+
+def _campaign():
+    return {'Events': [
+        _event(_listener(['NewClinicalCase'], broadcast='Received_Treatment'), name='Health seeking'),
+        _event(_listener(['Received_Treatment'], restrictions=[{'Risk': 'High'}]), name='Follow-up',
+               node_property_restrictions=[{'Place': 'Rural'}]),
+    ]}
+
+
+def _demographics():
+    return {'Defaults': {'IndividualProperties': [{'Property': 'Risk', 'Values': ['High', 'Low']}],
+                         'NodeProperties': [{'Property': 'Place', 'Values': ['Rural', 'Urban']}]},
+            'Nodes': [{'NodeID': 1}]}
+
+
+def test_valid_campaign():
+    config = {'parameters': {'Listed_Events': ['Received_Treatment']}}
+    assert validate_campaign(_campaign(), config=config, demographics=_demographics()) == []
+
+
+def test_unbroadcast_trigger():
+    campaign = _campaign()
+    campaign['Events'].append(_event(_listener(['Never_Broadcast']), name='Orphan'))
+    problems = validate_campaign(campaign)
+    assert problems == ['Trigger "Never_Broadcast" is never broadcast (listened for in event 2 (Orphan))']
+
+
+def test_unlisted_event():
+    config = {'parameters': {'Listed_Events': []}}
+    problems = validate_campaign(_campaign(), config=config)
+    assert problems == ['Event "Received_Treatment" is missing from Listed_Events (used in event 0 (Health seeking), '
+                        'event 1 (Follow-up))']
+
+
+def test_undeclared_properties():
+    campaign = _campaign()
+    campaign['Events'].append(_event(_listener(['NewClinicalCase'], restrictions=['Risk:Medium']),
+                                     node_property_restrictions=[{'Place': 'Coastal'}]))
+    problems = validate_campaign(campaign, demographics=_demographics())
+    assert problems == ['IndividualProperties value Risk:Medium is not declared in demographics (used in event 2)',
+                        'NodeProperties value Place:Coastal is not declared in demographics (used in event 2)']
+
+
+def test_bad_node_sets():
+    campaign = _campaign()
+    campaign['Events'][0]['Nodeset_Config'] = {'class': 'NodeSetNodeList', 'Node_List': [1, 7]}
+    campaign['Events'][1]['Nodeset_Config'] = {'class': 'NodeSetNodeList', 'Node_List': []}
+    problems = validate_campaign(campaign, demographics=_demographics())
+    assert problems == ['Node set of event 1 (Follow-up) has an empty Node_List',
+                        'Node 7 is not in demographics (targeted in event 0 (Health seeking))']
+
+    campaign['Events'][0]['Nodeset_Config']['Node_List'] = [1]
+    campaign['Events'][1]['Nodeset_Config']['Node_List'] = [1]
+    assert validate_campaign(campaign, demographics=_demographics()) == []
+
+
+def test_index_of_campaign_objects():
+    class _Intervention(object):
+        def __init__(self):
+            self.Trigger_Condition_List = ['Custom']
+            self.Broadcast_Event = 'Custom'
+
+    index = CampaignIndex([_Intervention()])
+    assert index.dangling_triggers() == {}
+    assert index.undeclared_events(['Custom']) == {}
+    assert index.undeclared_events([]) == {'Custom': {'event 0'}}
+
+
+def test_validate_campaign_files(tmp_path):
+    paths = {}
+    for name, content in (('campaign', _campaign()), ('config', {'parameters': {'Listed_Events': []}}),
+                          ('demographics', _demographics())):
+        paths[name] = str(tmp_path / ('%s.json' % name))
+        with open(paths[name], 'w') as fout:
+            json.dump(content, fout)
+
+    problems = validate_campaign_files(paths['campaign'], paths['config'], [paths['demographics']])
+    assert len(problems) == 1 and 'Listed_Events' in problems[0]
@@ -0,0 +1,68 @@
+import pytest
+
+from malaria.config_slimming import referenced_drugs, slim_config
+
+
+def _config():
+    return {'parameters': {'Malaria_Drug_Params': {'Artemether': {}, 'Lumefantrine': {}, 'Primaquine': {},
+                                                   'Chloroquine': {}},
+                           'Vector_Species_Names': ['gambiae'],
+                           'Vector_Species_Params': {'gambiae': {}, 'funestus': {}}}}
+
+
+def _event(intervention):
+    return {'class': 'CampaignEvent',
+            'Event_Coordinator_Config': {'class': 'StandardInterventionDistributionEventCoordinator',
+                                         'Intervention_Config': intervention}}
+
+
+def test_slim_dictionary_campaign():
+    campaign = {'Events': [_event({'class': 'AntimalarialDrug', 'Drug_Type': 'Primaquine'}),
+                           _event({'class': 'AdherentDrug', 'Doses': [['Artemether', 'Lumefantrine']]})]}
+    config = _config()
+    removed = slim_config(config, campaign)
+    assert removed == {'drugs': ['Chloroquine'], 'species': ['funestus']}
+    assert sorted(config['parameters']['Malaria_Drug_Params']) == ['Artemether', 'Lumefantrine', 'Primaquine']
+
+
+def test_intervention_without_class_keeps_every_drug():
+    campaign = {'Events': [_event({'Drug_Type': 'Primaquine'})]}
+    assert referenced_drugs(campaign) is None
+    config = _config()
+    assert slim_config(config, campaign)['drugs'] == []
+    assert len(config['parameters']['Malaria_Drug_Params']) == 4
+
+
+class AntimalarialDrug(object):
+    def __init__(self, Drug_Type):
+        self.Drug_Type = Drug_Type
+
+
+class AdherentDrug(object):
+    def __init__(self, Doses):
+        self.Doses = Doses
+
+
+class _Event(object):
+    def __init__(self, intervention):
+        self.Intervention_Config = intervention
+
+
+def test_typed_objects_are_identified_by_type():
+    campaign = [_Event(AntimalarialDrug('Primaquine')), _Event(AdherentDrug([['Artemether'], ['Lumefantrine']]))]
+    assert referenced_drugs(campaign) == {'Primaquine', 'Artemether', 'Lumefantrine'}
+
+
+def test_dtk_campaign_objects():
+    CampaignClass = pytest.importorskip('dtk.utils.Campaign.CampaignClass')
+    events = [CampaignClass.CampaignEvent(
+        Start_Day=day,
+        Event_Coordinator_Config=CampaignClass.StandardInterventionDistributionEventCoordinator(
+            Intervention_Config=intervention))
+        for day, intervention in enumerate([CampaignClass.AntimalarialDrug(Drug_Type='Primaquine'),
+                                            CampaignClass.AdherentDrug(Doses=[['Artemether', 'Lumefantrine']])])]
+
+    assert referenced_drugs(events) == {'Primaquine', 'Artemether', 'Lumefantrine'}
+    config = _config()
+    slim_config(config, events)
+    assert sorted(config['parameters']['Malaria_Drug_Params']) == ['Artemether', 'Lumefantrine', 'Primaquine']
@@ -0,0 +1,73 @@
+import copy
+import json
+import os
+
+import pytest
+
+pytest.importorskip('dtk')
+
+from malaria.interventions import drug_campaign_batch, malaria_diagnostic, malaria_drug_campaigns
+from malaria.interventions.drug_campaign_batch import build_drug_campaign_overlays, drug_campaign_grid
+from malaria.interventions.malaria_drug_campaigns import add_drug_campaign
+
+
+class _Builder(object):
+    """
+    Config builder writing its config and campaign as the DTKConfigBuilder does, with campaign events as dictionaries
+    """
+
+    def __init__(self):
+        self.config = {'parameters': {'Malaria_Drug_Params': {}, 'Listed_Events': ['Received_Treatment'],
+                                      'Simulation_Duration': 730}}
+        self.campaign = {'Events': [{'class': 'CampaignEvent', 'Start_Day': 1, 'Event_Name': 'base'}],
+                         'Use_Defaults': 1}
+
+    def add_event(self, event):
+        self.campaign['Events'].append(event)
+
+    def set_param(self, param, value):
+        self.config['parameters'][param] = value
+
+    def update_params(self, params):
+        self.config['parameters'].update(params)
+
+    def get_param(self, param, default=None):
+        return self.config['parameters'].get(param, default)
+
+    def dump_files(self, working_directory):
+        for name, content in (('config.json', self.config), ('campaign.json', self.campaign)):
+            with open(os.path.join(working_directory, name), 'w') as fout:
+                json.dump(content, fout, sort_keys=True)
+
+
+@pytest.fixture(autouse=True)
+def raw_events(monkeypatch):
+    for module in (malaria_diagnostic, malaria_drug_campaigns):
+        monkeypatch.setattr(module, 'RawCampaignObject', lambda event: event)
+
+
+def _read(directory, name):
+    with open(os.path.join(directory, name)) as fin:
+        return json.load(fin)
+
+
+def test_variant_files_equal_per_simulation_build(tmpdir):
+    base = _Builder()
+    grid = drug_campaign_grid(campaign_type=['MDA', 'MSAT'], drug_code=['AL', 'DP'], coverage=[0.5, 0.8])
+    overlays = build_drug_campaign_overlays(grid, start_days=[100, 160], repetitions=2)
+    drug_campaign_batch._init_worker(base)
+
+    for i, (variant, overlay) in enumerate(zip(grid, overlays)):
+        directory = drug_campaign_batch._write_variant((str(tmpdir.join('batch_%d' % i)), overlay))
+
+        legacy = copy.deepcopy(base)
+        tags = add_drug_campaign(legacy, start_days=[100, 160], repetitions=2, **variant)
+        legacy_directory = str(tmpdir.mkdir('legacy_%d' % i))
+        legacy.dump_files(legacy_directory)
+
+        assert overlay.tags == tags
+        for name in ('config.json', 'campaign.json'):
+            assert _read(directory, name) == _read(legacy_directory, name)
+
+    assert base.campaign['Events'] == [{'class': 'CampaignEvent', 'Start_Day': 1, 'Event_Name': 'base'}]
+    assert base.config['parameters']['Malaria_Drug_Params'] == {}
@@ -0,0 +1,140 @@
+import pytest
+
+pytest.importorskip('dtk')
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from dtk.utils.parsers.malaria_summary import summary_channel_to_pandas
+from malaria.analyzers.Helpers import convert_annualized, convert_to_counts, index_level_codes, report_intervals, \
+    summary_channel_stack
+
+age_bins = [1, 5, 15, 200]
+density_bins = [0, 50, 500, 5000]
+population_channel = 'Average Population by Age Bin'
+incidence_channel = 'Annual Clinical Incidence by Age Bin'
+density_channel = 'PfPR by Parasitemia and Age Bin'
+
+
+def summary_report(seed=0, start_day=1, interval=30, reports=24):
+    """
+    MalariaSummaryReport json of random channels binned by time, (density) and age
+    """
+    rng = np.random.RandomState(seed)
+    times = [start_day - 1 + interval * (i + 1) for i in range(reports)]
+    return {'Metadata': {'Start_Day': start_day, 'Reporting_Interval': interval,
+                         'Age Bins': age_bins, 'Parasitemia Bins': density_bins},
+            'DataByTime': {'Time Of Report': times},
+            'DataByTimeAndAgeBins': {
+                population_channel: rng.uniform(50, 150, (reports, len(age_bins))).tolist(),
+                incidence_channel: rng.uniform(0, 3, (reports, len(age_bins))).tolist()},
+            'DataByTimeAndPfPRBinsAndAgeBins': {
+                density_channel: rng.uniform(0, 1, (reports, len(density_bins), len(age_bins))).tolist()}}
+
+
+def legacy_convert_annualized(s, reporting_interval=None, start_day=None):
+    # convert_annualized before it broadcast the intervals through the Time level codes
+    s_ix = s.index
+    time_ix = s_ix.names.index('Time')
+    time_levels = s_ix.levels[time_ix].values
+
+    start_time = (start_day - 1) if start_day else 0
+    time_intervals = np.diff(np.insert(time_levels, 0, values=start_time))
+
+    if reporting_interval and len(time_intervals) > 1 and np.abs(time_intervals[0] - reporting_interval) > 1:
+        raise Exception('Time differences between reports differ by more than integer rounding.')
+    if len(time_intervals) > 2 and np.abs(time_intervals[0] - time_intervals[1]) > 1:
+        raise Exception('Time differences between reports differ by more than integer rounding.')
+
+    intervals_by_time = dict(zip(time_levels, time_intervals))
+    df = s.reset_index()
+    df[s.name] *= df.Time.apply(lambda x: intervals_by_time[x] / 365.0)
+    return df.set_index(s_ix.names)
+
+
+def legacy_convert_to_counts(rates, pops):
+    # convert_to_counts before it aligned the populations with reindex
+    rate_idx = rates.index.names
+    pop_idx = pops.index.names
+    df = rates.reset_index().set_index(pop_idx)\
+              .join(pops, how='left')\
+              .reset_index().set_index(rate_idx)
+    return (df[rates.name] * df[pops.name]).rename(rates.name)
+
+
+@pytest.mark.parametrize('start_day, interval', [(1, 30), (366, 365), (None, 30)])
+def test_convert_annualized_matches_legacy(start_day, interval):
+    data = summary_report(start_day=start_day or 1, interval=interval)
+    population = summary_channel_to_pandas(data, population_channel)
+    expected = legacy_convert_annualized(population, reporting_interval=interval, start_day=start_day)
+    result = convert_annualized(population, reporting_interval=interval, start_day=start_day)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_convert_annualized_irregular_reports():
+    data = summary_report()
+    data['DataByTime']['Time Of Report'][1] += 5
+    population = summary_channel_to_pandas(data, population_channel)
+    with pytest.raises(Exception, match='integer rounding'):
+        legacy_convert_annualized(population, reporting_interval=30, start_day=1)
+    with pytest.raises(Exception, match='integer rounding'):
+        convert_annualized(population, reporting_interval=30, start_day=1)
+
+
+def test_convert_to_counts_matches_legacy():
+    data = summary_report(seed=1)
+    population = summary_channel_to_pandas(data, population_channel)
+
+    incidence = summary_channel_to_pandas(data, incidence_channel)
+    pd.testing.assert_series_equal(convert_to_counts(incidence, population),
+                                   legacy_convert_to_counts(incidence, population))
+
+    # broadcast over the density bins, with the population levels in another order
+    prevalence = summary_channel_to_pandas(data, density_channel)
+    swapped = population.reorder_levels(['Age Bin', 'Time'])
+    expected = legacy_convert_to_counts(prevalence, population)
+    pd.testing.assert_series_equal(convert_to_counts(prevalence, population), expected)
+    pd.testing.assert_series_equal(convert_to_counts(prevalence, swapped), expected)
+
+
+def test_report_intervals():
+    times = np.array([30, 60, 90, 120])
+    assert report_intervals(times).tolist() == [30, 30, 30, 30]
+    assert report_intervals(times + 364, reporting_interval=30, start_day=366).tolist() == [29, 30, 30, 30]
+    with pytest.raises(Exception):
+        report_intervals(times, reporting_interval=365)
+
+
+def test_index_level_codes():
+    ix = summary_channel_to_pandas(summary_report(), density_channel).index
+    for level, name in enumerate(ix.names):
+        codes = index_level_codes(ix, level)
+        assert codes.dtype.kind == 'i'
+        assert (ix.levels[level].values[codes] == ix.get_level_values(name).values).all()
+
+
+def test_summary_channel_stack_matches_per_report_series():
+    datas = [summary_report(seed=seed) for seed in range(3)]
+    stack, bins, metadata = summary_channel_stack(datas, density_channel)
+    assert list(bins) == ['Time', 'PfPR Bin', 'Age Bin']
+    assert stack.shape == (3, 24, len(density_bins), len(age_bins))
+    assert metadata == datas[0]['Metadata']
+    for data, values in zip(datas, stack):
+        series = summary_channel_to_pandas(data, density_channel)
+        assert list(series.index.names) == list(bins)
+        np.testing.assert_array_equal(values.ravel(), series.values)
+
+    reordered, reordered_bins, _ = summary_channel_stack(datas, density_channel,
+                                                         bin_order=['Time', 'Age Bin', 'PfPR Bin'])
+    assert list(reordered_bins) == ['Time', 'Age Bin', 'PfPR Bin']
+    np.testing.assert_array_equal(reordered, stack.transpose(0, 1, 3, 2))
+
+
+def test_summary_channel_stack_needs_identical_binning():
+    datas = [summary_report(), summary_report(interval=31)]
+    with pytest.raises(ValueError):
+        summary_channel_stack(datas, population_channel)
+
+    datas = [summary_report(), summary_report()]
+    datas[1]['Metadata']['Age Bins'] = [1, 5, 10, 200]
+    with pytest.raises(ValueError):
+        summary_channel_stack(datas, population_channel)
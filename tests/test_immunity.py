@@ -0,0 +1,103 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip('dtk')
+pytest.importorskip('simtools')
+
+from malaria import immunity
+from malaria.immunity import HabitatScaleIndex, add_interpolated_immune_init, blend_immune_overlays, \
+    load_immune_overlay
+
+
+def _overlay(values, metadata='burn-in'):
+    return {'Metadata': {'Tool': metadata},
+            'Defaults': {'IndividualAttributes': {
+                'MSP_mean_antibody_distribution': {'AxisNames': ['age'], 'AxisScaleFactors': [365],
+                                                   'ResultValues': values}}},
+            'Nodes': [{'NodeID': 1}]}
+
+
+class _Builder(object):
+    def __init__(self):
+        self.params = {'Demographics_Filenames': ['Sites/demographics.json']}
+        self.overlays = {}
+
+    def get_param(self, name):
+        return self.params[name]
+
+    def set_param(self, name, value):
+        self.params[name] = value
+
+    def enable(self, name):
+        self.params['Enable_' + name] = 1
+
+    def add_demog_overlay(self, name, overlay):
+        self.overlays[name] = overlay
+
+
+@pytest.fixture
+def overlay_dir(tmp_path, monkeypatch):
+    def json2dict(path):
+        with open(path) as fin:
+            return json.load(fin)
+    monkeypatch.setattr(immunity, 'json2dict', json2dict)
+
+    site_dir = tmp_path / 'Sites' / 'immune_init' / 'SiteA'
+    site_dir.mkdir(parents=True)
+    for scale, values in ((0.5, [[0.0, 1.0]]), (1.0, [[2.0, 3.0]]), (2.0, [[4.0, 5.0]])):
+        with open(str(site_dir / ('immune_init_x_%s.json' % scale)), 'w') as fout:
+            json.dump(_overlay(values), fout)
+    return str(tmp_path)
+
+
+def _values(overlay):
+    return overlay['Defaults']['IndividualAttributes']['MSP_mean_antibody_distribution']['ResultValues']
+
+
+def test_bracket():
+    index = HabitatScaleIndex([2.0, 0.5, 1.0, 1.0])
+    assert index.bracket(1.0) == (1.0, 1.0, 0.0)
+    assert index.bracket(0.75) == (0.5, 1.0, 0.5)
+    assert index.bracket(1.5) == (1.0, 2.0, 0.5)
+    assert index.bracket(0.1) == (0.5, 0.5, 0.0)
+    assert index.bracket(5.0) == (2.0, 2.0, 0.0)
+    assert index.nearest(1.4) == 1.0
+
+
+def test_blend_result_values_only():
+    blended = blend_immune_overlays(_overlay([[0.0, 1.0]]), _overlay([[2.0, 3.0]], metadata='other'), 0.25)
+    assert _values(blended) == [[0.5, 1.5]]
+    assert blended['Metadata'] == {'Tool': 'burn-in'}
+    assert blended['Nodes'] == [{'NodeID': 1}]
+
+    different = _overlay([[2.0, 3.0]])
+    different['Nodes'] = [{'NodeID': 2}]
+    with pytest.raises(ValueError):
+        blend_immune_overlays(_overlay([[0.0, 1.0]]), different, 0.5)
+
+
+def test_interpolated_immune_init(overlay_dir):
+    cb = _Builder()
+    assert add_interpolated_immune_init(cb, 'SiteA', 0.75, [0.5, 1.0, 2.0], directory=overlay_dir) == [0.5, 1.0]
+    assert list(cb.overlays) == ['immune_init_x_0.75']
+    assert _values(cb.overlays['immune_init_x_0.75']) == [[1.0, 2.0]]
+    assert cb.params['Immunity_Initialization_Distribution_Type'] == 'DISTRIBUTION_COMPLEX'
+
+
+def test_interpolated_immune_init_outside_range_uses_nearest(overlay_dir):
+    cb = _Builder()
+    assert add_interpolated_immune_init(cb, 'SiteA', 3.0, [0.5, 1.0, 2.0], directory=overlay_dir) == [2.0]
+    assert _values(cb.overlays['immune_init_x_2.0']) == [[4.0, 5.0]]
+
+
+def test_builders_get_their_own_overlays(overlay_dir):
+    builders = [_Builder(), _Builder()]
+    for cb in builders:
+        immunity.add_immune_init(cb, 'SiteA', [1.0], directory=overlay_dir)
+    _values(builders[0].overlays['immune_init_x_1.0'])[0][0] = 99.0
+
+    assert _values(builders[1].overlays['immune_init_x_1.0']) == [[2.0, 3.0]]
+    path = os.path.join(overlay_dir, 'Sites', 'immune_init', 'SiteA', 'immune_init_x_1.0.json')
+    assert _values(load_immune_overlay(path)) == [[2.0, 3.0]]
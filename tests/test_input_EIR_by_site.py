@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip('dtk')
+np = pytest.importorskip('numpy')
+
+from malaria.site.input_EIR_by_site import mAb_vs_EIR, site_EIR_profiles, study_site_monthly_EIRs
+
+
+def test_daily_profiles_keep_annual_EIR():
+    sites = ['Dielmo', 'Ndiop', 'Namawala']
+    monthly, _ = site_EIR_profiles(sites, habitats=[1, 2, 0.5], shifts=[0, 3, 0])
+    daily, _ = site_EIR_profiles(sites, habitats=[1, 2, 0.5], shifts=[0, 3, 0], daily=True)
+    assert daily.shape == (3, 365)
+    assert np.allclose(daily.sum(axis=1), monthly.sum(axis=1))
+    assert np.isclose(daily[0].sum(), sum(study_site_monthly_EIRs['Dielmo']))
+
+
+def test_mAb_vs_EIR_scalar_and_array():
+    assert isinstance(mAb_vs_EIR(20), float)
+    assert mAb_vs_EIR(1e6) == 1.0
+    EIRs = np.array([0.1, 20, 160, 1e6])
+    assert np.allclose(mAb_vs_EIR(EIRs), [mAb_vs_EIR(x) for x in EIRs])
+    _, mAb = site_EIR_profiles(['Dielmo'], maternal_protection=0.5)
+    assert np.isclose(mAb[0], 0.5 * mAb_vs_EIR(sum(study_site_monthly_EIRs['Dielmo'])))
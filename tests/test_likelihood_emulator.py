@@ -0,0 +1,47 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from malaria.analyzers.LikelihoodEmulator import GaussianProcess, LikelihoodEmulator, replay_screening
+
+
+def _history(n=200, seed=0):
+    rng = np.random.RandomState(seed)
+    df = pd.DataFrame(rng.uniform(0, 10, size=(n, 2)), columns=['a', 'b'])
+    df['site1'] = -((df['a'] - 3) ** 2)
+    df['site2'] = -((df['b'] - 7) ** 2)
+    return df
+
+
+def test_gaussian_process_interpolates():
+    x = np.linspace(0, 1, 30)[:, None]
+    y = np.sin(6 * x[:, 0])
+    mean, std = GaussianProcess(noise=1e-4).fit(x, y).predict(np.array([[0.25], [0.5]]))
+    np.testing.assert_allclose(mean, np.sin([1.5, 3.0]), atol=0.05)
+    assert (std < 0.1).all()
+
+
+def test_emulator_predicts_total_likelihood():
+    emulator = LikelihoodEmulator(['a', 'b'], ['site1', 'site2']).fit(_history())
+    proposed = pd.DataFrame({'a': [3.0, 9.0], 'b': [7.0, 1.0]}, index=[10, 11])
+    prediction = emulator.predict(proposed)
+    assert prediction.index.tolist() == [10, 11]
+    np.testing.assert_allclose(prediction['mean'], [0, -72], atol=3)
+    assert emulator.prioritize(proposed).index.tolist() == [10, 11]
+
+
+def test_screen_skips_only_confidently_poor_samples():
+    emulator = LikelihoodEmulator(['a', 'b'], ['site1', 'site2']).fit(_history())
+    proposed = pd.DataFrame({'a': [3.0, 3.5, 9.5, 0.0], 'b': [7.0, 6.5, 0.5, 0.0]})
+    assert emulator.screen(proposed).tolist() == [True, True, False, False]
+
+
+def test_replay_counts_skipped_samples():
+    history = _history(300)
+    history['iteration'] = np.repeat([0, 1, 2], 100)
+    replay = replay_screening(history, ['a', 'b'], ['site1', 'site2'])
+    assert replay.index.tolist() == [1, 2]
+    assert (replay['proposed'] == 100).all()
+    assert (replay['skipped'] > 0).all()
+    assert (replay['good_skipped'] == 0).all()
@@ -0,0 +1,39 @@
+import copy
+
+import pytest
+
+pytest.importorskip('dtk')
+
+from malaria.interventions.malaria_vaccine import get_vaccine, get_vaccine_registry, load_vaccines, \
+    override_vaccine
+
+
+def test_registry_matches_load_vaccines():
+    registry = get_vaccine_registry()
+    assert dict(registry) == load_vaccines()
+
+
+def test_modified_vaccine_leaves_registry_unchanged():
+    vaccine = get_vaccine('RTSS')
+    expected = copy.deepcopy(vaccine)
+    vaccine['Waning_Config']['Decay_Time_Constant'] = 1
+    vaccine['Vaccine_Take'] = 0
+    assert get_vaccine('RTSS') == expected
+
+
+def test_override_replaces_nested_configs():
+    vaccine = get_vaccine('RTSS')
+    waning = {'class': 'WaningEffectBox', 'Box_Duration': 365}
+    overridden = override_vaccine(vaccine, {'Waning_Config': waning, 'Vaccine_Take': 0.5})
+
+    legacy = copy.deepcopy(load_vaccines()['RTSS'])
+    legacy.update({'Waning_Config': waning, 'Vaccine_Take': 0.5})
+    assert overridden == legacy
+    assert get_vaccine('RTSS', {'Waning_Config': waning, 'Vaccine_Take': 0.5}) == legacy
+
+
+def test_dotted_override_changes_one_nested_parameter():
+    vaccine = get_vaccine('RTSS')
+    overridden = override_vaccine(vaccine, {'Waning_Config.Decay_Time_Constant': 100})
+    assert overridden['Waning_Config'] == dict(vaccine['Waning_Config'], Decay_Time_Constant=100)
+    assert vaccine == get_vaccine('RTSS')
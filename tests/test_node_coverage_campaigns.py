@@ -0,0 +1,224 @@
+import json
+
+import pytest
+
+pytest.importorskip('dtk')
+np = pytest.importorskip('numpy')
+
+import dtk.interventions.property_change
+from malaria.study_sites import site_setup_functions
+from malaria.study_sites.site_setup_functions import add_itn_by_node_id_fn, add_node_level_irs_by_node_id_fn, \
+    add_seasonal_HS_by_node_id_fn, add_seasonal_HS_by_NP_fn, corrected_coverage_matrix
+
+days_in_month = [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+scale_by_month = [0.5, 0.5, 0.5, 0.8, 1.0, 1.0, 1.2, 1.5, 1.5, 1.2, 0.8, 0.5]
+
+coverage = {
+    'hscov': [{'coverage': 0.2, 'nodes': [1, 2]}, {'coverage': 0.4, 'nodes': [3]},
+              {'coverage': 0.2, 'nodes': [4, 5, 6]}, {'coverage': 0.9, 'nodes': [7]},
+              {'coverage': 0.7, 'nodes': [8, 9]}],
+    'itn2012cov': [{'coverage': 0.5, 'nodes': [1, 2]}, {'coverage': 0.0, 'nodes': [3]},
+                   {'coverage': 0.5, 'nodes': [4]}, {'coverage': 0.6, 'nodes': [5, 6]},
+                   {'coverage': 0.6004, 'nodes': [7]}, {'coverage': 0.95, 'nodes': [8, 9]}],
+    'irs2012cov': [{'coverage': 0.8, 'nodes': list(range(1, 40))}, {'coverage': 0.0, 'nodes': [40, 41]},
+                   {'coverage': 0.3, 'nodes': list(range(42, 80))}, {'coverage': 1.0, 'nodes': [80, 81]}],
+}
+itn_dates = [100, 465, 830, 1195]
+itn_fracs = [0.3, 0.5, 0.2]
+irs_dates = [150, 515, 880]
+irs_fracs = [0.6, 0.4]
+
+
+class _Recorder(object):
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, cb, *args, **kwargs):
+        self.calls.append((args, kwargs))
+
+
+@pytest.fixture
+def coverage_file(tmp_path):
+    path = str(tmp_path / 'coverage.json')
+    with open(path, 'w') as fout:
+        json.dump(coverage, fout)
+    return path
+
+
+@pytest.fixture
+def recorders(monkeypatch):
+    recorders = {name: _Recorder() for name in ('add_health_seeking', 'add_ITN', 'add_node_IRS',
+                                                'change_node_property')}
+    for name in ('add_health_seeking', 'add_ITN', 'add_node_IRS'):
+        monkeypatch.setattr(site_setup_functions, name, recorders[name])
+    monkeypatch.setattr(dtk.interventions.property_change, 'change_node_property',
+                        recorders['change_node_property'])
+    return recorders
+
+
+def _seeking_by_target(calls, key):
+    """
+    Seeking of each (node or node group, start day, target), and the settings of the event covering it
+    """
+    seeking = {}
+    for _, kwargs in calls:
+        for target in kwargs['targets']:
+            event = (int(kwargs['start_day']), target['trigger'], target.get('agemin'), target.get('agemax'))
+            settings = (target['seek'], target['coverage'], target['rate'], kwargs['duration'],
+                        kwargs['repetitions'], kwargs['drug_ineligibility_duration'])
+            for member in key(kwargs):
+                assert (member,) + event not in seeking
+                seeking[(member,) + event] = settings
+    return seeking
+
+
+def _nodes(kwargs):
+    return kwargs['nodes']['Node_List']
+
+
+def _groups(kwargs):
+    return [restriction['HScategory'] for restriction in kwargs['node_property_restrictions']]
+
+
+def test_compact_seasonal_hs_by_node_id_matches_per_group(coverage_file, recorders):
+    calls = recorders['add_health_seeking'].calls
+    add_seasonal_HS_by_node_id_fn(coverage_file, days_in_month, scale_by_month, start=365)(None)
+    per_group = _seeking_by_target(calls, _nodes)
+    del calls[:]
+
+    fn = add_seasonal_HS_by_node_id_fn(coverage_file, days_in_month, scale_by_month, start=365, compact=True)
+    fn(None)
+    assert _seeking_by_target(calls, _nodes) == per_group
+    assert fn.event_counts == {'per_group': 5 * 12 * 3, 'compact': len(calls)}
+    assert len(calls) < 5 * 12 * 3
+
+
+def test_compact_seasonal_hs_by_np_matches_per_group(coverage_file, recorders):
+    calls = recorders['add_health_seeking'].calls
+    add_seasonal_HS_by_NP_fn(coverage_file, 'hscov', 100, days_in_month, scale_by_month, 2)(None)
+    per_group = _seeking_by_target(calls, _groups)
+    properties = list(recorders['change_node_property'].calls)
+    del calls[:]
+    del recorders['change_node_property'].calls[:]
+
+    fn = add_seasonal_HS_by_NP_fn(coverage_file, 'hscov', 100, days_in_month, scale_by_month, 2, compact=True)
+    fn(None)
+    assert _seeking_by_target(calls, _groups) == per_group
+    assert recorders['change_node_property'].calls == properties
+    assert len(calls) < 5 * 12 * 3
+
+
+def test_compact_seek_precision_merges_close_groups(coverage_file, recorders):
+    calls = recorders['add_health_seeking'].calls
+    add_seasonal_HS_by_node_id_fn(coverage_file, days_in_month, scale_by_month)(None)
+    per_group = _seeking_by_target(calls, _nodes)
+    del calls[:]
+
+    fn = add_seasonal_HS_by_node_id_fn(coverage_file, days_in_month, scale_by_month, compact=True, seek_precision=1)
+    fn(None)
+    rounded = _seeking_by_target(calls, _nodes)
+    assert set(rounded) == set(per_group)
+    for event, settings in rounded.items():
+        assert settings[0] == pytest.approx(per_group[event][0], abs=0.05 + 1e-9)
+        assert settings[1:] == per_group[event][1:]
+
+
+def test_corrected_coverage_matrix_matches_per_group_loop():
+    coverages = [0.0, 0.25, 0.5, 0.95, 1.0]
+    corrected = corrected_coverage_matrix(coverages, itn_fracs)
+    for g, cov in enumerate(coverages):
+        for i, frac in enumerate(itn_fracs):
+            c = cov * frac
+            if i < len(itn_fracs) - 1:
+                c /= np.prod([1 - x * cov for x in itn_fracs[i + 1:]])
+            assert corrected[g, i] == pytest.approx(c, rel=1e-12, abs=1e-15)
+
+
+def _itn_by_node(calls):
+    """
+    Coverage by age of each (node, date) distribution, and its waning
+    """
+    itns = {}
+    for args, kwargs in calls:
+        for node in kwargs['nodeIDs']:
+            assert (node, args[0]) not in itns
+            itns[(node, args[0])] = (kwargs['coverage_by_ages'], kwargs['waning'])
+    return itns
+
+
+@pytest.mark.parametrize('coverage_decimals', [3, 12])
+def test_grouped_itn_matches_per_group(coverage_file, recorders, coverage_decimals):
+    calls = recorders['add_ITN'].calls
+    waning = {'blocking': {'box_duration': 3650}}
+    add_itn_by_node_id_fn(coverage_file, itn_dates, itn_fracs, waning=waning)(None)
+    per_group = _itn_by_node(calls)
+    del calls[:]
+
+    fn = add_itn_by_node_id_fn(coverage_file, itn_dates, itn_fracs, waning=waning, grouped=True,
+                               coverage_decimals=coverage_decimals)
+    fn(None)
+    grouped = _itn_by_node(calls)
+    assert set(grouped) == set(per_group) == {(node, date) for node in [1, 2, 4, 5, 6, 7, 8, 9]
+                                              for date in itn_dates[:3]}
+    assert fn.event_counts == {'per_group': 5 * 3, 'grouped': len(calls)}
+    assert len(calls) < 5 * 3
+
+    tolerance = 1.3 * 0.5 * 10 ** -coverage_decimals + 1e-12
+    for key, (coverage_by_ages, itn_waning) in grouped.items():
+        expected, expected_waning = per_group[key]
+        assert itn_waning == expected_waning
+        assert len(coverage_by_ages) == len(expected)
+        for by_age, expected_by_age in zip(coverage_by_ages, expected):
+            assert set(by_age) == set(expected_by_age)
+            for k, v in by_age.items():
+                assert v == pytest.approx(expected_by_age[k], abs=tolerance)
+
+
+def _per_node_irs_nodelists(covlist):
+    # node sampling of the former per-node loop (with the date and fraction pairs listed once, as on Python 2)
+    nodelist = {x: [] for x in irs_dates}
+    irs_distr = list(zip(irs_dates, irs_fracs))
+    for irscov in covlist:
+        if irscov['coverage'] > 0:
+            for i, (irs_date, irs_frac) in enumerate(irs_distr):
+                c = irscov['coverage'] * irs_frac
+                if i < len(irs_fracs) - 1:
+                    c /= np.prod([1 - x * irscov['coverage'] for x in irs_fracs[i + 1:]])
+                nodeIDs = [x for x in irscov['nodes'] if np.random.random() <= c]
+                nodelist[irs_date] += nodeIDs
+    return nodelist
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_unseeded_irs_nodelists_keep_global_rng_draws(coverage_file, seed):
+    np.random.seed(seed)
+    expected = _per_node_irs_nodelists(coverage['irs2012cov'])
+    after = np.random.random()
+
+    np.random.seed(seed)
+    nodelists = add_node_level_irs_by_node_id_fn(coverage_file, irs_dates, irs_fracs).sample_nodelists()
+    assert list(nodelists) == irs_dates[:2]
+    for irs_date, nodeIDs in nodelists.items():
+        assert nodeIDs.tolist() == expected[irs_date]
+    assert np.random.random() == after  # as many global draws as before
+
+
+def test_seeded_irs_nodelists(coverage_file, recorders):
+    fn = add_node_level_irs_by_node_id_fn(coverage_file, irs_dates, irs_fracs, seed=5)
+    np.random.seed(0)
+    first = fn.sample_nodelists()
+    state = np.random.get_state()
+    np.random.seed(1)
+    second = fn.sample_nodelists()
+    assert all(np.array_equal(first[d], second[d]) for d in first)
+    np.random.seed(0)
+    assert np.random.get_state()[1].tolist() == state[1].tolist()  # the global generator is left alone
+
+    nodes = set(first[irs_dates[0]].tolist()) | set(first[irs_dates[1]].tolist())
+    assert {80, 81} <= nodes and not nodes & {40, 41}
+
+    fn(None)
+    calls = recorders['add_node_IRS'].calls
+    assert [(args[0], kwargs['nodeIDs']) for args, kwargs in calls] == \
+        [(d, first[d].tolist()) for d in irs_dates[:2] if len(first[d])]
+    assert all(kwargs['initial_killing'] == 0.5 and kwargs['box_duration'] == 90 for _, kwargs in calls)
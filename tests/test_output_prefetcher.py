@@ -0,0 +1,85 @@
+import os
+
+from malaria.analyzers.OutputPrefetcher import LocalDirectoryStore, OutputPrefetcher
+
+
+class _Analyzer(object):
+    def __init__(self, filenames):
+        self.filenames = filenames
+
+
+class _CountingStore(LocalDirectoryStore):
+    def __init__(self, root):
+        super(_CountingStore, self).__init__(root)
+        self.fetched = []
+
+    def fetch(self, sim_id, filename, destination):
+        self.fetched.append((sim_id, filename))
+        super(_CountingStore, self).fetch(sim_id, filename, destination)
+
+
+def _write(root, sim_id, filename, content):
+    directory = os.path.join(str(root), sim_id, os.path.dirname(filename))
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(os.path.join(str(root), sim_id, filename), 'w') as fout:
+        fout.write(content)
+
+
+def _outputs(tmpdir):
+    remote = tmpdir.mkdir('remote')
+    _write(remote, 'sim_a', 'output/InsetChart.json', '{"a": 1}')
+    _write(remote, 'sim_a', 'output/Summary.json', '{"same": 0}')
+    _write(remote, 'sim_b', 'output/InsetChart.json', '{"b": 2}')
+    _write(remote, 'sim_b', 'output/Summary.json', '{"same": 0}')
+    return str(remote)
+
+
+def test_identical_files_are_stored_once(tmpdir):
+    prefetcher = OutputPrefetcher(LocalDirectoryStore(_outputs(tmpdir)), str(tmpdir.join('cache')),
+                                  analyzers=[_Analyzer(['output/InsetChart.json']),
+                                             _Analyzer(['output/Summary.json', 'output/InsetChart.json'])])
+    assert prefetcher.filenames == ['output/InsetChart.json', 'output/Summary.json']
+
+    results = dict(prefetcher.prefetch(['sim_a', 'sim_b']))
+    assert sorted(results) == ['sim_a', 'sim_b']
+    assert results['sim_a']['output/Summary.json'] == results['sim_b']['output/Summary.json']
+    assert results['sim_a']['output/InsetChart.json'] != results['sim_b']['output/InsetChart.json']
+    with open(results['sim_b']['output/InsetChart.json']) as fin:
+        assert fin.read() == '{"b": 2}'
+
+
+def test_cached_files_are_not_fetched_again(tmpdir):
+    remote = _outputs(tmpdir)
+    cache_dir = str(tmpdir.join('cache'))
+    store = _CountingStore(remote)
+    first = dict(OutputPrefetcher(store, cache_dir, filenames=['output/InsetChart.json']).prefetch(['sim_a']))
+    assert len(store.fetched) == 1
+
+    second = dict(OutputPrefetcher(store, cache_dir, filenames=['output/InsetChart.json']).prefetch(['sim_a']))
+    assert len(store.fetched) == 1
+    assert second == first
+
+
+def test_missing_file_is_none(tmpdir):
+    prefetcher = OutputPrefetcher(LocalDirectoryStore(_outputs(tmpdir)), str(tmpdir.join('cache')),
+                                  filenames=['output/InsetChart.json', 'output/Missing.json'])
+    results = dict(prefetcher.prefetch(['sim_a']))
+    assert results['sim_a']['output/Missing.json'] is None
+    assert os.path.exists(results['sim_a']['output/InsetChart.json'])
+    assert not [f for f in os.listdir(str(tmpdir.join('cache'))) if f.endswith('.part')]
+
+
+def test_no_filenames_yields_every_simulation(tmpdir):
+    prefetcher = OutputPrefetcher(LocalDirectoryStore(_outputs(tmpdir)), str(tmpdir.join('cache')))
+    assert list(prefetcher.prefetch(['sim_a', 'sim_b'])) == [('sim_a', {}), ('sim_b', {})]
+
+
+def test_manifest_saved_when_consumer_stops_early(tmpdir):
+    cache_dir = str(tmpdir.join('cache'))
+    prefetcher = OutputPrefetcher(LocalDirectoryStore(_outputs(tmpdir)), cache_dir, max_connections=1,
+                                  filenames=['output/InsetChart.json'])
+    generator = prefetcher.prefetch(['sim_a', 'sim_b'])
+    next(generator)
+    generator.close()
+    assert os.path.exists(os.path.join(cache_dir, 'manifest.json'))
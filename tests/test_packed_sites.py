@@ -0,0 +1,101 @@
+import pytest
+
+from malaria.analyzers.PackedSites import PackedSiteAnalyzer, SiteOutputParser, packed_filename, split_packed_parser
+
+
+class _Parser(object):
+    def __init__(self, sim_id, sim_data, raw_data):
+        self.sim_id = sim_id
+        self.sim_data = sim_data
+        self.raw_data = raw_data
+        self.selected_data = {}
+
+
+class _Site(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class _SiteAnalyzer(object):
+    def __init__(self, site):
+        self.site = _Site(site)
+        self.filenames = ['output/MalariaSummaryReport_Annual_Report.json']
+        self.seen = []
+
+    def apply(self, parser):
+        self.seen.append((parser.sim_data['__site__'], parser.sim_data.get('monthlyEIRs')))
+        return parser.raw_data[self.filenames[0]]
+
+    def combine(self, parsers):
+        self.combined = [p.selected_data[id(self)] for p in parsers.values()]
+
+
+def _packed_parser():
+    report = 'output/MalariaSummaryReport_Annual_Report.json'
+    return _Parser('sim', {'__sites__': 'Dielmo,Ndiop', '__sample_index__': 3,
+                           'monthlyEIRs_Dielmo': [10.4] * 12, 'monthlyEIRs_Ndiop': [0.4] * 12},
+                   {packed_filename(report, 'Dielmo'): {'node': 1}, packed_filename(report, 'Ndiop'): {'node': 2}})
+
+
+def test_split_routes_node_outputs_to_sites():
+    site_parsers = split_packed_parser(_packed_parser())
+    assert [p.site for p in site_parsers] == ['Dielmo', 'Ndiop']
+
+    dielmo, ndiop = site_parsers
+    report = 'output/MalariaSummaryReport_Annual_Report.json'
+    assert dielmo.raw_data[report] == {'node': 1}
+    assert ndiop.raw_data[report] == {'node': 2}
+    assert dielmo.sim_data['__site__'] == 'Dielmo' and dielmo.sim_data['__sample_index__'] == 3
+    assert ndiop.sim_data['monthlyEIRs'] == [0.4] * 12
+    assert dielmo.sim_id != ndiop.sim_id
+
+    with pytest.raises(KeyError):
+        dielmo.raw_data['output/InsetChart.json']
+
+
+def test_split_leaves_single_site_simulations():
+    parser = _Parser('sim', {'__site__': 'Namawala'}, {})
+    assert split_packed_parser(parser) == [parser]
+
+
+def test_packed_site_analyzer_sees_its_node():
+    analyzer = _SiteAnalyzer('Ndiop')
+    packed = PackedSiteAnalyzer(analyzer)
+    parser = _packed_parser()
+
+    assert packed.filenames == ['output/MalariaSummaryReport_Annual_Report_Ndiop.json']
+    assert packed.filter(parser.sim_data)
+    assert not packed.filter({'__sites__': 'Dielmo'})
+
+    parser.selected_data[id(packed)] = packed.apply(parser)
+    packed.combine({parser.sim_id: parser})
+    assert analyzer.seen == [('Ndiop', [0.4] * 12)]
+    assert analyzer.combined == [{'node': 2}]
+
+
+def test_release_drops_site_outputs():
+    site_parser = SiteOutputParser(_packed_parser(), 'Dielmo')
+    site_parser.raw_data['output/MalariaSummaryReport_Annual_Report.json']
+    site_parser.release()
+    assert not site_parser.raw_data
+
+
+def test_packed_input_eir_tags():
+    pytest.importorskip('dtk')
+    from malaria.study_sites.site_packing import packed_site_input_eir_fn
+
+    class _Builder(object):
+        def __init__(self):
+            self.params = {'Maternal_Antibody_Protection': 0.1327}
+
+        def get_param(self, param, default=None):
+            return self.params.get(param, default)
+
+        def update_params(self, params):
+            self.params.update(params)
+
+    cb = _Builder()
+    tags = packed_site_input_eir_fn(['Dielmo', 'Ndiop'])(cb)
+    assert tags['__sites__'] == 'Dielmo,Ndiop'
+    assert len(tags['monthlyEIRs_Dielmo']) == 12 and tags['monthlyEIRs_Ndiop'][6] == 6.4
+    assert tags['Maternal_Antibody_Protection'] == cb.params['Maternal_Antibody_Protection']
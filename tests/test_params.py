@@ -0,0 +1,39 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+pytest.importorskip('dtk')
+pytest.importorskip('simtools')
+
+from malaria.params import LayeredParams, innate_only, innate_only_layered, params
+from malaria.study_sites.site_setup_functions import stable_value
+
+
+def test_removed_parameters_survive_pickle_and_deepcopy():
+    layered = LayeredParams({'a': 1, 'b': {'c': 2}}).layer({'b.c': 3}, removed=['a'])
+    for clone in (pickle.loads(pickle.dumps(layered)), copy.deepcopy(layered)):
+        assert 'a' not in clone
+        assert dict(clone) == {'b': {'c': 3}}
+
+
+def test_stable_value_of_layered_params():
+    layered = LayeredParams({'a': 1, 'b': 2}).layer(removed=['a'])
+    assert stable_value(layered) == {'b': 2}
+
+
+def test_innate_only_layer():
+    assert innate_only_layered['Min_Adapted_Response'] == 0
+    assert len(innate_only_layered) == len(params)
+    assert innate_only_layered.to_dict() == innate_only
+
+
+def test_innate_only_is_an_independent_dict():
+    expected = copy.deepcopy(params)
+    expected.update({"Antibody_Capacity_Growth_Rate": 0, "Max_MSP1_Antibody_Growthrate": 0,
+                     "Min_Adapted_Response": 0})
+    assert type(innate_only) is dict
+    assert innate_only == expected
+    assert innate_only['Malaria_Drug_Params'] is not params['Malaria_Drug_Params']
+    json.dumps(innate_only)
@@ -0,0 +1,83 @@
+import pytest
+
+pytest.importorskip('dtk')
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from malaria.interventions import malaria_diagnostic, malaria_drug_campaigns, reactive_case_detection
+from malaria.interventions.reactive_case_detection import add_rcd_event_chain, add_reactive_case_detection, \
+    rcd_neighbors, snowball_reach
+
+drug_configs = [{'class': 'AntimalarialDrug', 'Drug_Type': 'Artemether'}]
+receiving_drugs_event = {'class': 'BroadcastEvent', 'Broadcast_Event': 'Received_RCD_Drugs'}
+
+
+class _Builder(object):
+    def __init__(self):
+        self.events = []
+
+    def add_event(self, event):
+        self.events.append(event)
+
+
+@pytest.fixture(autouse=True)
+def raw_events(monkeypatch):
+    for module in (malaria_diagnostic, malaria_drug_campaigns, reactive_case_detection):
+        monkeypatch.setattr(module, 'RawCampaignObject', lambda event: event)
+    monkeypatch.setattr(reactive_case_detection, 'drug_configs_from_code', lambda cb, code: list(drug_configs))
+
+
+def _intervention(event):
+    return event['Event_Coordinator_Config']['Intervention_Config']
+
+
+def _line_distmat():
+    # households 1-2-3-4 in a line, 50 m apart
+    pairs = [(a, b, 0.05 * abs(a - b)) for a in range(1, 5) for b in range(1, 5) if a != b]
+    return pd.DataFrame(pairs, columns=['node1', 'node2', 'dist'])
+
+
+def test_rfmda_index_event_keeps_individual_property_restrictions():
+    cb = _Builder()
+    restrictions = [{'Risk': 'High'}]
+    malaria_drug_campaigns.add_rfMDA(cb, 100, 0.8, drug_configs, receiving_drugs_event, 60, 3, 0.5, 'hh',
+                                     'DISTANCE_ONLY', {'class': 'NodeSetAll'}, {}, [], restrictions, [], -1)
+    index, distribute = cb.events
+    assert _intervention(index)['Property_Restrictions_Within_Node'] == restrictions
+    assert _intervention(index)['Actual_IndividualIntervention_Config']['Delay_Period'] == 3
+    assert _intervention(distribute)['Trigger_Condition_List'] == ['Give_Drugs_rfMDA']
+    assert _intervention(distribute)['Property_Restrictions_Within_Node'] == restrictions
+
+
+def test_rfmsat_keeps_nested_snowball_surveys():
+    cb = _Builder()
+    malaria_drug_campaigns.add_rfMSAT(cb, 100, 1.0, drug_configs, receiving_drugs_event, 60, 5, 1.0,
+                                      'TRUE_PARASITE_DENSITY', 40, 0.1, 'DISTANCE_ONLY', 2, {'class': 'NodeSetAll'},
+                                      {}, [], [], [], -1, 0)
+    assert [e['Event_Name'] for e in cb.events] == ['Trigger RCD MSAT', 'Reactive MSAT level 0', 'Snowball level 0',
+                                                    'Snowball level 1']
+    assert _intervention(cb.events[0])['Actual_IndividualIntervention_Config']['Delay_Period'] == 0
+    triggers = [_intervention(e)['Trigger_Condition_List'] for e in cb.events[1:]]
+    assert triggers == [['Diagnostic_Survey_0'], ['Diagnostic_Survey_0'], ['Diagnostic_Survey_1']]
+
+
+def test_event_chain_has_one_survey_per_level():
+    cb = _Builder()
+    add_rcd_event_chain(cb, 'rfMSAT', 100, 1.0, drug_configs, receiving_drugs_event, 60, 5, 1.0,
+                        'TRUE_PARASITE_DENSITY', 40, 0.1, 'DISTANCE_ONLY', 2, {'class': 'NodeSetAll'}, {}, [], [])
+    assert len(cb.events) == 4
+    assert _intervention(cb.events[0])['Actual_IndividualIntervention_Config']['Delay_Period'] == 5
+    triggers = [_intervention(e)['Trigger_Condition_List'] for e in cb.events[1:]]
+    assert triggers == [['Diagnostic_Survey_0'], ['Diagnostic_Survey_1'], ['Diagnostic_Survey_2']]
+
+
+def test_topology_trims_levels_reaching_no_new_nodes():
+    neighbors = rcd_neighbors(_line_distmat(), 0.06)
+    assert neighbors[2].tolist() == [1, 2, 3]
+    assert snowball_reach(neighbors, 4) == [2.5, 3.5, 4.0, 4.0, 4.0]
+
+    counts = add_reactive_case_detection(_Builder(), 'rfMDA', 'AL', fmda_radius=0.06, snowballs=4,
+                                         neighbors=neighbors)
+    assert counts['snowballs'] == 2
+    assert counts['reach'] == [2.5, 3.5, 4.0]
+    assert counts['events'] == 4
@@ -0,0 +1,32 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from malaria.analyzers.ReplicatePlanner import ReplicatePlanner
+from malaria.analyzers.SampleAggregates import SampleAggregate, merge_aggregates
+
+
+def _replicates(offset, n, seed=0):
+    rng = np.random.RandomState(seed)
+    datas = []
+    for i in range(n):
+        data = pd.Series(offset + rng.normal(size=4), index=pd.Index([0, 1, 2, 3], name='bin'), name='value')
+        data.sample = 0
+        datas.append(data)
+    return datas
+
+
+def test_variance_is_accurate_for_large_values():
+    datas = _replicates(1e9, 10)
+    aggregate = merge_aggregates([SampleAggregate.from_selected(datas[:3]), SampleAggregate.from_selected(datas[3:])])
+    expected = np.var([d.values for d in datas], axis=0, ddof=1)
+    assert np.allclose(aggregate.variances()[0].values, expected, rtol=1e-6)
+    assert np.allclose(aggregate.means()[0].values, np.mean([d.values for d in datas], axis=0))
+
+
+def test_plan_with_non_finite_std():
+    uncertainty = pd.DataFrame({'likelihood': [-1.0, -1.5, -1.2], 'std': [np.inf, np.nan, 0.5],
+                                'replicates': [2, 3, 4]}, index=[0, 1, 2])
+    extra = ReplicatePlanner(tolerance=0.5, max_replicates=10).plan(uncertainty)
+    assert extra.to_dict() == {0: 8, 1: 7, 2: 0}
@@ -0,0 +1,108 @@
+import pickle
+
+import pytest
+
+pytest.importorskip('calibtool')
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from malaria.analyzers.BaseSummaryCalibrationAnalyzer import BaseSummaryCalibrationAnalyzer
+from malaria.analyzers.PositiveFractionByDistanceAnalyzer import PositiveFractionByDistanceAnalyzer
+from malaria.analyzers.PrevalenceByRoundAnalyzer import PrevalenceByRoundAnalyzer
+
+
+class _Parser(object):
+    def __init__(self, analyzer, data):
+        self.selected_data = {id(analyzer): data}
+
+
+def _parsers(analyzer, frames):
+    return {i: _Parser(analyzer, data) for i, data in enumerate(frames)}
+
+
+def _with_ids(data, sample, sim_id):
+    data.sample = sample
+    data.sim_id = sim_id
+    return data
+
+
+def _round_frames(rng):
+    index = pd.MultiIndex.from_product([[10, 20, 30], ['all', 'north']], names=['sim_date', 'region'])
+    return [_with_ids(pd.DataFrame({PrevalenceByRoundAnalyzer.y: rng.uniform(size=6)}, index=index),
+                      sample, 'sim%d' % i)
+            for i, sample in enumerate([0, 0, 1, 1, 1, 2])]
+
+
+def _distance_frames(rng):
+    index = pd.Index([0, 1, 2, 1000], name=PositiveFractionByDistanceAnalyzer.x)
+    return [_with_ids(pd.DataFrame({PositiveFractionByDistanceAnalyzer.y: rng.uniform(size=4)}, index=index),
+                      sample, 'sim%d' % i)
+            for i, sample in enumerate([0, 1, 1, 2, 2, 2])]
+
+
+def _summary_frames(rng):
+    index = pd.Index([0.5, 1.0, 2.0, 4.0], name='Age Bin')
+    return [_with_ids(pd.DataFrame(rng.uniform(size=(4, 2)), index=index,
+                                   columns=pd.Index(['Incidents', 'Person Years'], name='channel')),
+                      sample, 'sim%d' % i)
+            for i, sample in enumerate([0, 0, 0, 3, 3])]
+
+
+def _stacked_mean(analyzer, frames, levels):
+    # combine as it was before the per-sample aggregates
+    combined = pd.concat(frames, axis=1, keys=[(d.sample, d.sim_id) for d in frames],
+                         names=analyzer.data_group_names)
+    stacked = combined.stack(['sample', 'sim_id'])
+    return stacked.groupby(level=levels).mean()
+
+
+def _analyzer(cls):
+    return cls.__new__(cls)
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_prevalence_by_round_matches_stacked_mean(streaming):
+    analyzer = _analyzer(PrevalenceByRoundAnalyzer)
+    analyzer.streaming = streaming
+    frames = _round_frames(np.random.RandomState(0))
+    parsers = _parsers(analyzer, frames)
+    if streaming:  # apply folds a part of the simulations as they are analyzed
+        for data in frames[:3]:
+            analyzer.fold(data)
+        parsers = _parsers(analyzer, frames[3:])
+    analyzer.combine(parsers)
+
+    expected = _stacked_mean(analyzer, frames, ['sample', 'region', 'sim_date'])
+    pd.testing.assert_frame_equal(analyzer.data, expected, check_names=False)
+
+
+def test_positive_fraction_by_distance_matches_stacked_mean():
+    analyzer = _analyzer(PositiveFractionByDistanceAnalyzer)
+    frames = _distance_frames(np.random.RandomState(1))
+    analyzer.combine(_parsers(analyzer, frames))
+
+    expected = _stacked_mean(analyzer, frames, ['sample', analyzer.x])
+    pd.testing.assert_frame_equal(analyzer.data, expected, check_names=False)
+
+
+def test_merged_shards_match_single_combine():
+    analyzer = _analyzer(PositiveFractionByDistanceAnalyzer)
+    frames = _distance_frames(np.random.RandomState(2))
+    analyzer.combine(_parsers(analyzer, frames))
+    single = analyzer.data
+
+    partials = [pickle.loads(pickle.dumps(analyzer.reduce(_parsers(analyzer, shard))))
+                for shard in (frames[:2], frames[2:4], frames[4:])]
+    analyzer.combine_partials(partials)
+    pd.testing.assert_frame_equal(analyzer.data, single)
+
+
+def test_summary_analyzer_matches_grouped_mean():
+    analyzer = _analyzer(BaseSummaryCalibrationAnalyzer)
+    frames = _summary_frames(np.random.RandomState(3))
+    analyzer.combine(_parsers(analyzer, frames))
+
+    combined = pd.concat(frames, axis=1, keys=[(d.sample, d.sim_id) for d in frames],
+                         names=['sample', 'sim_id', 'channel'])
+    expected = combined.T.groupby(level=['sample', 'channel']).mean().T
+    pd.testing.assert_frame_equal(analyzer.data, expected, check_names=False)
@@ -0,0 +1,60 @@
+import pickle
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from malaria.analyzers.SharedInputs import SharedFrame, share_frames, shared_state, restore_shared_state, \
+    unlink_shared_inputs
+
+
+class _Holder(object):
+    def __getstate__(self):
+        return shared_state(self)
+
+    def __setstate__(self, state):
+        restore_shared_state(self, state)
+
+
+def test_round_trip_keeps_dtypes_and_column_order():
+    df = pd.DataFrame({'grid_cell': ['a', 'b', 'c'],
+                       'sim_date': np.array([10, 20, 30], dtype=np.int64),
+                       'prev': [0.1, 0.2, 0.3],
+                       'N': np.array([5, 6, 7], dtype=np.int32),
+                       'positive': [True, False, True]})
+    shared = SharedFrame(df)
+    try:
+        copy = pickle.loads(pickle.dumps(shared))
+        result = copy.frame()
+        assert list(result.columns) == list(df.columns)
+        assert result.dtypes.to_dict() == df.dtypes.to_dict()
+        pd.testing.assert_frame_equal(result, df)
+        assert [range(40)[x] for x in result['sim_date'].values] == [10, 20, 30]
+
+        for (i, block), shm in zip(copy.handle['blocks'], copy.shms):
+            buffer = np.ndarray(block['shape'], dtype=np.dtype(block['dtype']), buffer=shm.buf)
+            assert np.shares_memory(result.iloc[:, i].to_numpy(), buffer)
+        with pytest.raises(ValueError):
+            result.iloc[0, 2] = 1  # in place, into the read-only shared block
+        published = np.ndarray((3,), dtype=np.float64, buffer=shared.shms[1].buf)
+        assert published.tolist() == [0.1, 0.2, 0.3]
+        del buffer, published, result
+        copy.close()
+    finally:
+        shared.unlink()
+
+
+def test_shared_attributes_travel_as_handles():
+    holder = _Holder()
+    holder.distmat = pd.DataFrame(np.arange(9).reshape(3, 3), index=[1, 2, 3], columns=[1, 2, 3])
+    share_frames(holder, ['distmat'])
+    try:
+        copy = pickle.loads(pickle.dumps(holder))
+        pd.testing.assert_frame_equal(copy.distmat, holder.distmat)
+        assert copy.distmat.index.tolist() == [1, 2, 3]
+        copy.distmat = None
+        for shared in copy.shared_inputs.values():
+            shared.close()
+    finally:
+        unlink_shared_inputs(holder)
@@ -0,0 +1,112 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip('dtk')
+
+from malaria.study_sites.site_config_cache import SiteConfigCache, cached_site_setup_fn, clone_builder, \
+    write_site_configs
+from malaria.study_sites.site_setup_functions import SetupFunction
+
+
+class _Builder(object):
+    def __init__(self):
+        self.config = {'parameters': {}}
+        self.campaign = {'Events': []}
+
+    def dump_files(self, working_directory):
+        for name in ('config', 'campaign'):
+            with open(os.path.join(working_directory, '%s.json' % name), 'w') as fout:
+                json.dump(getattr(self, name), fout)
+
+
+class _set_param(SetupFunction):
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def __call__(self, cb):
+        cb.config['parameters'][self.name] = self.value
+        return {self.name: self.value}
+
+
+class _add_event(SetupFunction):
+    def __init__(self, name):
+        self.name = name
+
+    def __call__(self, cb):
+        cb.campaign['Events'].append({'name': self.name})
+
+
+def test_tags_returned_on_miss_and_hit():
+    base = _Builder()
+    cache = SiteConfigCache()
+    fns = [_set_param('a', 1), _add_event('x'), _set_param('b', 2)]
+
+    first, second = clone_builder(base), clone_builder(base)
+    assert cache.apply(first, fns) == {'a': 1, 'b': 2}
+    assert cache.apply(second, fns) == {'a': 1, 'b': 2}
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert second.config == first.config and second.campaign == first.campaign
+    assert base.config == {'parameters': {}} and base.campaign == {'Events': []}
+
+
+def test_modified_builder_is_not_a_cache_hit():
+    cache = SiteConfigCache()
+    fns = [_add_event('x')]
+    cb = clone_builder(_Builder())
+    cache.apply(cb, fns)
+    cache.apply(cb, fns)
+    assert len(cb.campaign['Events']) == 2
+    assert cache.hits == 0
+
+
+def test_cached_site_setup_fn_with_base_identity():
+    cache = SiteConfigCache()
+    fn = cached_site_setup_fn([_set_param('a', 1), _add_event('x')], cache=cache, base='calibration-base')
+    for _ in range(3):
+        cb = _Builder()
+        assert fn(cb) == {'a': 1}
+        assert cb.campaign == {'Events': [{'name': 'x'}]}
+    assert (cache.misses, cache.hits) == (1, 2)
+
+
+def test_setup_function_must_define_call():
+    class _incomplete(SetupFunction):
+        def __init__(self, value):
+            self.value = value
+
+    with pytest.raises(TypeError):
+        _incomplete(1)
+    assert _set_param('a', 1) == _set_param('a', 1)
+    assert len({_set_param('a', 1), _set_param('a', 1), _set_param('a', 2)}) == 2
+
+
+def test_slim_config_fn_returns_no_tags():
+    from malaria.study_sites.site_setup_functions import slim_config_fn
+
+    cb = _Builder()
+    cb.config['parameters'].update({'Malaria_Drug_Params': {'Artemether': {}, 'Chloroquine': {}},
+                                    'Vector_Species_Names': [], 'Vector_Species_Params': {'gambiae': {}}})
+    cb.campaign['Events'].append({'class': 'AntimalarialDrug', 'Drug_Type': 'Artemether'})
+    assert SiteConfigCache().apply(clone_builder(cb), [_set_param('a', 1), slim_config_fn()]) == {'a': 1}
+    assert slim_config_fn()(cb) is None
+    assert list(cb.config['parameters']['Malaria_Drug_Params']) == ['Artemether']
+    assert cb.config['parameters']['Vector_Species_Params'] == {}
+
+
+def test_write_site_configs_over_worker_pool(tmp_path):
+    base = _Builder()
+    site_fns = [_set_param('a', 1), _add_event('x')]
+    results = write_site_configs(base, [site_fns + [_set_param('b', i)] for i in range(5)], str(tmp_path),
+                                 processes=2, chunksize=1)
+
+    assert [os.path.basename(d) for d, _ in results] == ['sim_%05d' % i for i in range(5)]
+    for i, (directory, tags) in enumerate(results):
+        assert tags == {'a': 1, 'b': i}
+        with open(os.path.join(directory, 'config.json')) as fin:
+            assert json.load(fin) == {'parameters': {'a': 1, 'b': i}}
+        with open(os.path.join(directory, 'campaign.json')) as fin:
+            assert json.load(fin) == {'Events': [{'name': 'x'}]}
+    assert base.config == {'parameters': {}}
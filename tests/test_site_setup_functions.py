@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+pytest.importorskip('dtk')
+legacy = pytest.importorskip('calibtool.study_sites.site_setup_functions')
+
+from dtk.utils.core.DTKConfigBuilder import DTKConfigBuilder
+from malaria.study_sites import site_setup_functions
+
+age_bins = [1, 2, 3, 4, 5, 10, 15, 20, 25, 30, 40, 50, 60, 100]
+treatment_targets = [{'trigger': 'NewClinicalCase', 'coverage': 1, 'seek': 0.5, 'rate': 0.3}]
+
+# setup functions imported by the site modules, called as the sites call them
+site_calls = [
+    ('config_setup_fn', (), {'duration': 365 * 70 + 1}),
+    ('summary_report_fn', (), {'start': 0, 'interval': 365.0, 'age_bins': age_bins}),
+    ('survey_report_fn', (), {'days': 15, 'interval': 1.0}),
+    ('add_treatment_fn', (), {'start': 0, 'drug': ['Artemether'], 'targets': treatment_targets}),
+    ('add_treatment_fn', (), {}),
+    ('site_input_eir_fn', ('Dielmo',), {'birth_cohort': True}),
+    ('update_params', ({'Demographics_Filenames': ['Calibration\\birth_cohort_demographics.compiled.json']},), {}),
+]
+
+
+def _state(fn):
+    cb = DTKConfigBuilder.from_defaults('MALARIA_SIM')
+    tags = fn(cb)
+    return json.dumps([vars(cb), tags], sort_keys=True, default=lambda o: vars(o) if hasattr(o, '__dict__') else str(o))
+
+
+@pytest.mark.parametrize('name, args, kwargs', site_calls)
+def test_same_effect_as_calibtool_setup_functions(name, args, kwargs):
+    malaria_fn = getattr(site_setup_functions, name + '_fn' if name == 'update_params' else name)
+    assert _state(malaria_fn(*args, **kwargs)) == _state(getattr(legacy, name)(*args, **kwargs))
+
+
+def test_update_params_fn():
+    fn = site_setup_functions.update_params_fn({'Simulation_Duration': 10})
+    assert site_setup_functions.update_params is site_setup_functions.update_params_fn
+    assert fn == site_setup_functions.update_params_fn({'Simulation_Duration': 10})